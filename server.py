@@ -1,10 +1,317 @@
 import os
 import argparse
+import datetime
+import email.utils
+import functools
+import hashlib
+import io
+import json
+import posixpath
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
 from http.server import HTTPServer, SimpleHTTPRequestHandler
-from typing import Type
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from typing import BinaryIO, Callable, Mapping, NamedTuple, Type
+
+# The site generator's modules, used to render pages in --render mode
+SITE_MODULES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+if SITE_MODULES_DIR not in sys.path:
+    sys.path.insert(0, SITE_MODULES_DIR)
+
+from generate import read_source, render_source
+from template import Layouts
+
+
+class CachedFile(NamedTuple):
+    mtime_ns: int
+    size: int
+    etag: str
+    # None for files too large to keep in memory, which are read from disk
+    data: bytes | None
+
+
+class FileCache:
+    """Thread-safe LRU cache of served files, bounded by total size in bytes.
+
+    Entries are keyed by path and validated against the file's mtime and size
+    on every lookup, so files rewritten by a build are re-read and deleted ones
+    are dropped. ETags are content hashes: a rebuild that writes identical
+    bytes keeps answering 304 Not Modified.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.max_file_bytes = max_bytes // 8
+        # path -> (version the entry was read at, entry)
+        self._entries: OrderedDict[str, tuple[tuple[int, ...], CachedFile]] = (
+            OrderedDict()
+        )
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, path: str) -> CachedFile:
+        """Return the cached file at `path`, raising OSError if it is gone."""
+        try:
+            version = self._version(path)
+        except OSError:
+            self._discard(path)
+            raise
+
+        with self._lock:
+            cached = self._entries.get(path)
+            if cached is not None and cached[0] == version:
+                self._entries.move_to_end(path)
+                return cached[1]
+
+        entry = self._read(path)
+        with self._lock:
+            previous = self._entries.pop(path, None)
+            if previous is not None and previous[1].data is not None:
+                self._size -= previous[1].size
+            self._entries[path] = (version, entry)
+            if entry.data is not None:
+                self._size += entry.size
+                self._evict()
+        return entry
+
+    def _version(self, path: str) -> tuple[int, ...]:
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self, path: str) -> CachedFile:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            if stat.st_size <= self.max_file_bytes:
+                data = f.read()
+                digest.update(data)
+            else:
+                data = None
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+        return CachedFile(
+            stat.st_mtime_ns, stat.st_size, f'"{digest.hexdigest()}"', data
+        )
+
+    def _evict(self) -> None:
+        # Only entries holding data count towards the limit; the rest just
+        # remember the ETag of large files
+        for key in list(self._entries):
+            if self._size <= self.max_bytes:
+                return
+            entry = self._entries[key][1]
+            if entry.data is not None:
+                del self._entries[key]
+                self._size -= entry.size
+
+    def _discard(self, path: str) -> None:
+        with self._lock:
+            cached = self._entries.pop(path, None)
+            if cached is not None and cached[1].data is not None:
+                self._size -= cached[1].size
+
+
+class RenderedPageCache(FileCache):
+    """Cache of pages rendered from markdown sources on first request.
+
+    Entries are keyed by source path and re-rendered when the source, the
+    template or a layout changes. Pages are rendered into the layout their
+    front matter names, with the site-wide `variables` a build would use.
+    """
+
+    # Layout files are checked for changes at most this often, in seconds,
+    # rather than on every request for a page
+    layouts_check_interval = 0.5
+
+    def __init__(
+        self,
+        max_bytes: int,
+        template_path: str,
+        layouts_dir: str = "layouts",
+        variables: Mapping[str, str] | None = None,
+    ) -> None:
+        super().__init__(max_bytes)
+        self.template_path = template_path
+        self.layouts_dir = layouts_dir
+        self.variables = dict(variables or {})
+        # Layouts compiled for the layout files as they were at `_layouts_stamp`
+        self._layouts: Layouts | None = None
+        self._layouts_stamp: tuple[int, ...] = ()
+        self._layouts_checked = 0.0
+        self._layouts_lock = threading.Lock()
+
+    def _layouts_version(self) -> tuple[Layouts, tuple[int, ...]]:
+        """The compiled layouts and the stamp of the files they were compiled
+        from, compiling them again if one of these changed. Files are checked
+        at most once every `layouts_check_interval` seconds."""
+        with self._layouts_lock:
+            layouts = self._layouts
+            now = time.monotonic()
+            if layouts is not None and (
+                now - self._layouts_checked < self.layouts_check_interval
+                or _layout_files_stamp(layouts) == self._layouts_stamp
+            ):
+                self._layouts_checked = now
+                return layouts, self._layouts_stamp
+
+            layouts = Layouts(Path(self.template_path), Path(self.layouts_dir))
+            self._layouts = layouts
+            self._layouts_stamp = _layout_files_stamp(layouts)
+            self._layouts_checked = now
+            return layouts, self._layouts_stamp
+
+    def _version(self, path: str) -> tuple[int, ...]:
+        source = os.stat(path)
+        return (source.st_mtime_ns, source.st_size) + self._layouts_version()[1]
+
+    def _read(self, path: str) -> CachedFile:
+        layouts, stamp = self._layouts_version()
+        chunks = render_source(read_source(Path(path)), layouts, self.variables)
+        data = "".join(chunks).encode()
+        mtime_ns = max(os.stat(path).st_mtime_ns, *stamp[0::2])
+        etag = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return CachedFile(mtime_ns, len(data), f'"{etag}"', data)
+
+
+def _layout_files_stamp(layouts: Layouts) -> tuple[int, ...]:
+    """mtime and size of every file `layouts` were resolved from, wherever
+    it is, and of the directories holding them, which change when a layout
+    is added or removed."""
+    paths = set(layouts.files)
+    paths.update(path.parent for path in layouts.files)
+    if layouts.directory is not None:
+        paths.add(layouts.directory)
+    stamp: list[int] = []
+    for path in sorted(paths):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamp.extend((0, -1))
+            continue
+        stamp.extend((stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+LIVE_RELOAD_PATH = "/__livereload"
+
+# Reloads the page when it, or a same-origin file it references, was rebuilt
+LIVE_RELOAD_SNIPPET = b"""<script>
+(() => {
+  const source = new EventSource("%s");
+  source.onmessage = (event) => {
+    const changed = JSON.parse(event.data);
+    const page = location.pathname.endsWith("/")
+      ? location.pathname + "index.html"
+      : location.pathname;
+    const used = new Set([decodeURI(page)]);
+    for (const el of document.querySelectorAll("[src], [href]")) {
+      const url = new URL(el.getAttribute("src") || el.getAttribute("href"), location.href);
+      if (url.origin === location.origin) used.add(decodeURI(url.pathname));
+    }
+    if (changed.some((path) => used.has(path))) location.reload();
+  };
+})();
+</script>
+""" % LIVE_RELOAD_PATH.encode()
+
+
+class LiveReloadHub:
+    """Pushes changed output paths to browsers over Server-Sent Events.
+
+    Client connections are handed over by their request handler, so an open
+    event stream holds a socket but no worker thread. Messages are written
+    by a single sender thread, so a stalled browser never holds up the
+    watcher posting them. Clients that went away are dropped on the next
+    send, and a periodic comment line makes sure that happens even when
+    nothing is being rebuilt.
+    """
+
+    def __init__(self, ping_interval: float = 15) -> None:
+        self.ping_interval = ping_interval
+        self._clients: list[socket.socket] = []
+        self._pending: list[bytes] = []
+        self._closed = False
+        self._lock = threading.Lock()
+        # Wakes the sender when a message is queued or the hub is closed
+        self._wake = threading.Condition(self._lock)
+        self._sender: threading.Thread | None = None
+
+    def add(self, client: socket.socket) -> None:
+        client.settimeout(2)
+        with self._lock:
+            if self._closed:
+                client.close()
+                return
+            self._clients.append(client)
+            if self._sender is None:
+                self._sender = threading.Thread(target=self._run, daemon=True)
+                self._sender.start()
+
+    def broadcast(self, paths: list[str]) -> int:
+        """Queue `paths` for every client and return how many there are."""
+        message = b"data: " + json.dumps(paths).encode() + b"\n\n"
+        with self._lock:
+            if self._clients:
+                self._pending.append(message)
+                self._wake.notify()
+            return len(self._clients)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            clients, self._clients = self._clients, []
+            self._wake.notify()
+        for client in clients:
+            client.close()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                if not self._pending and not self._closed:
+                    self._wake.wait(self.ping_interval)
+                if self._closed:
+                    return
+                messages, self._pending = self._pending, []
+            self._send(b"".join(messages) if messages else b": ping\n\n")
+
+    def _send(self, message: bytes) -> None:
+        with self._lock:
+            clients = list(self._clients)
+        sent: list[socket.socket] = []
+        for client in clients:
+            try:
+                client.sendall(message)
+                sent.append(client)
+            except OSError:
+                client.close()
+        with self._lock:
+            self._clients = [c for c in self._clients if c in sent or c not in clients]
 
 
 class CORSHTTPRequestHandler(SimpleHTTPRequestHandler):
+    # HTTP/1.1 keeps connections alive between requests; idle ones are closed
+    # after `timeout` seconds so they do not hold on to a worker forever.
+    protocol_version = "HTTP/1.1"
+    timeout = 5
+
+    def __init__(
+        self,
+        *args,
+        file_cache: FileCache | None = None,
+        live_reload: LiveReloadHub | None = None,
+        **kwargs,
+    ):
+        self.file_cache = file_cache
+        self.live_reload = live_reload
+        super().__init__(*args, **kwargs)
+
     def end_headers(self):
         self.send_header("Access-Control-Allow-Origin", "*")
         self.send_header("Access-Control-Allow-Methods", "GET, OPTIONS")
@@ -13,19 +320,354 @@ class CORSHTTPRequestHandler(SimpleHTTPRequestHandler):
 
     def do_OPTIONS(self):
         self.send_response(200, "OK")
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        if self._is_live_reload_request():
+            self._open_event_stream()
+        else:
+            super().do_GET()
+
+    def do_POST(self):
+        # The build watcher posts the URL paths of the outputs it rebuilt
+        if not self._is_live_reload_request():
+            self.send_error(HTTPStatus.NOT_IMPLEMENTED, "Unsupported method")
+            return
+        if self.client_address[0] not in ("127.0.0.1", "::1"):
+            self.send_error(HTTPStatus.FORBIDDEN, "Only accepted from localhost")
+            return
+        assert self.live_reload is not None
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            paths = json.loads(self.rfile.read(length))
+            if not isinstance(paths, list) or not all(
+                isinstance(path, str) for path in paths
+            ):
+                raise ValueError("expected a list of paths")
+        except (TypeError, ValueError) as e:
+            self.send_error(HTTPStatus.BAD_REQUEST, f"Invalid path list: {e}")
+            return
+        self.live_reload.broadcast(paths)
+        self.send_response(HTTPStatus.NO_CONTENT)
+        self.end_headers()
+
+    def _is_live_reload_request(self) -> bool:
+        return (
+            self.live_reload is not None
+            and urllib.parse.urlsplit(self.path).path == LIVE_RELOAD_PATH
+        )
+
+    def _open_event_stream(self) -> None:
+        assert self.live_reload is not None
+        detach = getattr(self.server, "detach_request", None)
+        if detach is None:
+            self.send_error(HTTPStatus.NOT_FOUND, "Live reload is not supported")
+            return
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        # Reconnect quickly when the server restarts
+        self.wfile.write(b"retry: 1000\n\n")
+        self.close_connection = True
+        detach(self.request)
+        self.live_reload.add(self.request)
+
+    def send_head(self) -> BinaryIO | None:
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            index = os.path.join(path, "index.html")
+            if not urllib.parse.urlsplit(self.path).path.endswith("/"):
+                # Let SimpleHTTPRequestHandler redirect to the trailing slash
+                return super().send_head()
+            if not os.path.isfile(index):
+                return super().send_head()
+            path = index
+        if path.endswith("/"):
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        try:
+            entry = self._lookup(path)
+        except OSError:
+            self.send_error(HTTPStatus.NOT_FOUND, "File not found")
+            return None
+
+        return self._send_cached(
+            path, entry, self.guess_type(path), self._gzip_variant(path, entry)
+        )
+
+    def _lookup(self, path: str) -> CachedFile:
+        """The file at `path` from the file cache, or read from disk on every
+        request without one. Raises OSError if it is gone."""
+        if self.file_cache is not None:
+            return self.file_cache.get(path)
+        # Opening fails on directories, like reading them through the cache
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+        # Files are not hashed without a cache, their mtime and size tag them
+        etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+        return CachedFile(stat.st_mtime_ns, stat.st_size, etag, None)
+
+    def _send_cached(
+        self,
+        path: str,
+        entry: CachedFile,
+        content_type: str,
+        compressed: CachedFile | None = None,
+    ) -> BinaryIO | None:
+        """Send the headers for `entry`, or 304 Not Modified, and return its
+        body. `compressed` is its gzip variant, used if the client accepts it."""
+        if self.live_reload is not None and content_type == "text/html":
+            # The body is rewritten, so the precompressed variant cannot be used
+            entry = self._with_live_reload(path, entry)
+            compressed = None
+        if compressed is not None and self._accepts_gzip():
+            entry = compressed
+            path += ".gz"
+
+        last_modified = self.date_time_string(entry.mtime_ns // 1_000_000_000)
+        if self._is_not_modified(entry):
+            self.send_response(HTTPStatus.NOT_MODIFIED)
+            self.send_header("ETag", entry.etag)
+            self.send_header("Last-Modified", last_modified)
+            self.end_headers()
+            return None
+
+        self.send_response(HTTPStatus.OK)
+        self.send_header("Content-type", content_type)
+        self.send_header("Content-Length", str(entry.size))
+        self.send_header("Last-Modified", last_modified)
+        self.send_header("ETag", entry.etag)
+        if compressed is not None:
+            self.send_header("Vary", "Accept-Encoding")
+        if entry is compressed:
+            self.send_header("Content-Encoding", "gzip")
+        # Always revalidate, so a rebuild shows up on the next reload
+        self.send_header("Cache-Control", "no-cache")
         self.end_headers()
+        if entry.data is not None:
+            return io.BytesIO(entry.data)
+        return open(path, "rb")
+
+    def _with_live_reload(self, path: str, entry: CachedFile) -> CachedFile:
+        data = entry.data
+        if data is None:
+            with open(path, "rb") as f:
+                data = f.read()
+        end = data.rfind(b"</body>")
+        if end == -1:
+            end = len(data)
+        data = data[:end] + LIVE_RELOAD_SNIPPET + data[end:]
+        return entry._replace(size=len(data), etag=entry.etag[:-1] + '-lr"', data=data)
+
+    def _gzip_variant(self, path: str, entry: CachedFile) -> CachedFile | None:
+        """Return the precompressed sibling written by the build, if it is up
+        to date with `entry`. The build gives it the mtime of its source."""
+        try:
+            compressed = self._lookup(path + ".gz")
+        except OSError:
+            return None
+        if compressed.mtime_ns != entry.mtime_ns:
+            return None
+        return compressed
+
+    def _accepts_gzip(self) -> bool:
+        for coding in self.headers.get("Accept-Encoding", "").split(","):
+            name, _, params = coding.partition(";")
+            if name.strip().lower() not in ("gzip", "*"):
+                continue
+            quality = params.strip().removeprefix("q=")
+            try:
+                return not params or float(quality) > 0
+            except ValueError:
+                return False
+        return False
+
+    def _is_not_modified(self, entry: CachedFile) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        if_none_match = self.headers.get("If-None-Match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or entry.etag in tags
+
+        if_modified_since = self.headers.get("If-Modified-Since")
+        if if_modified_since is None:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since)
+        except (TypeError, IndexError, OverflowError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=datetime.timezone.utc)
+        modified = datetime.datetime.fromtimestamp(
+            entry.mtime_ns // 1_000_000_000, datetime.timezone.utc
+        )
+        return modified <= since
+
+
+class PreviewHTTPRequestHandler(CORSHTTPRequestHandler):
+    """Serves the site straight from its sources, without building `public/`.
+
+    Requests for pages are answered by rendering the matching markdown file
+    under `content_dir` (`/blog/` from `blog/index.md`, `/blog/post.html` from
+    `blog/post.md`), everything else from the static directory passed as
+    `directory`.
+    """
+
+    def __init__(
+        self,
+        *args,
+        page_cache: RenderedPageCache,
+        content_dir: str,
+        **kwargs,
+    ):
+        self.page_cache = page_cache
+        self.content_dir = content_dir
+        super().__init__(*args, **kwargs)
+
+    def send_head(self) -> BinaryIO | None:
+        url_path = urllib.parse.unquote(urllib.parse.urlsplit(self.path).path)
+        # normpath drops ".." components that would climb above the root
+        relative = posixpath.normpath(url_path).lstrip("/")
+        if relative == ".":
+            relative = ""
+        source_dir = os.path.join(self.content_dir, *relative.split("/"))
+
+        if url_path.endswith("/"):
+            source = os.path.join(source_dir, "index.md")
+        elif url_path.endswith(".html"):
+            source = source_dir.removesuffix(".html") + ".md"
+        elif os.path.isdir(source_dir) and not os.path.isdir(
+            self.translate_path(self.path)
+        ):
+            self.send_response(HTTPStatus.MOVED_PERMANENTLY)
+            self.send_header("Location", url_path + "/")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return None
+        else:
+            return super().send_head()
+
+        try:
+            entry = self.page_cache.get(source)
+        except OSError:
+            return super().send_head()
+        except Exception as e:
+            self.send_error(HTTPStatus.INTERNAL_SERVER_ERROR, f"'{source}': {e}")
+            return None
+        return self._send_cached(source, entry, "text/html")
+
+
+class DetachingHTTPServer(HTTPServer):
+    """Lets handlers keep their connection open after the request is handled,
+    e.g. to hand it over to the `LiveReloadHub`."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        self._detached: set[socket.socket] = set()
+        super().__init__(*args, **kwargs)
+
+    def detach_request(self, request: socket.socket) -> None:
+        self._detached.add(request)
+
+    def shutdown_request(self, request):
+        if request in self._detached:
+            self._detached.discard(request)
+            return
+        super().shutdown_request(request)
+
+
+class ThreadedHTTPServer(ThreadingMixIn, DetachingHTTPServer):
+    """Handles every connection on its own thread."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        server_address: tuple[str, int],
+        handler_class: Callable[..., SimpleHTTPRequestHandler],
+        backlog: int = 128,
+    ) -> None:
+        self.request_queue_size = backlog
+        super().__init__(server_address, handler_class)
+
+
+class PooledHTTPServer(DetachingHTTPServer):
+    """Handles connections on a bounded pool of worker threads.
+
+    Connections beyond the pool size wait in the pool's queue, and those
+    beyond `backlog` wait in the kernel's accept queue.
+    """
+
+    def __init__(
+        self,
+        server_address: tuple[str, int],
+        handler_class: Callable[..., SimpleHTTPRequestHandler],
+        workers: int = 8,
+        backlog: int = 128,
+    ) -> None:
+        self.request_queue_size = backlog
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http")
+        super().__init__(server_address, handler_class)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
 
 
 def run(
-    server_class: Type[HTTPServer] = HTTPServer,
+    server_class: Type[HTTPServer] | None = None,
     handler_class: Type[SimpleHTTPRequestHandler] = CORSHTTPRequestHandler,
     port: int = 8000,
     directory: str | None = None,
+    workers: int = 0,
+    backlog: int = 128,
+    cache_bytes: int = 64 * 1024 * 1024,
+    live_reload: bool = False,
+    render: bool = False,
+    variables: Mapping[str, str] | None = None,
 ):
     if directory:  # Change the current working directory if directory is specified
         os.chdir(directory)
+    handler: Callable[..., SimpleHTTPRequestHandler] = handler_class
+    file_cache = FileCache(cache_bytes) if cache_bytes > 0 else None
+    if render:
+        # `directory` is the site root, pages are rendered from its sources
+        handler = functools.partial(
+            PreviewHTTPRequestHandler,
+            file_cache=file_cache,
+            live_reload=LiveReloadHub() if live_reload else None,
+            page_cache=RenderedPageCache(
+                cache_bytes, "template.html", variables=variables
+            ),
+            content_dir="content",
+            directory="static",
+        )
+    elif issubclass(handler_class, CORSHTTPRequestHandler):
+        handler = functools.partial(
+            handler_class,
+            file_cache=file_cache,
+            live_reload=LiveReloadHub() if live_reload else None,
+        )
     server_address = ("", port)
-    httpd = server_class(server_address, handler_class)
+    if server_class is not None:
+        httpd = server_class(server_address, handler)
+    elif workers > 0:
+        httpd = PooledHTTPServer(server_address, handler, workers, backlog)
+    else:
+        httpd = ThreadedHTTPServer(server_address, handler, backlog)
     print(f"Serving HTTP on http://localhost:{port} from directory '{directory}'...")
     httpd.serve_forever()
 
@@ -36,6 +678,58 @@ if __name__ == "__main__":
         "--dir", type=str, help="Directory to serve files from", default="."
     )
     parser.add_argument("--port", type=int, help="Port to serve HTTP on", default=8888)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Size of the worker thread pool, 0 for a thread per connection",
+        default=0,
+    )
+    parser.add_argument(
+        "--backlog",
+        type=int,
+        help="Maximum number of pending connections in the listen queue",
+        default=128,
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        help="In-memory file cache size in MB, 0 to always read from disk",
+        default=64,
+    )
+    parser.add_argument(
+        "--live-reload",
+        action="store_true",
+        help=f"Reload open pages when the build watcher posts to {LIVE_RELOAD_PATH}",
+    )
+    parser.add_argument(
+        "--render",
+        action="store_true",
+        help="Render pages from the site in --dir on request instead of serving "
+        "a build",
+    )
+    parser.add_argument(
+        "--var",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Site-wide template variable of pages rendered with --render",
+    )
     args = parser.parse_args()
 
-    run(port=args.port, directory=args.dir)
+    variables: dict[str, str] = {}
+    for var in args.var:
+        name, sep, value = var.partition("=")
+        if not sep:
+            parser.error(f"invalid --var '{var}', expected NAME=VALUE")
+        variables[name] = value
+
+    run(
+        port=args.port,
+        directory=args.dir,
+        workers=args.workers,
+        backlog=args.backlog,
+        cache_bytes=args.cache_size * 1024 * 1024,
+        live_reload=args.live_reload,
+        render=args.render,
+        variables=variables,
+    )
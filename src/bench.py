@@ -0,0 +1,435 @@
+"""Build throughput benchmarks over synthetic markdown corpora.
+
+Each corpus shape is generated into a temporary directory and benchmarked in a
+fresh process, so the reported peak RSS belongs to that corpus alone. Results
+are written as JSON and can be compared against an earlier run:
+
+    python src/bench.py --scale 0.2
+    python src/bench.py --compare bench_results/<earlier run>.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+from generate import collect_page_jobs, generate_page_recursive
+from htmlnode import HTMLNode, LeafNode, ParentNode
+from markdown_blocks import block_to_htmlnode, markdown_to_html, scan_blocks
+from search import SearchIndex, SearchIndexBuilder
+from template import Layouts
+from textnode import TextNode, text_to_textnodes
+
+WORDS = (
+    "middle earth ring hobbit shire elves dwarves mordor wizard river road "
+    "mountain forest tower king fellowship journey shadow light song tale"
+).split()
+
+# name: (pages, blocks per page, block kind)
+SHAPES: dict[str, tuple[int, int, str]] = {
+    "small": (2000, 6, "mixed"),
+    "huge": (4, 6000, "mixed"),
+    "links": (400, 40, "links"),
+    "lists": (400, 40, "lists"),
+    "code": (400, 40, "code"),
+}
+
+TEMPLATE = """<!doctype html>
+<html>
+  <head><title>{{ Title }}</title></head>
+  <body><article>{{ Content }}</article></body>
+</html>
+"""
+
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def _inline(rng: random.Random, words: int) -> str:
+    parts = []
+    for _ in range(max(1, words // 6)):
+        roll = rng.random()
+        text = _sentence(rng, 5)
+        if roll < 0.15:
+            parts.append(f"**{text}**")
+        elif roll < 0.3:
+            parts.append(f"*{text}*")
+        elif roll < 0.4:
+            parts.append(f"`{rng.choice(WORDS)}`")
+        else:
+            parts.append(text)
+    return " ".join(parts)
+
+
+def _links(rng: random.Random, count: int) -> str:
+    return " ".join(
+        f"see [{rng.choice(WORDS)}](/{rng.choice(WORDS)}/{i}) and" for i in range(count)
+    )
+
+
+def _block(rng: random.Random, kind: str) -> str:
+    if kind == "mixed":
+        kind = rng.choice(["paragraph", "paragraph", "heading", "lists", "code"])
+
+    if kind == "heading":
+        return f"{'#' * rng.randint(2, 4)} {_sentence(rng, 4)}"
+    if kind == "links":
+        return _links(rng, 30)
+    if kind == "lists":
+        if rng.random() < 0.5:
+            return "\n".join(f"- {_inline(rng, 12)}" for _ in range(25))
+        return "\n".join(f"{i}. {_inline(rng, 12)}" for i in range(1, 10))
+    if kind == "code":
+        lines = [f"print({rng.choice(WORDS)!r}, {i})" for i in range(40)]
+        return "```\n" + "\n".join(lines) + "\n```"
+    return _inline(rng, 60)
+
+
+def generate_corpus(shape: str, root: Path, scale: float = 1.0, seed: int = 0) -> None:
+    """Write a synthetic content tree of the given shape under `root`."""
+    pages, blocks, kind = SHAPES[shape]
+    rng = random.Random(seed)
+    for page in range(max(1, int(pages * scale))):
+        page_dir = root / f"section-{page % 20}" / f"page-{page}"
+        page_dir.mkdir(parents=True, exist_ok=True)
+        page_blocks = [f"# {shape} page {page}"]
+        page_blocks.extend(_block(rng, kind) for _ in range(blocks))
+        with open(page_dir / "index.md", "w") as f:
+            f.write("\n\n".join(page_blocks) + "\n")
+
+
+def _throughput(seconds: float, pages: int, size: int) -> dict[str, float]:
+    return {
+        "seconds": round(seconds, 4),
+        "pages_per_sec": round(pages / seconds, 2),
+        "mb_per_sec": round(size / seconds / 1e6, 3),
+    }
+
+
+def run_shape(shape: str, scale: float, seed: int) -> dict:
+    with tempfile.TemporaryDirectory(prefix=f"bench-{shape}-") as tmp:
+        root = Path(tmp)
+        content = root / "content"
+        generate_corpus(shape, content, scale, seed)
+        template = root / "template.html"
+        template.write_text(TEMPLATE)
+
+        sources = [path.read_text() for path in content.rglob("*.md")]
+        size = sum(len(source.encode()) for source in sources)
+
+        start = time.perf_counter()
+        for source in sources:
+            markdown_to_html(source)
+        parse_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        generate_page_recursive(content, Layouts(template), root / "public")
+        build_seconds = time.perf_counter() - start
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_rss //= 1024
+
+    return {
+        "shape": shape,
+        "pages": len(sources),
+        "bytes": size,
+        "markdown_to_html": _throughput(parse_seconds, len(sources), size),
+        "generate_page_recursive": _throughput(build_seconds, len(sources), size),
+        "peak_rss_kb": peak_rss,
+    }
+
+
+def _run_isolated(shape: str, scale: float, seed: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(_run_quiet, shape, scale, seed).result()
+
+
+def _run_quiet(shape: str, scale: float, seed: int) -> dict:
+    # generate_page prints a line per page, which would dominate the timing
+    with open(os.devnull, "w") as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            return run_shape(shape, scale, seed)
+        finally:
+            sys.stdout = stdout
+
+
+class _DictNode:
+    """Reference node as nodes were before they were made compact: instance
+    __dict__, list children, dict props and text types as strings."""
+
+    def __init__(self, tag, value, children, props, text_type=None) -> None:
+        self.tag = tag
+        self.value = value
+        self.children = children
+        self.props = props
+        self.text_type = text_type
+
+
+def _compact_copy(node: HTMLNode) -> HTMLNode:
+    if node.children is None:
+        return LeafNode(node.tag, node.value or "", node.props)
+    assert node.tag is not None
+    return ParentNode(node.tag, [_compact_copy(child) for child in node.children])
+
+
+def _reference_copy(node: HTMLNode) -> _DictNode:
+    children = None
+    if node.children is not None:
+        children = [_reference_copy(child) for child in node.children]
+    props = dict(node.props) if node.props else None
+    return _DictNode(node.tag, node.value, children, props)
+
+
+def _count_nodes(node: HTMLNode) -> int:
+    return 1 + sum(_count_nodes(child) for child in node.children or ())
+
+
+def _retained_bytes(build) -> tuple[int, object]:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        return tracemalloc.get_traced_memory()[0] - before, result
+    finally:
+        tracemalloc.stop()
+
+
+def run_memory(scale: float, seed: int) -> dict:
+    """Bytes per node of the node trees of one large synthetic page, compared
+    with the dict-based reference representation.
+
+    Both representations are built from the same parsed page and share its
+    strings, so the difference is the node overhead alone.
+    """
+    rng = random.Random(seed)
+    blocks = max(1, int(SHAPES["huge"][1] * scale))
+    markdown = "\n\n".join(_block(rng, "mixed") for _ in range(blocks))
+    trees = [block_to_htmlnode(block) for block in scan_blocks(markdown)]
+    spans = [
+        node
+        for block in scan_blocks(markdown)
+        for node in text_to_textnodes(block.text)
+    ]
+    html_nodes = sum(_count_nodes(tree) for tree in trees)
+
+    compact_html, _ = _retained_bytes(lambda: [_compact_copy(t) for t in trees])
+    reference_html, _ = _retained_bytes(lambda: [_reference_copy(t) for t in trees])
+    compact_text, _ = _retained_bytes(
+        lambda: [TextNode(n.text, n.text_type, n.url) for n in spans]
+    )
+    reference_text, _ = _retained_bytes(
+        lambda: [_DictNode(None, n.text, None, None, n.text_type.value) for n in spans]
+    )
+
+    def per_node(size: int, count: int) -> float:
+        return round(size / count, 1)
+
+    return {
+        "bytes": len(markdown.encode()),
+        "html_nodes": html_nodes,
+        "html_node_bytes": per_node(compact_html, html_nodes),
+        "html_node_bytes_reference": per_node(reference_html, html_nodes),
+        "text_nodes": len(spans),
+        "text_node_bytes": per_node(compact_text, len(spans)),
+        "text_node_bytes_reference": per_node(reference_text, len(spans)),
+    }
+
+
+def run_search(scale: float, seed: int, queries: int = 2000) -> dict:
+    """Time building the search index of the "small" corpus, updating it after
+    1% of the pages changed, and answering one and two term queries."""
+    rng = random.Random(seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        content = root / "content"
+        public = root / "public"
+        generate_corpus("small", content, scale, seed)
+        jobs = collect_page_jobs(content, public)
+
+        builder = SearchIndexBuilder(root / "search-cache.json")
+        start = time.perf_counter()
+        builder.update(jobs, public)
+        builder.write(public / "search")
+        build_seconds = time.perf_counter() - start
+
+        for src, _ in rng.sample(jobs, max(1, len(jobs) // 100)):
+            with open(src, "a") as f:
+                f.write(f"\n\n{_sentence(rng, 20)}\n")
+        start = time.perf_counter()
+        builder.update(jobs, public)
+        changed = builder.write(public / "search")
+        update_seconds = time.perf_counter() - start
+
+        files = [path for path in (public / "search").rglob("*") if path.is_file()]
+        index_bytes = sum(path.stat().st_size for path in files)
+        index = SearchIndex(public / "search")
+        latencies = []
+        for _ in range(queries):
+            query = _sentence(rng, rng.randint(1, 2))
+            start = time.perf_counter()
+            index.search(query)
+            latencies.append(time.perf_counter() - start)
+
+    # The first query also loads the shards of its terms
+    first_query = latencies[0]
+    latencies.sort()
+
+    def percentile(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1e6)
+
+    return {
+        "pages": len(jobs),
+        "index_bytes": index_bytes,
+        "index_files": len(files),
+        "build_seconds": round(build_seconds, 3),
+        "update_seconds": round(update_seconds, 3),
+        "update_files": len(changed),
+        "first_query_us": round(first_query * 1e6),
+        "p50_us": percentile(0.5),
+        "p99_us": percentile(0.99),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return result.stdout.strip()
+
+
+def _print_comparison(results: list[dict], baseline_path: Path) -> None:
+    with open(baseline_path) as f:
+        baseline = {r["shape"]: r for r in json.load(f)["results"]}
+
+    print(f"\nCompared to {baseline_path}:")
+    for result in results:
+        old = baseline.get(result["shape"])
+        if old is None:
+            continue
+        for stage in ("markdown_to_html", "generate_page_recursive"):
+            ratio = result[stage]["pages_per_sec"] / old[stage]["pages_per_sec"]
+            print(f"  {result['shape']:<6} {stage:<24} {ratio:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the site build")
+    parser.add_argument(
+        "--shapes",
+        nargs="+",
+        choices=sorted(SHAPES),
+        default=list(SHAPES),
+        help="Corpus shapes to benchmark",
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Multiplier for the page counts"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Corpus random seed")
+    parser.add_argument(
+        "--output", type=Path, help="Result file, defaults to bench_results/"
+    )
+    parser.add_argument(
+        "--compare", type=Path, help="Earlier result file to compare against"
+    )
+    parser.add_argument(
+        "--memory",
+        action="store_true",
+        help="Only measure node memory on one large page, compared with "
+        "dict-based nodes",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Only measure building the search index and query latency",
+    )
+    args = parser.parse_args()
+
+    if args.search:
+        search = run_search(args.scale, args.seed)
+        print(
+            f"{search['pages']} pages, index of {search['index_bytes'] / 1e6:.2f} MB "
+            f"in {search['index_files']} files built in {search['build_seconds']}s, "
+            f"updated after 1% of pages changed in {search['update_seconds']}s "
+            f"({search['update_files']} files rewritten)"
+        )
+        print(
+            f"  query latency p50 {search['p50_us']} us, p99 {search['p99_us']} us, "
+            f"first query {search['first_query_us']} us"
+        )
+        return
+
+    if args.memory:
+        memory = run_memory(args.scale, args.seed)
+        print(
+            f"{memory['bytes'] / 1e6:.2f} MB page, {memory['html_nodes']} HTML nodes "
+            f"and {memory['text_nodes']} text nodes"
+        )
+        for kind in ("html", "text"):
+            compact = memory[f"{kind}_node_bytes"]
+            reference = memory[f"{kind}_node_bytes_reference"]
+            print(
+                f"  {kind:<4} node {compact:7.1f} bytes, dict-based {reference:7.1f} "
+                f"bytes ({1 - compact / reference:.0%} smaller)"
+            )
+        return
+
+    results = []
+    for shape in args.shapes:
+        result = _run_isolated(shape, args.scale, args.seed)
+        results.append(result)
+        print(
+            f"{shape:<6} {result['pages']:>6} pages {result['bytes'] / 1e6:8.2f} MB | "
+            f"markdown_to_html {result['markdown_to_html']['pages_per_sec']:>9.1f} p/s "
+            f"{result['markdown_to_html']['mb_per_sec']:>7.2f} MB/s | "
+            f"build {result['generate_page_recursive']['pages_per_sec']:>9.1f} p/s "
+            f"{result['generate_page_recursive']['mb_per_sec']:>7.2f} MB/s | "
+            f"peak RSS {result['peak_rss_kb'] / 1024:.1f} MB"
+        )
+
+    commit = _git_commit()
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    output = args.output or Path("bench_results") / f"{timestamp}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "commit": commit,
+                "timestamp": timestamp,
+                "python": platform.python_version(),
+                "scale": args.scale,
+                "seed": args.seed,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    print(f"Results written to '{output}'")
+
+    if args.compare:
+        _print_comparison(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from concurrent.futures import ProcessPoolExecutor
+import gzip
+import os
+from pathlib import Path
+from typing import Iterable
+
+COMPRESSIBLE_SUFFIXES = frozenset(
+    {".html", ".css", ".js", ".json", ".svg", ".txt", ".xml", ".map"}
+)
+MIN_COMPRESS_SIZE = 1024
+
+
+def gzip_path(path: Path) -> Path:
+    return path.with_name(path.name + ".gz")
+
+
+def compress_tree(
+    root: Path,
+    workers: int = 1,
+    min_size: int = MIN_COMPRESS_SIZE,
+    incompressible: dict[str, str] | None = None,
+    written: set[str] | None = None,
+) -> tuple[int, int]:
+    """Write `.gz` siblings next to every compressible file under `root`.
+
+    A `.gz` file carries the mtime of its source, so it is up to date exactly
+    when the two mtimes match. With `written`, the paths of the siblings this
+    stage wrote are kept in it, and those whose source is gone or no longer
+    qualifies are removed; other `.gz` files, e.g. ones a site ships in
+    `static/`, are never touched. Files that gzip does not make smaller get
+    no sibling; with `incompressible`, their size and mtime are kept in it by
+    path so they are not compressed again until they change. Returns the
+    number of files compressed and skipped.
+    """
+    jobs: list[Path] = []
+    fingerprints: dict[Path, str] = {}
+    # Files found incompressible before and unchanged since
+    unchanged: list[Path] = []
+    skipped = 0
+    for path in root.rglob("*"):
+        if not path.is_file():
+            continue
+
+        if path.suffix == ".gz":
+            source = path.with_suffix("")
+            if (
+                written is not None
+                and str(path) in written
+                and not (source.is_file() and _should_compress(source, min_size))
+            ):
+                path.unlink()
+                written.discard(str(path))
+            continue
+
+        if not _should_compress(path, min_size):
+            continue
+
+        stat = path.stat()
+        fingerprints[path] = f"{stat.st_size}:{stat.st_mtime_ns}"
+        compressed = gzip_path(path)
+        if compressed.exists() and compressed.stat().st_mtime_ns == stat.st_mtime_ns:
+            # Only this stage gives a sibling the mtime of its source
+            if written is not None:
+                written.add(str(compressed))
+            skipped += 1
+        elif (
+            incompressible is not None
+            and incompressible.get(str(path)) == fingerprints[path]
+        ):
+            unchanged.append(path)
+            skipped += 1
+        else:
+            jobs.append(path)
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written_now = list(pool.map(compress_file, jobs, chunksize=16))
+    else:
+        written_now = [compress_file(path) for path in jobs]
+
+    if written is not None:
+        for path, ok in zip(jobs, written_now):
+            if ok:
+                written.add(str(gzip_path(path)))
+            else:
+                written.discard(str(gzip_path(path)))
+
+    if incompressible is not None:
+        incompressible.clear()
+        unchanged.extend(path for path, ok in zip(jobs, written_now) if not ok)
+        for path in unchanged:
+            incompressible[str(path)] = fingerprints[path]
+
+    return sum(written_now), skipped
+
+
+def update_compressed(
+    paths: Iterable[Path],
+    min_size: int = MIN_COMPRESS_SIZE,
+    incompressible: dict[str, str] | None = None,
+    written: set[str] | None = None,
+) -> None:
+    """Refresh the `.gz` siblings of individual outputs that were just written
+    or deleted, keeping `incompressible` and `written` as compress_tree()
+    does."""
+    for path in paths:
+        compressed = gzip_path(path)
+        if incompressible is not None:
+            incompressible.pop(str(path), None)
+        if path.is_file() and _should_compress(path, min_size):
+            if compress_file(path):
+                if written is not None:
+                    written.add(str(compressed))
+                continue
+            if incompressible is not None:
+                stat = path.stat()
+                incompressible[str(path)] = f"{stat.st_size}:{stat.st_mtime_ns}"
+        if written is None or str(compressed) in written:
+            compressed.unlink(missing_ok=True)
+        if written is not None:
+            written.discard(str(compressed))
+
+
+def compress_file(path: Path) -> bool:
+    """Write the `.gz` sibling of `path`. Returns False, writing nothing, if
+    it would not be smaller."""
+    stat = path.stat()
+    with open(path, "rb") as f:
+        data = f.read()
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+
+    dst_path = gzip_path(path)
+    if len(compressed) >= len(data):
+        # Not worth serving, keep only the original
+        dst_path.unlink(missing_ok=True)
+        return False
+
+    tmp_path = dst_path.with_name(dst_path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(compressed)
+    os.utime(tmp_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    tmp_path.replace(dst_path)
+    return True
+
+
+def _should_compress(path: Path, min_size: int) -> bool:
+    return path.suffix in COMPRESSIBLE_SUFFIXES and path.stat().st_size >= min_size
@@ -0,0 +1,85 @@
+"""YAML-lite front matter at the top of a page.
+
+Front matter is a block of `key: value` lines between two `---` lines that
+open the file:
+
+    ---
+    layout: post
+    Description: "A walk to Rivendell"  # comment
+    ---
+    # Page title
+
+Values are strings: unquoted ones are stripped and lose a trailing
+` # comment`, double-quoted ones follow JSON escapes and single-quoted ones
+double `''` to write a quote. Blank lines and `#` comment lines are skipped.
+Nesting, lists and multi-line values are not supported.
+"""
+
+import json
+from pathlib import Path
+import re
+
+FRONT_MATTER_FENCE = "---"
+
+_entry_pattern = re.compile(r"([A-Za-z_][\w-]*)\s*:(?:\s+(.*?))?\s*")
+
+
+def parse_front_matter(lines: list[str]) -> dict[str, str]:
+    """Values of the `key: value` lines between the fences."""
+    values: dict[str, str] = {}
+    for line in lines:
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        match = _entry_pattern.fullmatch(line)
+        if match is None:
+            raise Exception(f"invalid front matter line: '{line}'")
+        values[match.group(1)] = _parse_value(match.group(2) or "")
+    return values
+
+
+def _parse_value(value: str) -> str:
+    if value.startswith('"'):
+        try:
+            decoded = json.loads(value)
+        except ValueError:
+            raise Exception(f"invalid front matter value: {value}") from None
+        if not isinstance(decoded, str):
+            raise Exception(f"invalid front matter value: {value}")
+        return decoded
+    if value.startswith("'"):
+        if len(value) < 2 or not value.endswith("'"):
+            raise Exception(f"invalid front matter value: {value}")
+        return value[1:-1].replace("''", "'")
+    return value.split(" #", 1)[0].rstrip()
+
+
+def split_front_matter(source: str) -> tuple[dict[str, str], str]:
+    """Front matter of a page source and the markdown after it. A source
+    without front matter, or whose front matter is never closed, is returned
+    whole."""
+    if not source.startswith(FRONT_MATTER_FENCE):
+        return {}, source
+    lines = source.split("\n")
+    if lines[0].rstrip() != FRONT_MATTER_FENCE:
+        return {}, source
+    for i in range(1, len(lines)):
+        if lines[i].rstrip() == FRONT_MATTER_FENCE:
+            return parse_front_matter(lines[1:i]), "\n".join(lines[i + 1 :])
+    return {}, source
+
+
+def read_front_matter(path: Path) -> tuple[dict[str, str], int]:
+    """Front matter of the page at `path`, reading only its first lines, and
+    the number of characters of the file it spans."""
+    with open(path) as f:
+        first = f.readline()
+        if first.rstrip() != FRONT_MATTER_FENCE:
+            return {}, 0
+        lines: list[str] = []
+        consumed = len(first)
+        for line in f:
+            consumed += len(line)
+            if line.rstrip() == FRONT_MATTER_FENCE:
+                return parse_front_matter(lines), consumed
+            lines.append(line.rstrip("\n"))
+    return {}, 0
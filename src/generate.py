@@ -1,8 +1,27 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
 from pathlib import Path
-import re
 import shutil
+from typing import Iterable, Iterator, Mapping
 
-from markdown_blocks import markdown_to_html
+from front_matter import read_front_matter, split_front_matter
+from linkcheck import LinkIndex
+from manifest import BuildManifest, hash_file
+from markdown_blocks import (
+    get_block_cache,
+    markdown_stream_to_html_chunks,
+    markdown_to_html_chunks,
+    set_block_cache,
+)
+from template import Layouts, Template
+from textnode import (
+    ImageAttributes,
+    Link,
+    get_image_attributes,
+    image_digest,
+    set_image_attributes,
+)
+from walk import walk_tree
 
 
 def prep_public_folder(path: Path) -> None:
@@ -11,66 +30,521 @@ def prep_public_folder(path: Path) -> None:
     path.mkdir(exist_ok=True, parents=True)
 
 
-def copy_recursive(src: Path, dst: Path) -> None:
+# Linux ioctl cloning a file's extents into another (FICLONE in <linux/fs.h>)
+FICLONE = 0x40049409
+
+COPY_MODES = ("copy", "hardlink", "reflink")
+
+
+class CopyStats:
+    """Files and bytes transferred or skipped by copy_recursive."""
+
+    def __init__(self) -> None:
+        self.copied_files = 0
+        self.copied_bytes = 0
+        self.skipped_files = 0
+        self.skipped_bytes = 0
+
+    def __str__(self) -> str:
+        return (
+            f"copied {self.copied_files} files ({self.copied_bytes / 1e6:.1f} MB), "
+            f"skipped {self.skipped_files} up to date ({self.skipped_bytes / 1e6:.1f} MB)"
+        )
+
+
+def copy_recursive(
+    src: Path,
+    dst: Path,
+    manifest: BuildManifest | None = None,
+    mode: str = "copy",
+    verify_hash: bool = False,
+    threads: int = 1,
+    verbose: bool = False,
+) -> CopyStats:
+    """Sync `src` into `dst`, skipping files already there.
+
+    A destination file is up to date when its size and mtime match the
+    source's (copies keep the source mtime). With `verify_hash`, files of the
+    same size but a different mtime are compared by content instead. `mode`
+    "hardlink" or "reflink" links files instead of copying them when `src`
+    and `dst` are on the same filesystem, falling back to a copy otherwise.
+
+    The tree is walked once and every destination directory created up front,
+    then files are synced on `threads` threads, which overlaps their I/O.
+    """
     if src.is_file():
-        shutil.copy(src=src, dst=dst)
+        jobs = [(src, dst / src.name if dst.is_dir() else dst)]
+    else:
+        if manifest is not None:
+            manifest.visit("assets")
+        jobs = []
+        for dirpath, dirnames, filenames in walk_tree(src):
+            directory = Path(dirpath)
+            target_dir = dst / directory.relative_to(src)
+            for name in dirnames:
+                (target_dir / name).mkdir(parents=True, exist_ok=True)
+                if verbose:
+                    print(f"Copying content of '{directory / name}' ...")
+            jobs.extend((directory / name, target_dir / name) for name in filenames)
+
+    def sync(job: tuple[Path, Path]) -> tuple[os.stat_result, bool]:
+        file, target = job
+        file_stat = file.stat()
+        if _is_synced(file, file_stat, target, verify_hash):
+            return file_stat, False
+        if verbose:
+            print(f"Copying '{file}' into '{target.parent}' ...")
+        _sync_file(file, file_stat, target, mode)
+        return file_stat, True
+
+    if threads > 1 and len(jobs) > 1:
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(sync, jobs))
+    else:
+        results = [sync(job) for job in jobs]
+
+    stats = CopyStats()
+    for (file, target), (file_stat, copied) in zip(jobs, results):
+        if copied:
+            stats.copied_files += 1
+            stats.copied_bytes += file_stat.st_size
+        else:
+            stats.skipped_files += 1
+            stats.skipped_bytes += file_stat.st_size
+        if manifest is not None:
+            # Assets are tracked by size and mtime, the manifest only needs
+            # the output so it can be removed once the source is gone
+            fingerprint = f"{file_stat.st_size}:{file_stat.st_mtime_ns}"
+            manifest.record("assets", file, target, fingerprint)
+
+    return stats
+
+
+def _is_synced(
+    src: Path, src_stat: os.stat_result, target: Path, verify_hash: bool
+) -> bool:
+    try:
+        dst_stat = target.stat()
+    except FileNotFoundError:
+        return False
+    if dst_stat.st_size != src_stat.st_size:
+        return False
+    if dst_stat.st_mtime_ns == src_stat.st_mtime_ns:
+        return True
+    if not verify_hash or hash_file(src) != hash_file(target):
+        return False
+
+    # Same content, only touched: take over the mtime so the next check is cheap
+    os.utime(target, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    return True
+
+
+def _sync_file(src: Path, src_stat: os.stat_result, target: Path, mode: str) -> None:
+    # Build next to the target and rename, links cannot overwrite a file
+    tmp_path = target.with_name(target.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        same_device = src_stat.st_dev == target.parent.stat().st_dev
+        if mode == "hardlink" and same_device:
+            os.link(src, tmp_path)
+        elif not (mode == "reflink" and same_device and _reflink(src, tmp_path)):
+            _copy_file(src, tmp_path)
+            shutil.copystat(src, tmp_path)
+        tmp_path.replace(target)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+
+def _copy_file(src: Path, dst: Path) -> None:
+    """Copy file data inside the kernel with copy_file_range where available
+    (Linux), which some filesystems turn into a server-side copy or a clone.
+    shutil.copyfile covers the rest, itself using sendfile or fcopyfile."""
+    if hasattr(os, "copy_file_range"):
+        with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+            try:
+                while os.copy_file_range(src_file.fileno(), dst_file.fileno(), 1 << 30):
+                    pass
+                return
+            except OSError:
+                # Unsupported by the filesystem or kernel, start over below
+                pass
+    shutil.copyfile(src, dst)
 
-    if src.is_dir():
-        for item in src.iterdir():
-            if item.is_dir():
-                sub_dst_path = dst / item.relative_to(src)
-                sub_dst_path.mkdir(parents=True, exist_ok=True)
-                print(f"Copying content of '{item}' to '{sub_dst_path}' ...")
-                copy_recursive(src=item, dst=sub_dst_path)
-            else:
-                print(f"Copying '{item}' into '{dst}' ...")
-                copy_recursive(src=item, dst=dst)
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """Clone `src` into `dst` sharing its data blocks (btrfs, XFS, ...).
+    Returns False if the platform or filesystem does not support it."""
+    try:
+        import fcntl
+    except ImportError:
+        return False
+
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError:
+            return False
+    shutil.copystat(src, dst)
+    return True
+
+
+# Sources at least this large are rendered block by block as they are read,
+# so memory is bounded by their largest block rather than their size
+STREAM_THRESHOLD = 16 * 1024 * 1024
 
 
 def extract_title(md: str) -> str:
-    for line in md.splitlines():
+    return _find_title(md.splitlines())
+
+
+def extract_title_from_file(path: Path, skip: int = 0) -> str:
+    """extract_title() of a source, reading it one line at a time after its
+    first `skip` characters."""
+    with open(path) as f:
+        f.read(skip)
+        return _find_title(part for line in f for part in line.splitlines())
+
+
+def _find_title(lines: Iterable[str]) -> str:
+    for line in lines:
         if line.startswith("# "):
             return line.lstrip("# ")
     raise Exception("No title found")
 
 
-def generate_page(src_path: Path, template_path: Path, dst_path: Path) -> None:
-    print(
-        f"Generating page from '{src_path}' to '{dst_path}' using '{template_path}'..."
-    )
-
-    with open(src_path) as f:
-        src = f.read()
-    with open(template_path) as f:
-        output_html = f.read()
+def generate_page(
+    src_path: Path,
+    layouts: Layouts,
+    dst_path: Path,
+    variables: Mapping[str, str] | None = None,
+) -> list[Link]:
+    print(f"Generating page from '{src_path}' to '{dst_path}'...")
 
-    # Replace title
-    title = extract_title(src)
-    output_html = re.sub(r"{{ *Title *}}", title, output_html)
+    return write_page(src_path, layouts, dst_path, variables)
 
-    # Replace body
-    body = markdown_to_html(src)
-    output_html = re.sub(r"{{ *Content *}}", body, output_html)
 
-    # Write output to file
+def write_page(
+    src_path: Path,
+    layouts: Layouts,
+    dst_path: Path,
+    variables: Mapping[str, str] | None = None,
+) -> list[Link]:
+    """Render a page into the layout its front matter names, or the default
+    template, returning the links and images it contains."""
     if dst_path.suffix != ".html":
         raise Exception("invalid file path for generated page")
 
+    links: list[Link] = []
+    if src_path.stat().st_size >= STREAM_THRESHOLD:
+        front_matter, skip = read_front_matter(src_path)
+        template = layouts.get(front_matter.get("layout", ""))
+        chunks = render_page_stream(
+            src_path, template, variables, links, front_matter, skip
+        )
+    else:
+        chunks = render_source(read_source(src_path), layouts, variables, links)
+    write_chunks(dst_path, chunks)
+    return links
+
+
+def render_source(
+    source: str,
+    layouts: Layouts,
+    variables: Mapping[str, str] | None = None,
+    links: list[Link] | None = None,
+) -> Iterator[str]:
+    """render_page() of a page source that may start with front matter."""
+    front_matter, src = split_front_matter(source)
+    template = layouts.get(front_matter.get("layout", ""))
+    return render_page(src, template, variables, links, front_matter)
+
+
+def render_page(
+    src: str,
+    template: Template,
+    variables: Mapping[str, str] | None = None,
+    links: list[Link] | None = None,
+    front_matter: Mapping[str, str] | None = None,
+) -> Iterator[str]:
+    """Render markdown source `src` into `template`, chunk by chunk. Links
+    and images are added to `links` as the chunks are consumed. Front matter
+    values override site-wide variables, and its `Title` the page heading."""
+    page_variables = _page_variables(variables, front_matter)
+    if "Title" not in (front_matter or {}):
+        page_variables["Title"] = extract_title(src)
+    page_variables["Content"] = markdown_to_html_chunks(src, links)
+    return template.iter_render(page_variables)
+
+
+def render_page_stream(
+    src_path: Path,
+    template: Template,
+    variables: Mapping[str, str] | None = None,
+    links: list[Link] | None = None,
+    front_matter: Mapping[str, str] | None = None,
+    skip: int = 0,
+) -> Iterator[str]:
+    """render_page() of a source too large to hold in memory, whose front
+    matter spans its first `skip` characters. The title is found in a first
+    pass over the file, then its blocks are rendered into the template while
+    the file is read a second time."""
+    page_variables = _page_variables(variables, front_matter)
+    if "Title" not in (front_matter or {}):
+        page_variables["Title"] = extract_title_from_file(src_path, skip)
+    page_variables["Content"] = markdown_stream_to_html_chunks(
+        read_source_chunks(src_path, skip=skip), links
+    )
+    return template.iter_render(page_variables)
+
+
+def _page_variables(
+    variables: Mapping[str, str] | None, front_matter: Mapping[str, str] | None
+) -> dict[str, str | Iterable[str]]:
+    page_variables: dict[str, str | Iterable[str]] = dict(variables or {})
+    page_variables.update(front_matter or {})
+    return page_variables
+
+
+def read_source(path: Path) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def read_source_chunks(
+    path: Path, chunk_size: int = 1 << 20, skip: int = 0
+) -> Iterator[str]:
+    with open(path) as f:
+        f.read(skip)
+        while chunk := f.read(chunk_size):
+            yield chunk
+
+
+def write_chunks(dst_path: Path, chunks: Iterable[str]) -> None:
+    # Write to a temporary file so a failing page never leaves partial output
     dst_path.parent.mkdir(parents=True, exist_ok=True)
-    with open(dst_path, "w") as f:
-        f.write(output_html)
+    tmp_path = dst_path.with_name(dst_path.name + ".tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            f.writelines(chunks)
+        tmp_path.replace(dst_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
 
-def generate_page_recursive(
-    src_path: Path, template_path: Path, dst_path: Path
-) -> None:
+def collect_page_jobs(src_path: Path, dst_path: Path) -> list[tuple[Path, Path]]:
     if not src_path.is_dir():
         raise Exception("source path is not a directory")
 
+    jobs: list[tuple[Path, Path]] = []
     for item in src_path.iterdir():
         if item.is_dir():
             sub_dst_path = dst_path / item.relative_to(src_path)
             sub_dst_path.mkdir(parents=True, exist_ok=True)
-            generate_page_recursive(item, template_path, sub_dst_path)
+            jobs.extend(collect_page_jobs(item, sub_dst_path))
         else:
-            generate_page(item, template_path, dst_path / (item.stem + ".html"))
+            jobs.append((item, dst_path / (item.stem + ".html")))
+
+    return jobs
+
+
+def page_output_path(src_root: Path, dst_root: Path, src_path: Path) -> Path:
+    """Output path of a single source, as collect_page_jobs would map it."""
+    relative = src_path.relative_to(src_root)
+    return dst_root / relative.parent / (relative.stem + ".html")
+
+
+def generate_page_recursive(
+    src_path: Path,
+    layouts: Layouts,
+    dst_path: Path,
+    manifest: BuildManifest | None = None,
+    workers: int = 1,
+    variables: Mapping[str, str] | None = None,
+    link_index: LinkIndex | None = None,
+) -> list[tuple[Path, Path]]:
+    jobs = collect_page_jobs(src_path, dst_path)
+    if manifest is not None:
+        manifest.visit("pages")
+    return generate_pages(jobs, layouts, manifest, workers, variables, link_index)
+
+
+def generate_pages(
+    jobs: list[tuple[Path, Path]],
+    layouts: Layouts,
+    manifest: BuildManifest | None = None,
+    workers: int = 1,
+    variables: Mapping[str, str] | None = None,
+    link_index: LinkIndex | None = None,
+) -> list[tuple[Path, Path]]:
+    """Render (src, dst) jobs, skipping those the manifest knows are fresh.
+
+    Returns the jobs that were rendered. Pages that failed are collected and
+    raised together as a BuildError once every other page is done. The links
+    of every page, including fresh ones whose links the manifest kept, are
+    added to `link_index`. A page is also stale when its layout or the
+    attributes of an image it shows changed.
+    """
+    digests: dict[Path, str] = {}
+    layout_digests: dict[Path, str] = {}
+    if manifest is not None:
+        pending: list[tuple[Path, Path]] = []
+        for src, dst in jobs:
+            digest = hash_file(src)
+            try:
+                layout = read_front_matter(src)[0].get("layout", "")
+            except Exception:
+                # Rendering the page reports the error
+                layout = ""
+            layout_digest = layouts.digest(layout)
+            links = manifest.links("pages", src)
+            if not manifest.is_fresh(
+                "pages", src, dst, page_digest(digest, links, layout_digest)
+            ):
+                digests[src] = digest
+                layout_digests[src] = layout_digest
+                pending.append((src, dst))
+            elif link_index is not None:
+                link_index.add(src, dst, manifest.links("pages", src))
+        jobs = pending
+
+    if workers > 1 and len(jobs) > 1:
+        failures, page_links = generate_pages_parallel(
+            jobs, layouts, workers, variables
+        )
+    else:
+        failures = []
+        page_links: dict[Path, list[Link]] = {}
+        for src, dst in jobs:
+            try:
+                page_links[src] = generate_page(src, layouts, dst, variables)
+            except Exception as e:
+                failures.append((src, _describe_error(e)))
+
+    failed = {src for src, _ in failures}
+    rendered = [(src, dst) for src, dst in jobs if src not in failed]
+    for src, dst in rendered:
+        if manifest is not None:
+            digest = page_digest(digests[src], page_links[src], layout_digests[src])
+            manifest.record("pages", src, dst, digest, page_links[src])
+        if link_index is not None:
+            link_index.add(src, dst, page_links[src])
+
+    if failures:
+        raise BuildError(failures, rendered)
+    return rendered
+
+
+def page_digest(source_digest: str, links: list[Link], layout_digest: str = "") -> str:
+    """Digest of a page's inputs: its source, its layout and the attributes
+    of the images among its links."""
+    parts = [source_digest]
+    if layout_digest:
+        parts.append(layout_digest)
+    images = image_digest(links)
+    if images:
+        parts.append(images)
+    return ":".join(parts)
+
+
+class BuildError(Exception):
+    def __init__(
+        self,
+        failures: list[tuple[Path, str]],
+        rendered: list[tuple[Path, Path]] | None = None,
+    ) -> None:
+        self.failures = failures
+        self.rendered = rendered or []
+        lines = [f"{len(failures)} page(s) failed to build:"]
+        lines.extend(f"  '{src}': {error}" for src, error in failures)
+        super().__init__("\n".join(lines))
+
+
+def generate_pages_parallel(
+    jobs: list[tuple[Path, Path]],
+    layouts: Layouts,
+    workers: int,
+    variables: Mapping[str, str] | None = None,
+) -> tuple[list[tuple[Path, str]], dict[Path, list[Link]]]:
+    """Render (src, dst) jobs in batches on a process pool.
+
+    Returns the pages that failed along with their error, so one broken page
+    does not stop the rest of the build, and the links of the pages rendered.
+    Workers receive the compiled layouts rather than compiling them again.
+    """
+    print(f"Generating {len(jobs)} pages on {workers} workers...")
+
+    batch_size = max(1, min(64, len(jobs) // (workers * 4)))
+    batches = [jobs[i : i + batch_size] for i in range(0, len(jobs), batch_size)]
+
+    # Workers render through a cache of their own, sharing the on-disk store,
+    # and report their counters back
+    cache = get_block_cache()
+    cache_settings = None if cache is None else (cache.max_entries, cache.cache_dir)
+
+    failures: list[tuple[Path, str]] = []
+    page_links: dict[Path, list[Link]] = {}
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(layouts, variables, cache_settings, get_image_attributes()),
+    ) as pool:
+        for batch_failures, batch_links, counters in pool.map(_generate_batch, batches):
+            failures.extend(batch_failures)
+            page_links.update(batch_links)
+            if cache is not None:
+                cache.hits += counters[0]
+                cache.disk_hits += counters[1]
+                cache.misses += counters[2]
+
+    return failures, page_links
+
+
+# Compiled layouts and variables of a pool worker, set once by _init_worker
+_worker_layouts: Layouts | None = None
+_worker_variables: Mapping[str, str] | None = None
+
+
+def _init_worker(
+    layouts: Layouts,
+    variables: Mapping[str, str] | None,
+    cache_settings: tuple[int, Path | None] | None = None,
+    image_attributes: Mapping[str, ImageAttributes] | None = None,
+) -> None:
+    global _worker_layouts, _worker_variables
+    _worker_layouts = layouts
+    _worker_variables = variables
+    if cache_settings is not None:
+        set_block_cache(*cache_settings)
+    if image_attributes:
+        set_image_attributes(image_attributes)
+
+
+def _generate_batch(
+    batch: list[tuple[Path, Path]],
+) -> tuple[list[tuple[Path, str]], dict[Path, list[Link]], tuple[int, int, int]]:
+    """Render a batch, returning its failures, the links of the pages
+    rendered and the block cache hits, disk hits and misses it caused."""
+    layouts = _worker_layouts
+    assert layouts is not None
+    cache = get_block_cache()
+    before = (0, 0, 0) if cache is None else (cache.hits, cache.disk_hits, cache.misses)
+
+    failures: list[tuple[Path, str]] = []
+    page_links: dict[Path, list[Link]] = {}
+    for src, dst in batch:
+        try:
+            page_links[src] = write_page(src, layouts, dst, _worker_variables)
+        except Exception as e:
+            failures.append((src, _describe_error(e)))
+
+    if cache is None:
+        return failures, page_links, (0, 0, 0)
+    after = (cache.hits, cache.disk_hits, cache.misses)
+    counters = (after[0] - before[0], after[1] - before[1], after[2] - before[2])
+    return failures, page_links, counters
+
+
+def _describe_error(error: Exception) -> str:
+    return f"{type(error).__name__}: {error}"
@@ -0,0 +1,143 @@
+"""Build-time syntax highlighting of fenced code blocks.
+
+A small regex tokenizer per language marks keywords, strings, comments,
+numbers and shell variables with `tok-*` classes styled by the site's
+stylesheet. Languages without a tokenizer are only escaped. Highlighted code
+is cached by language and content hash, so unchanged code samples are
+tokenized once per build.
+"""
+
+import html
+import re
+
+from render_cache import BlockCache
+
+# Bump whenever the highlighted HTML of some code changes
+HIGHLIGHT_VERSION = 1
+
+
+class Tokenizer:
+    """Matches the tokens of one language with a single alternation, tried
+    at every position so the leftmost token wins, e.g. a `#` inside a string
+    does not start a comment."""
+
+    def __init__(
+        self,
+        keywords: str,
+        comment: str,
+        string: str = r""""(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'""",
+        variable: str | None = None,
+    ) -> None:
+        groups = [("tok-com", comment), ("tok-str", string)]
+        if variable is not None:
+            groups.append(("tok-var", variable))
+        groups.append(
+            ("tok-num", r"\b(?:0[xX][0-9a-fA-F]+|\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)\b")
+        )
+        if keywords:
+            groups.append(("tok-kw", rf"\b(?:{'|'.join(keywords.split())})\b"))
+
+        self.classes = [token_class for token_class, _ in groups]
+        self.pattern = re.compile(
+            "|".join(f"({pattern})" for _, pattern in groups), re.MULTILINE
+        )
+
+    def highlight(self, code: str) -> str:
+        out: list[str] = []
+        last = 0
+        for match in self.pattern.finditer(code):
+            start, end = match.span()
+            if start == end:
+                continue
+            out.append(html.escape(code[last:start], quote=False))
+            token_class = self.classes[match.lastindex - 1] if match.lastindex else ""
+            token = html.escape(match.group(), quote=False)
+            out.append(f'<span class="{token_class}">{token}</span>')
+            last = end
+        out.append(html.escape(code[last:], quote=False))
+        return "".join(out)
+
+
+_c_comment = r"//[^\n]*|/\*[\s\S]*?\*/"
+
+_python = Tokenizer(
+    "False None True and as assert async await break class continue def del elif "
+    "else except finally for from global if import in is lambda nonlocal not or "
+    "pass raise return try while with yield match case",
+    r"#[^\n]*",
+    r'"""[\s\S]*?"""|' + r"'''[\s\S]*?'''|"
+    r""""(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'""",
+)
+_shell = Tokenizer(
+    "if then else elif fi for while until do done case esac in function return "
+    "export local readonly exit set unset shift source alias cd echo",
+    # "#" only starts a comment at the start of a word, not in "$#" or "a#b"
+    r"(?<![^\s;|&(])#[^\n]*",
+    r""""(?:\\.|[^"\\])*"|'[^']*'""",
+    variable=r"\$(?:\{[^}\n]*\}|\w+|[@#?$!*-])",
+)
+_javascript = Tokenizer(
+    "async await break case catch class const continue debugger default delete do "
+    "else export extends false finally for from function if import in instanceof "
+    "interface let new null of return static super switch this throw true try type "
+    "typeof undefined var void while yield",
+    _c_comment,
+    r""""(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*'|`(?:\\.|[^`\\])*`""",
+)
+_c_like = Tokenizer(
+    "auto bool break case catch char class const continue default delete do double "
+    "else enum extern false final float fn for func go goto if impl import int "
+    "interface let long match mut namespace new null package private protected pub "
+    "public return self short signed sizeof static struct super switch this throw "
+    "trait true try type typedef union unsigned use using var void volatile while",
+    _c_comment,
+)
+_json = Tokenizer("true false null", r"(?!)")
+_css = Tokenizer("", r"/\*[\s\S]*?\*/")
+
+TOKENIZERS: dict[str, Tokenizer] = {
+    "python": _python,
+    "py": _python,
+    "sh": _shell,
+    "bash": _shell,
+    "shell": _shell,
+    "zsh": _shell,
+    "console": _shell,
+    "javascript": _javascript,
+    "js": _javascript,
+    "typescript": _javascript,
+    "ts": _javascript,
+    "c": _c_like,
+    "cpp": _c_like,
+    "c++": _c_like,
+    "java": _c_like,
+    "go": _c_like,
+    "rust": _c_like,
+    "rs": _c_like,
+    "json": _json,
+    "css": _css,
+}
+
+# Highlighted HTML by language and content hash
+_cache = BlockCache(f"highlight-v{HIGHLIGHT_VERSION}", max_entries=2048)
+
+
+def highlight(code: str, language: str) -> str:
+    """HTML of `code`, escaped and with its tokens marked if `language` has a
+    tokenizer."""
+    tokenizer = TOKENIZERS.get(language.lower())
+    if tokenizer is None:
+        return html.escape(code, quote=False)
+
+    key = _cache.key(f"{language.lower()}\0{code}")
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached[0]
+    highlighted = tokenizer.highlight(code)
+    _cache.put(key, highlighted)
+    return highlighted
+
+
+def highlight_cache() -> BlockCache:
+    """The cache of highlighted code, for its hit and miss counters."""
+    return _cache
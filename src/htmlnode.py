@@ -1,18 +1,31 @@
-from typing import Sequence
+import sys
+from typing import Iterator, Mapping, Sequence, TextIO
+
+# Element attributes, as a mapping or as (name, value) pairs
+Props = Mapping[str, str] | tuple[tuple[str, str], ...]
 
 
 class HTMLNode:
+    """An HTML element.
+
+    Nodes are compact since a large page holds many of them: attributes live
+    in __slots__, tags are interned, children are stored as a tuple and props
+    as a tuple of (name, value) pairs.
+    """
+
+    __slots__ = ("tag", "value", "children", "props")
+
     def __init__(
         self,
         tag: str | None,
         value: str | None,
         children: Sequence["HTMLNode"] | None,
-        props: dict[str, str] | None,
+        props: Props | None,
     ) -> None:
-        self.tag = tag
+        self.tag = sys.intern(tag) if tag is not None else None
         self.value = value
-        self.children = children
-        self.props = props
+        self.children = tuple(children) if children is not None else None
+        self.props = _compact_props(props)
 
     def __repr__(self) -> str:
         return f"tag: {self.tag}, value: {self.value}, children: {self.children}, props: {self.props}"
@@ -24,26 +37,38 @@ class HTMLNode:
             self.tag == other.tag
             and self.value == other.value
             and self.children == other.children
-            and self.props == other.props
+            # Attribute order does not make elements different
+            and dict(self.props or ()) == dict(other.props or ())
         )
 
     def to_html(self) -> str:
+        return "".join(self.iter_html())
+
+    def iter_html(self) -> Iterator[str]:
         raise NotImplementedError
 
+    def write_html(self, fp: TextIO) -> None:
+        fp.writelines(self.iter_html())
+
     def props_to_html(self) -> str:
         if self.props is None:
             return ""
 
-        html = ""
-        for prop in self.props:
-            html += f' {prop}="{self.props[prop]}"'
-        return html
+        return "".join(f' {prop}="{value}"' for prop, value in self.props)
+
+
+def _compact_props(props: Props | None) -> tuple[tuple[str, str], ...] | None:
+    if not props:
+        return None
+    if isinstance(props, tuple):
+        return props
+    return tuple(props.items())
 
 
 class LeafNode(HTMLNode):
-    def __init__(
-        self, tag: str | None, value: str, props: dict[str, str] | None = None
-    ) -> None:
+    __slots__ = ()
+
+    def __init__(self, tag: str | None, value: str, props: Props | None = None) -> None:
         super().__init__(tag, value, None, props)
 
     def to_html(self) -> str:
@@ -55,22 +80,26 @@ class LeafNode(HTMLNode):
 
         return f"<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>"
 
+    def iter_html(self) -> Iterator[str]:
+        yield self.to_html()
+
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(
         self,
         tag: str,
         children: Sequence[HTMLNode],
-        props: dict[str, str] | None = None,
+        props: Props | None = None,
     ) -> None:
         super().__init__(tag, None, children, props)
 
-    def to_html(self) -> str:
+    def iter_html(self) -> Iterator[str]:
         if self.children is None or self.tag is None:
             raise ValueError
 
-        value = ""
+        yield f"<{self.tag}{self.props_to_html()}>"
         for child in self.children:
-            value += child.to_html()
-
-        return f"<{self.tag}{self.props_to_html()}>{value}</{self.tag}>"
+            yield from child.iter_html()
+        yield f"</{self.tag}>"
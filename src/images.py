@@ -0,0 +1,307 @@
+"""Image stage of a build: dimensions and downscaled variants of the images
+under `static/`.
+
+Dimensions are read from the first bytes of PNG, GIF, WebP and JPEG files
+without decoding them, so every `<img>` of an image in `static/` gets its
+`width` and `height` and the browser reserves its box before it loads.
+
+With target widths set, smaller copies of every image wider than a target
+are generated on a process pool with Pillow, an optional dependency, and
+listed in a `srcset` so small screens download small files. Variants are
+cached under the cache directory by source content hash and width, so they
+are only generated again when their source changes.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import hashlib
+import importlib
+import importlib.util
+import json
+import os
+from pathlib import Path
+import shutil
+import struct
+from typing import Any, BinaryIO, Iterable
+
+from manifest import BuildManifest
+from textnode import ImageAttributes
+from walk import walk_tree
+
+IMAGE_SUFFIXES = frozenset({".png", ".gif", ".webp", ".jpg", ".jpeg"})
+# Animated GIFs would lose every frame but the first
+VARIANT_SUFFIXES = frozenset({".png", ".webp", ".jpg", ".jpeg"})
+
+
+def image_size(path: Path) -> tuple[int, int] | None:
+    """(width, height) of a PNG, GIF, WebP or JPEG image read from its
+    header, or None if the file is none of these or is truncated."""
+    try:
+        with open(path, "rb") as f:
+            return _read_size(f)
+    except (OSError, struct.error):
+        return None
+
+
+def _read_size(f: BinaryIO) -> tuple[int, int] | None:
+    head = f.read(30)
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and head[12:16] == b"IHDR":
+        width, height = struct.unpack(">II", head[16:24])
+        return width, height
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        width, height = struct.unpack("<HH", head[6:10])
+        return width, height
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return _webp_size(head)
+    if head[:2] == b"\xff\xd8":
+        f.seek(2)
+        return _jpeg_size(f)
+    return None
+
+
+def _webp_size(head: bytes) -> tuple[int, int] | None:
+    chunk = head[12:16]
+    if chunk == b"VP8 " and head[23:26] == b"\x9d\x01\x2a":
+        width, height = struct.unpack("<HH", head[26:30])
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L" and head[20:21] == b"\x2f":
+        (bits,) = struct.unpack("<I", head[21:25])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    if chunk == b"VP8X" and len(head) >= 30:
+        width = int.from_bytes(head[24:27], "little") + 1
+        height = int.from_bytes(head[27:30], "little") + 1
+        return width, height
+    return None
+
+
+def _jpeg_size(f: BinaryIO) -> tuple[int, int] | None:
+    """Walk the marker segments up to the frame header (SOFn), which holds
+    the dimensions."""
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        kind = marker[1]
+        while kind == 0xFF:
+            # Markers may be padded with any number of 0xFF bytes
+            padding = f.read(1)
+            if not padding:
+                return None
+            kind = padding[0]
+        if kind == 0x01 or 0xD0 <= kind <= 0xD7:
+            # Standalone markers have no length
+            continue
+        (length,) = struct.unpack(">H", f.read(2))
+        if 0xC0 <= kind <= 0xCF and kind not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def pillow_available() -> bool:
+    return importlib.util.find_spec("PIL") is not None
+
+
+class ImageStats:
+    def __init__(self) -> None:
+        self.images = 0
+        self.generated = 0
+        self.reused = 0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.images} images, generated {self.generated} variants "
+            f"({self.reused} cached)"
+        )
+
+
+class ImageStage:
+    """Attributes of the `<img>` of every image under `static`, and the
+    variants behind their srcset.
+
+    The size, mtime, content hash and dimensions of every image are kept in
+    `cache_dir/index.json`, so unchanged images are neither read nor hashed
+    again, and variants are stored in `cache_dir/variants`. Images are only
+    hashed once a variant of them is needed.
+    """
+
+    version = 1
+
+    def __init__(
+        self,
+        static: Path,
+        public: Path,
+        cache_dir: Path,
+        widths: Iterable[int] = (),
+    ) -> None:
+        self.static = static
+        self.public = public
+        self.cache_dir = cache_dir
+        self.widths = sorted(set(widths))
+        # static path -> {"fingerprint", "hash", "width", "height"}, "hash" is
+        # empty until variants() needs it
+        self.images: dict[str, dict[str, Any]] = {}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.cache_dir / "index.json", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get("version") == self.version:
+            self.images = data.get("images", {})
+
+    def save(self) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.cache_dir / "index.json"
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "images": self.images}, f)
+        tmp_path.replace(path)
+
+    def build(
+        self, workers: int = 1, manifest: BuildManifest | None = None
+    ) -> tuple[dict[str, ImageAttributes], ImageStats]:
+        """Read the images under `static`, write their variants into `public`
+        and return the attributes of every image by URL."""
+        stats = ImageStats()
+        images: dict[str, dict[str, Any]] = {}
+        for path in sorted(self._walk()):
+            entry = self._scan(path)
+            if entry is not None:
+                images[str(path)] = entry
+        self.images = images
+        stats.images = len(images)
+
+        variants = self.variants() if pillow_available() else {}
+        jobs = [
+            (src, cached, width)
+            for src, cached, width, _ in variants.values()
+            if not cached.exists()
+        ]
+        stats.generated = len(jobs)
+        stats.reused = len(variants) - len(jobs)
+        if workers > 1 and len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                list(pool.map(_make_variant, jobs))
+        else:
+            for job in jobs:
+                _make_variant(job)
+
+        attributes: dict[str, ImageAttributes] = {}
+        srcsets: dict[str, list[str]] = {}
+        for key, (src, cached, width, dst) in variants.items():
+            if not cached.exists():
+                # Pillow could not read the source, it is served as is
+                stats.generated -= 1
+                continue
+            _install(cached, dst)
+            if manifest is not None:
+                manifest.record("assets", Path(key), dst, cached.stem)
+            srcsets.setdefault(str(src), []).append(f"{self._url(dst)} {width}w")
+
+        for src, entry in images.items():
+            url = self._url(self.public / Path(src).relative_to(self.static))
+            attributes[url] = (
+                ("width", str(entry["width"])),
+                ("height", str(entry["height"])),
+            )
+            if src in srcsets:
+                srcset = srcsets[src] + [f"{url} {entry['width']}w"]
+                attributes[url] += (("srcset", ", ".join(srcset)),)
+        return attributes, stats
+
+    def variants(self) -> dict[str, tuple[Path, Path, int, Path]]:
+        """(source, cached file, width, output) of every variant, keyed by
+        "<source>@<width>w"."""
+        variants: dict[str, tuple[Path, Path, int, Path]] = {}
+        for src, entry in self.images.items():
+            path = Path(src)
+            if path.suffix.lower() not in VARIANT_SUFFIXES:
+                continue
+            dst = self.public / path.relative_to(self.static)
+            digest = entry["hash"]
+            for width in self.widths:
+                if width >= entry["width"]:
+                    break
+                if not digest:
+                    digest = entry["hash"] = _hash_image(path)
+                cached = (
+                    self.cache_dir
+                    / "variants"
+                    / digest[:2]
+                    / f"{digest}-{width}w{path.suffix.lower()}"
+                )
+                output = dst.with_name(f"{dst.stem}-{width}w{dst.suffix}")
+                variants[f"{src}@{width}w"] = (path, cached, width, output)
+        return variants
+
+    def _walk(self) -> Iterable[Path]:
+        for dirpath, _, filenames in walk_tree(self.static):
+            for name in filenames:
+                if Path(name).suffix.lower() in IMAGE_SUFFIXES:
+                    yield Path(dirpath) / name
+
+    def _scan(self, path: Path) -> dict[str, Any] | None:
+        stat = path.stat()
+        fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}"
+        entry = self.images.get(str(path))
+        if entry is not None and entry["fingerprint"] == fingerprint:
+            return entry
+
+        size = image_size(path)
+        if size is None:
+            return None
+        return {
+            "fingerprint": fingerprint,
+            "hash": "",
+            "width": size[0],
+            "height": size[1],
+        }
+
+    def _url(self, path: Path) -> str:
+        return "/" + path.relative_to(self.public).as_posix()
+
+
+def _hash_image(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _make_variant(job: tuple[Path, Path, int]) -> None:
+    """Write the `width` pixels wide copy of `src` to `cached`."""
+    # Pillow is optional, only builds with variant widths need it
+    Image = importlib.import_module("PIL.Image")
+
+    src, cached, width = job
+    cached.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = cached.with_name(f"{cached.name}.{os.getpid()}.tmp")
+    try:
+        with Image.open(src) as image:
+            height = max(1, round(image.height * width / image.width))
+            resized = image.resize((width, height), Image.Resampling.LANCZOS)
+            resized.save(tmp_path, format=image.format, optimize=True)
+    except (OSError, ValueError):
+        tmp_path.unlink(missing_ok=True)
+        return
+    tmp_path.replace(cached)
+
+
+def _install(cached: Path, dst: Path) -> None:
+    """Copy a cached variant into the output tree unless it is already
+    there. Copies keep the mtime of the cached file."""
+    cached_stat = cached.stat()
+    try:
+        dst_stat = dst.stat()
+        if (dst_stat.st_size, dst_stat.st_mtime_ns) == (
+            cached_stat.st_size,
+            cached_stat.st_mtime_ns,
+        ):
+            return
+    except FileNotFoundError:
+        pass
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(cached, dst)
@@ -0,0 +1,130 @@
+"""Site-wide index of links and a checker for the internal ones.
+
+Every link and image target is collected while pages render, so checking
+them needs no crawl: internal targets are resolved against the set of paths
+in the output tree and `static/`, built with one walk of each.
+"""
+
+from pathlib import Path
+import posixpath
+from typing import Iterable, Iterator
+from urllib.parse import unquote, urlsplit
+
+from textnode import Link
+from walk import walk_tree
+
+
+class LinkIndex:
+    """Links and images of every page, keyed by source page."""
+
+    def __init__(self) -> None:
+        # source -> (output, links)
+        self.pages: dict[Path, tuple[Path, list[Link]]] = {}
+
+    def add(self, src: Path, dst: Path, links: Iterable[Link]) -> None:
+        self.pages[src] = (dst, list(links))
+
+    def __iter__(self) -> Iterator[tuple[Path, Path, str, str]]:
+        """(source, output, kind, target) of every link."""
+        for src, (dst, links) in self.pages.items():
+            for kind, target in links:
+                yield src, dst, kind, target
+
+    def __len__(self) -> int:
+        return sum(len(links) for _, links in self.pages.values())
+
+
+class BrokenLink:
+    def __init__(self, src: Path, kind: str, target: str) -> None:
+        self.src = src
+        self.kind = kind
+        self.target = target
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, BrokenLink):
+            return NotImplemented
+        return (self.src, self.kind, self.target) == (
+            other.src,
+            other.kind,
+            other.target,
+        )
+
+    def __repr__(self) -> str:
+        return f"BrokenLink({self.src}, {self.kind}, {self.target})"
+
+    def __str__(self) -> str:
+        return f"'{self.src}': {self.kind} '{self.target}' not found"
+
+
+def collect_paths(*roots: Path) -> frozenset[str]:
+    """Paths of the files under `roots`, relative to their root and in URL
+    form ("blog/index.html")."""
+    paths: set[str] = set()
+    for root in roots:
+        for dirpath, _, filenames in walk_tree(root):
+            relative = Path(dirpath).relative_to(root).as_posix()
+            prefix = "" if relative == "." else relative + "/"
+            paths.update(prefix + name for name in filenames)
+    return frozenset(paths)
+
+
+def resolve_target(page: str, target: str) -> str | None:
+    """Path, relative to the site root, that `target` points to from the
+    page at URL path `page` ("blog/index.html"). None for external targets
+    and links within the page."""
+    return _resolve(posixpath.dirname(page), target)
+
+
+def _resolve(page_dir: str, target: str) -> str | None:
+    if ":" in target or target.startswith("//"):
+        parts = urlsplit(target)
+        if parts.scheme or parts.netloc:
+            return None
+        path = parts.path
+    else:
+        # Plain paths, by far the most common, need no full URL parsing
+        path = target.partition("#")[0].partition("?")[0]
+    if "%" in path:
+        path = unquote(path)
+    if not path:
+        return None
+    if not path.startswith("/"):
+        path = f"/{page_dir}/{path}"
+    # Like browsers, ".." stops at the root. normpath keeps a leading "//",
+    # and a trailing slash names an index page
+    resolved = posixpath.normpath(path)
+    resolved = "/" + resolved.lstrip("/")
+    if path.endswith("/") and resolved != "/":
+        resolved += "/"
+    return resolved[1:]
+
+
+def is_served(path: str, paths: frozenset[str]) -> bool:
+    """Whether the preview server answers `path` with a file: the file itself
+    or, for directories, their index.html."""
+    if path == "" or path.endswith("/"):
+        return path + "index.html" in paths
+    return path in paths or path + "/index.html" in paths
+
+
+def check_links(
+    index: LinkIndex, public: Path, paths: frozenset[str]
+) -> list[BrokenLink]:
+    """Internal links and images of `index` that point to none of `paths`,
+    as collect_paths() returns them for the output tree and `static/`, in
+    page order."""
+    # Pages share most targets (navigation, assets), resolve each only once
+    # per directory, and absolute ones once for the site
+    found: dict[tuple[str, str], bool] = {}
+    broken: list[BrokenLink] = []
+    for src, (dst, links) in index.pages.items():
+        page_dir = posixpath.dirname(dst.relative_to(public).as_posix())
+        for kind, target in links:
+            key = ("" if target.startswith("/") else page_dir, target)
+            ok = found.get(key)
+            if ok is None:
+                path = _resolve(page_dir, target)
+                ok = found[key] = path is None or is_served(path, paths)
+            if not ok:
+                broken.append(BrokenLink(src, kind, target))
+    return broken
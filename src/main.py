@@ -1,19 +1,310 @@
+import argparse
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
 from pathlib import Path
+from compress import compress_tree
 from generate import (
+    COPY_MODES,
+    BuildError,
+    collect_page_jobs,
     generate_page_recursive,
     prep_public_folder,
     copy_recursive,
 )
+from images import ImageStage, pillow_available
+from linkcheck import BrokenLink, LinkIndex, check_links, collect_paths
+from manifest import BuildManifest
+from markdown_blocks import set_block_cache
+from profiler import Profiler
+from search import SEARCH_DIR, SearchIndexBuilder
+from template import Layouts
+from textnode import set_image_attributes
+from watch import ReloadNotifier, SiteRebuilder, watch_site
+
+MANIFEST_PATH = Path(".build-manifest.json")
+SEARCH_CACHE_PATH = Path(".search-cache.json")
+IMAGE_CACHE_DIR = Path(".image-cache")
 
 
 def main():
-    public = Path("public")
-    prep_public_folder(public)
-    copy_recursive(Path("static"), public)
+    parser = argparse.ArgumentParser(description="Static site generator")
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only rebuild outputs whose sources changed since the last build",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="After building, rebuild affected outputs whenever a source changes "
+        "(implies --incremental)",
+    )
+    parser.add_argument(
+        "--notify",
+        metavar="URL",
+        help="With --watch, post rebuilt paths to a live reload endpoint, e.g. "
+        "http://localhost:8888/__livereload",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes rendering pages, 0 for one per CPU",
+    )
+    parser.add_argument(
+        "--link",
+        choices=COPY_MODES,
+        default="copy",
+        help="Hardlink or reflink static files into public/ instead of copying "
+        "them, when both are on the same filesystem",
+    )
+    parser.add_argument(
+        "--hash-assets",
+        action="store_true",
+        help="Compare static files by content when only their mtime changed "
+        "(with --incremental or --watch, a plain build copies every file)",
+    )
+    parser.add_argument(
+        "--copy-threads",
+        type=int,
+        default=4,
+        metavar="N",
+        help="Number of threads copying static files",
+    )
+    parser.add_argument(
+        "--verbose",
+        action="store_true",
+        help="Print every static file copied",
+    )
+    parser.add_argument(
+        "--var",
+        action="append",
+        default=[],
+        metavar="NAME=VALUE",
+        help="Site-wide template variable, e.g. --var Nav='<a href=\"/\">Home</a>'",
+    )
+    parser.add_argument(
+        "--layouts",
+        type=Path,
+        default=Path("layouts"),
+        metavar="DIR",
+        help="Directory of the layouts pages can pick in their front matter, "
+        "e.g. 'layout: post' for DIR/post.html",
+    )
+    parser.add_argument(
+        "--block-cache",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Keep up to N rendered blocks in memory, so repeated blocks are "
+        "rendered once",
+    )
+    parser.add_argument(
+        "--block-cache-dir",
+        type=Path,
+        metavar="DIR",
+        help="Also store rendered blocks under DIR, reusing them across builds",
+    )
+    parser.add_argument(
+        "--image-widths",
+        default="",
+        metavar="W,W,...",
+        help="Generate copies of static images downscaled to these widths in "
+        "pixels and list them in a srcset, e.g. 480,960 (requires Pillow)",
+    )
+    parser.add_argument(
+        "--no-image-sizes",
+        action="store_true",
+        help="Skip reading static images, so <img> tags get no width and height",
+    )
+    parser.add_argument(
+        "--search",
+        action="store_true",
+        help="Write a full-text search index of the pages under public/search",
+    )
+    parser.add_argument(
+        "--no-check-links",
+        action="store_true",
+        help="Skip checking that internal links and images point to existing "
+        "files, which fails the build when one does not",
+    )
+    parser.add_argument(
+        "--no-precompress",
+        action="store_true",
+        help="Skip writing .gz siblings of compressible outputs",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Time every build stage and report the slowest pages",
+    )
+    parser.add_argument(
+        "--profile-top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Number of slowest pages to report with --profile",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        type=Path,
+        metavar="PATH",
+        help="Also write a Chrome trace-event JSON file with --profile",
+    )
+    args = parser.parse_args()
+    workers = args.workers or os.cpu_count() or 1
+
+    profiler: Profiler | None = None
+    if args.profile:
+        if workers > 1:
+            print("Profiling renders pages in-process, ignoring --workers")
+            workers = 1
+        profiler = Profiler(trace=args.profile_trace is not None)
+        profiler.install()
+
+    variables: dict[str, str] = {}
+    for var in args.var:
+        name, sep, value = var.partition("=")
+        if not sep:
+            parser.error(f"invalid --var '{var}', expected NAME=VALUE")
+        variables[name] = value
+
+    try:
+        image_widths = [int(w) for w in args.image_widths.split(",") if w.strip()]
+    except ValueError:
+        parser.error(f"invalid --image-widths '{args.image_widths}'")
+    if image_widths and args.no_image_sizes:
+        parser.error("--image-widths cannot be used with --no-image-sizes")
+
+    block_cache = set_block_cache(args.block_cache, args.block_cache_dir)
 
+    public = Path("public")
     content = Path("content")
+    static = Path("static")
     template = Path("template.html")
-    generate_page_recursive(content, template, public)
+
+    # Every layout is resolved and compiled once, before anything is written
+    try:
+        layouts = Layouts(template, args.layouts)
+    except Exception as e:
+        raise SystemExit(f"Invalid layout: {e}")
+
+    manifest: BuildManifest | None = None
+    if args.incremental or args.watch:
+        manifest = BuildManifest.load(MANIFEST_PATH)
+        if manifest.use_template(template, variables):
+            print(f"Template '{template}' changed, re-rendering all pages...")
+        public.mkdir(exist_ok=True, parents=True)
+    else:
+        prep_public_folder(public)
+
+    copy_stats = copy_recursive(
+        static,
+        public,
+        manifest,
+        args.link,
+        args.hash_assets,
+        args.copy_threads,
+        args.verbose,
+    )
+    print(f"Static files: {copy_stats}")
+
+    images: ImageStage | None = None
+    if not args.no_image_sizes:
+        if image_widths and not pillow_available():
+            print("Pillow is not installed, skipping image variants")
+        images = ImageStage(static, public, IMAGE_CACHE_DIR, image_widths)
+        image_attributes, image_stats = images.build(workers, manifest)
+        images.save()
+        set_image_attributes(image_attributes)
+        print(f"Images: {image_stats}")
+
+    link_index = None if args.no_check_links else LinkIndex()
+    build_error: BuildError | None = None
+    try:
+        generate_page_recursive(
+            content, layouts, public, manifest, workers, variables, link_index
+        )
+    except BuildError as e:
+        build_error = e
+
+    if block_cache is not None:
+        print(f"Block cache: {block_cache}")
+
+    if manifest is not None:
+        for path in manifest.prune(public):
+            print(f"Removing stale output '{path}' ...")
+
+    search: SearchIndexBuilder | None = None
+    if args.search:
+        search = SearchIndexBuilder.load(SEARCH_CACHE_PATH)
+        indexed, reused = search.update(collect_page_jobs(content, public), public)
+        changed = search.write(public / SEARCH_DIR)
+        search.save()
+        print(
+            f"Search index: read {indexed} pages ({reused} unchanged), "
+            f"updated {len(changed)} files"
+        )
+
+    # Links are checked on a thread while outputs are precompressed, against
+    # the paths as they are before .gz siblings appear
+    broken: list[BrokenLink] = []
+    with ThreadPoolExecutor(max_workers=1) as link_checker:
+        link_check: Future[list[BrokenLink]] | None = None
+        if link_index is not None:
+            paths = collect_paths(public, static)
+            link_check = link_checker.submit(check_links, link_index, public, paths)
+
+        if not args.no_precompress:
+            compressed, skipped = compress_tree(
+                public,
+                workers,
+                incompressible=None if manifest is None else manifest.incompressible,
+                written=None if manifest is None else manifest.compressed,
+            )
+            print(f"Precompressed {compressed} files ({skipped} already up to date)")
+
+        if link_index is not None and link_check is not None:
+            broken = link_check.result()
+            print(f"Checked {len(link_index)} links, {len(broken)} broken")
+            for link in broken:
+                print(f"  {link}")
+
+    if manifest is not None:
+        manifest.save()
+
+    if profiler is not None:
+        profiler.uninstall()
+        print(profiler.report(args.profile_top))
+        if args.profile_trace is not None:
+            profiler.write_trace(args.profile_trace)
+            print(f"Trace written to '{args.profile_trace}'")
+
+    if args.watch:
+        assert manifest is not None
+        if build_error is not None:
+            print(build_error)
+        rebuilder = SiteRebuilder(
+            content,
+            static,
+            template,
+            public,
+            manifest,
+            workers,
+            variables,
+            precompress=not args.no_precompress,
+            copy_mode=args.link,
+            verify_hash=args.hash_assets,
+            search=search,
+            images=images,
+            layouts=layouts,
+        )
+        notifier = ReloadNotifier(args.notify, public) if args.notify else None
+        watch_site(rebuilder, on_rebuild=notifier)
+    elif build_error is not None:
+        raise SystemExit(str(build_error))
+    elif broken:
+        raise SystemExit(f"{len(broken)} broken link(s)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable, Mapping
+
+from compress import gzip_path
+from textnode import Link
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BuildManifest:
+    """Source hashes and output paths of the previous build.
+
+    Entries are grouped in sections ("pages", "assets") and keyed by source
+    path. Every source visited during a build is marked as seen, so entries
+    that were not visited belong to deleted sources and can be pruned. Page
+    entries also keep the links of the page, so pages that are not rendered
+    again still have their links checked. Outputs that gzip does not shrink
+    are kept in `incompressible` with their size and mtime, so precompression
+    skips them until they change, and the `.gz` files precompression wrote
+    are kept in `compressed`, so it only ever removes its own.
+    """
+
+    version = 2
+    sections = ("pages", "assets")
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.template_hash = ""
+        self.entries: dict[str, dict[str, dict[str, Any]]] = {
+            section: {} for section in self.sections
+        }
+        self.incompressible: dict[str, str] = {}
+        self.compressed: set[str] = set()
+        self._seen: dict[str, set[str]] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> "BuildManifest":
+        manifest = cls(path)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return manifest
+
+        if data.get("version") != cls.version:
+            return manifest
+
+        manifest.template_hash = data.get("template_hash", "")
+        for section in cls.sections:
+            manifest.entries[section] = data.get(section, {})
+        manifest.incompressible = data.get("incompressible", {})
+        manifest.compressed = set(data.get("compressed", []))
+        return manifest
+
+    def save(self) -> None:
+        data: dict[str, Any] = {
+            "version": self.version,
+            "template_hash": self.template_hash,
+            "incompressible": self.incompressible,
+            "compressed": sorted(self.compressed),
+        }
+        data.update(self.entries)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        tmp_path.replace(self.path)
+
+    def use_template(
+        self, template_path: Path, variables: Mapping[str, str] | None = None
+    ) -> bool:
+        """Register the template and site-wide variables of this build,
+        invalidating every page entry if either changed. Returns True when
+        pages must be fully re-rendered."""
+        digest = hash_file(template_path)
+        if variables:
+            digest = hashlib.sha256(
+                (digest + json.dumps(variables, sort_keys=True)).encode()
+            ).hexdigest()
+        if digest == self.template_hash:
+            return False
+
+        self.template_hash = digest
+        for entry in self.entries["pages"].values():
+            # Keep the output path so pages deleted meanwhile still get pruned
+            entry["hash"] = ""
+        return True
+
+    def visit(self, section: str) -> None:
+        """Mark `section` as walked in full by this build, so its entries are
+        pruned even when none of its sources is left."""
+        self._seen.setdefault(section, set())
+
+    def is_fresh(self, section: str, src: Path, dst: Path, digest: str) -> bool:
+        key = str(src)
+        self._seen.setdefault(section, set()).add(key)
+
+        entry = self.entries[section].get(key)
+        if entry is None:
+            return False
+        return entry["hash"] == digest and entry["output"] == str(dst) and dst.exists()
+
+    def record(
+        self,
+        section: str,
+        src: Path,
+        dst: Path,
+        digest: str,
+        links: Iterable[Link] | None = None,
+    ) -> None:
+        key = str(src)
+        self._seen.setdefault(section, set()).add(key)
+
+        previous = self.entries[section].get(key)
+        if previous is not None and previous["output"] != str(dst):
+            Path(previous["output"]).unlink(missing_ok=True)
+
+        entry: dict[str, Any] = {"hash": digest, "output": str(dst)}
+        if links is not None:
+            entry["links"] = [[kind, target] for kind, target in links]
+        self.entries[section][key] = entry
+
+    def links(self, section: str, src: Path) -> list[Link]:
+        """Links recorded with the entry of `src`."""
+        entry = self.entries[section].get(str(src), {})
+        return [(kind, target) for kind, target in entry.get("links", [])]
+
+    def discard(self, section: str, src: Path, root: Path) -> list[Path]:
+        """Forget `src`, or every source under it if it was a directory, and
+        delete their outputs. Returns the deleted outputs."""
+        prefix = str(src) + os.sep
+        entries = self.entries[section]
+        removed: list[Path] = []
+        for key in [k for k in entries if k == str(src) or k.startswith(prefix)]:
+            output = Path(entries.pop(key)["output"])
+            self._remove_output(output, root)
+            removed.append(output)
+
+        return removed
+
+    def prune(self, root: Path) -> list[Path]:
+        """Delete outputs of sources that were not seen during this build.
+
+        Only sections that were visited or walked are pruned, and empty
+        directories left behind are removed up to `root`.
+        """
+        removed: list[Path] = []
+        for section, seen in self._seen.items():
+            entries = self.entries[section]
+            for key in [key for key in entries if key not in seen]:
+                output = Path(entries.pop(key)["output"])
+                self._remove_output(output, root)
+                removed.append(output)
+
+        return removed
+
+    def _remove_output(self, output: Path, root: Path) -> None:
+        output.unlink(missing_ok=True)
+        # Its .gz sibling would otherwise keep the directory from being removed
+        compressed = gzip_path(output)
+        if str(compressed) in self.compressed:
+            compressed.unlink(missing_ok=True)
+            self.compressed.discard(str(compressed))
+        _remove_empty_parents(output, root)
+
+
+def _remove_empty_parents(path: Path, root: Path) -> None:
+    root = root.resolve()
+    parent = path.parent.resolve()
+    while parent != root and root in parent.parents:
+        try:
+            parent.rmdir()
+        except OSError:
+            return
+        parent = parent.parent
@@ -1,8 +1,20 @@
 from enum import Enum
+from pathlib import Path
 import re
-
-from htmlnode import HTMLNode, ParentNode
-from textnode import text_node_to_html_node, text_to_textnodes
+import textwrap
+from typing import Iterable, Iterator
+
+from highlight import highlight
+from htmlnode import HTMLNode, LeafNode, ParentNode
+from render_cache import BlockCache
+from textnode import (
+    Link,
+    extract_markdown_images,
+    image_digest,
+    render_inline,
+    text_node_to_html_node,
+    text_to_textnodes,
+)
 
 
 class BlockType(Enum):
@@ -14,153 +26,432 @@ class BlockType(Enum):
     block_type_o_list = "ordered_list"
 
 
+_heading_marker = re.compile(r"#{1,6} ")
+_list_marker = re.compile(r"[*|\-|>] ")
+_ordered_marker = re.compile(r"(\d+)\. ")
+_ordered_prefix = re.compile(r"\d\. ")
+# Fence languages that are safe to write into a class attribute
+_code_language = re.compile(r"[\w+#.-]+")
+# Largest fenced code block rejoined across its blank lines. Past it an
+# unclosed fence is taken as stray, so a stream never buffers the rest of
+# its file waiting for the close
+MAX_FENCE_SIZE = 1 << 20
+# Characters besides "\n" that str.splitlines() breaks lines on
+_other_line_breaks = re.compile("[\r\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
+class Block:
+    """A markdown block with its type and lines, so converters need not
+    re-parse it. `level` is the heading level of heading blocks."""
+
+    __slots__ = ("type", "text", "lines", "level")
+
+    def __init__(
+        self, block_type: BlockType, text: str, lines: list[str], level: int = 0
+    ) -> None:
+        self.type = block_type
+        self.text = text
+        self.lines = lines
+        self.level = level
+
+    @classmethod
+    def parse(cls, text: str) -> "Block":
+        lines = text.splitlines()
+        block_type, level = classify_block(text, lines)
+        return cls(block_type, text, lines, level)
+
+    def __repr__(self) -> str:
+        return f"Block({self.type.value}, {self.text!r})"
+
+
+# Bump whenever the HTML rendered for some block changes, so cached
+# fragments of the previous renderer are not reused
+RENDERER_VERSION = 3
+
+# Rendered fragments by block text, None when caching is off
+_block_cache: BlockCache | None = None
+
+
+def set_block_cache(
+    max_entries: int = 0, cache_dir: Path | None = None
+) -> BlockCache | None:
+    """Cache rendered blocks in an LRU of `max_entries` and, with
+    `cache_dir`, on disk across builds. Returns the cache, or None when both
+    are off, which disables caching."""
+    global _block_cache
+    if max_entries > 0 or cache_dir is not None:
+        _block_cache = BlockCache(f"v{RENDERER_VERSION}", max_entries, cache_dir)
+    else:
+        _block_cache = None
+    return _block_cache
+
+
+def get_block_cache() -> BlockCache | None:
+    return _block_cache
+
+
 def markdown_to_html(markdown: str) -> str:
-    blocks = markdown_to_blocks(markdown)
-    html_blocks = []
-    for block in blocks:
-        # print(block_to_htmlnode(block))
-        html_blocks.append(block_to_htmlnode(block).to_html())
+    return "".join(markdown_to_html_chunks(markdown))
 
-    return "".join(html_blocks)
 
+def markdown_to_html_chunks(
+    markdown: str, links: list[Link] | None = None
+) -> Iterator[str]:
+    return blocks_to_html_chunks(scan_blocks(markdown), links)
 
-def markdown_to_blocks(markdown: str) -> list[str]:
-    output: list[str] = []
-    blocks = markdown.split("\n\n")
+
+def markdown_stream_to_html_chunks(
+    chunks: Iterable[str], links: list[Link] | None = None
+) -> Iterator[str]:
+    """markdown_to_html_chunks() of markdown read piece by piece."""
+    return blocks_to_html_chunks(scan_blocks_stream(chunks), links)
+
+
+def blocks_to_html_chunks(
+    blocks: Iterable[Block], links: list[Link] | None = None
+) -> Iterator[str]:
+    """The HTML of every block, rendered through the block cache if set.
+    Links and images are added to `links` as they are rendered."""
+    cache = _block_cache
     for block in blocks:
-        block = block.strip(" \n")
-        if block != "":
-            output.append(block)
+        if cache is None:
+            out: list[str] = []
+            block_to_html(block, out, links)
+            yield "".join(out)
+            continue
+
+        text = block.text
+        if "![" in text:
+            # The <img> attributes come from the image files, not the text
+            images = image_digest(
+                ("image", url) for _, url in extract_markdown_images(text)
+            )
+            if images:
+                text = f"{images}\0{text}"
+        key = cache.key(text)
+        cached = cache.get(key)
+        if cached is None:
+            out = []
+            block_links: list[Link] = []
+            block_to_html(block, out, block_links)
+            cached = ("".join(out), tuple(block_links))
+            cache.put(key, *cached)
+        if links is not None:
+            links.extend(cached[1])
+        yield cached[0]
+
+
+def markdown_to_htmlnodes(markdown: str) -> Iterator[HTMLNode]:
+    """The HTML node tree of every block, for callers that inspect or
+    transform it rather than render it."""
+    for block in scan_blocks(markdown):
+        yield block_to_htmlnode(block)
+
+
+def markdown_to_blocks(markdown: str) -> list[str]:
+    return [block.text for block in scan_blocks(markdown)]
+
+
+def scan_blocks(markdown: str) -> Iterator[Block]:
+    """Split markdown into typed blocks in a single pass.
+
+    Each block is split into lines once, and those lines are shared by the
+    classifier and the converters.
+    """
+    # Rare, e.g. "\r\n" line endings: break lines as str.splitlines() does
+    split_further = _other_line_breaks.search(markdown) is not None
+    for text in _join_fences(markdown.split("\n\n")):
+        text = text.strip(" \n")
+        if not text:
+            continue
+        lines = text.splitlines() if split_further else text.split("\n")
+        block_type, level = classify_block(text, lines)
+        yield Block(block_type, text, lines, level)
+
+
+def scan_blocks_stream(chunks: Iterable[str]) -> Iterator[Block]:
+    """scan_blocks() over the concatenation of `chunks`, e.g. a file read
+    piece by piece, yielding each block as soon as the blank line ending it
+    is seen. Only the block being read is held in memory."""
+    for text in _join_fences(_split_stream(chunks)):
+        block = _scan_block(text)
+        if block is not None:
+            yield block
+
+
+def _split_stream(chunks: Iterable[str]) -> Iterator[str]:
+    """The pieces of "".join(chunks).split("\n\n"), one at a time."""
+    pending: list[str] = []
+    for chunk in chunks:
+        if not chunk:
+            continue
+        # A blank line can also straddle two chunks
+        straddles = bool(pending) and pending[-1].endswith("\n") and chunk[0] == "\n"
+        if not straddles and "\n\n" not in chunk:
+            pending.append(chunk)
+            continue
+
+        pending.append(chunk)
+        texts = "".join(pending).split("\n\n")
+        pending = [texts.pop()]
+        yield from texts
+
+    yield "".join(pending)
+
+
+def _join_fences(texts: Iterable[str], max_size: int = MAX_FENCE_SIZE) -> Iterator[str]:
+    """Rejoin the pieces of fenced code blocks that were split at the blank
+    lines inside them. A fence that is not closed within `max_size`
+    characters leaves its pieces as they are."""
+    fence: list[str] = []
+    size = 0
+    for text in texts:
+        if fence:
+            fence.append(text)
+            size += len(text) + 2
+            if "```" in text:
+                yield "\n\n".join(fence)
+                fence = []
+            elif size > max_size:
+                yield from fence
+                fence = []
+        elif "```" in text and _opens_fence(text):
+            fence.append(text)
+            size = len(text)
+        else:
+            yield text
+    yield from fence
+
+
+def _opens_fence(text: str) -> bool:
+    text = text.lstrip(" \n")
+    return text.startswith("```") and "```" not in text[3:]
+
+
+def _scan_block(text: str) -> Block | None:
+    text = text.strip(" \n")
+    if not text:
+        return None
+    if _other_line_breaks.search(text) is None:
+        lines = text.split("\n")
+    else:
+        lines = text.splitlines()
+    block_type, level = classify_block(text, lines)
+    return Block(block_type, text, lines, level)
+
+
+def classify_block(text: str, lines: list[str]) -> tuple[BlockType, int]:
+    """Type of the block `text` split into `lines`, and its heading level."""
+    # Fenced code is code whatever markers its lines start with
+    if text.startswith("```") and "```" in text[3:]:
+        return BlockType.block_type_code, 0
+
+    if len(lines) == 1:
+        match = _heading_marker.match(lines[0])
+        if match:
+            return BlockType.block_type_heading, match.end() - 1
+
+    match = _list_marker.search(text)
+    if match:
+        symbol = match.group()[0]
+        for line in lines:
+            if not line.strip().startswith(symbol):
+                return BlockType.block_type_paragraph, 0
+        if symbol == ">":
+            return BlockType.block_type_quote, 0
+        if symbol == "*" or symbol == "-":
+            return BlockType.block_type_u_list, 0
 
-    return output
+    if ". " in text:
+        numbers = _ordered_marker.findall(text)
+        if numbers and all(
+            int(number) == expected for expected, number in enumerate(numbers, 1)
+        ):
+            return BlockType.block_type_o_list, 0
 
+    return BlockType.block_type_paragraph, 0
 
-def block_to_htmlnode(block: str) -> HTMLNode:
-    block_type = block_to_block_type(block)
 
-    if block_type == BlockType.block_type_heading:
+def block_to_htmlnode(block: str | Block) -> HTMLNode:
+    if isinstance(block, str):
+        block = Block.parse(block)
+
+    if block.type == BlockType.block_type_heading:
         return heading_to_htmlnode(block)
-    if block_type == BlockType.block_type_code:
+    if block.type == BlockType.block_type_code:
         return code_to_htmlnode(block)
-    if block_type == BlockType.block_type_quote:
+    if block.type == BlockType.block_type_quote:
         return quote_to_htmlnode(block)
-    if block_type == BlockType.block_type_u_list:
+    if block.type == BlockType.block_type_u_list:
         return unordered_list_to_htmlnode(block)
-    if block_type == BlockType.block_type_o_list:
+    if block.type == BlockType.block_type_o_list:
         return ordered_list_to_htmlnode(block)
-    if block_type == BlockType.block_type_paragraph:
+    if block.type == BlockType.block_type_paragraph:
         return paragraph_to_htmlnode(block)
 
     raise Exception("invalid block type")
 
 
-def block_to_block_type(block: str) -> BlockType:
-    lines = block.splitlines()
+def block_to_block_type(block: str | Block) -> BlockType:
+    if isinstance(block, str):
+        block = Block.parse(block)
+    return block.type
+
+
+def block_to_html(
+    block: Block, out: list[str], links: list[Link] | None = None
+) -> None:
+    """Append the HTML of `block` to `out`.
+
+    This is the build's fast path: the output is exactly that of
+    block_to_htmlnode(block).to_html(), written straight from the scanned
+    lines without building the node tree. Links and images are added to
+    `links`.
+    """
+    if block.type == BlockType.block_type_paragraph:
+        _wrap_inline("p", block.text, out, links)
+    elif block.type == BlockType.block_type_heading:
+        _wrap_inline(f"h{block.level}", _heading_text(block), out, links)
+    elif block.type == BlockType.block_type_code:
+        code = _code_text(block)
+        language = _fence_language(block)
+        if language:
+            out.append(f'<pre><code class="language-{language}">')
+        else:
+            out.append("<pre><code>")
+        out.append(highlight(code, language))
+        out.append("</code></pre>")
+    elif block.type == BlockType.block_type_quote:
+        _wrap_inline("blockquote", _quote_text(block), out, links)
+    elif block.type == BlockType.block_type_u_list:
+        out.append("<ul>")
+        for item in _unordered_list_items(block):
+            _wrap_inline("li", item, out, links)
+        out.append("</ul>")
+    elif block.type == BlockType.block_type_o_list:
+        out.append("<ol>")
+        for item in _ordered_list_items(block):
+            _wrap_inline("li", item, out, links)
+        out.append("</ol>")
+    else:
+        raise Exception("invalid block type")
+
+
+def _wrap_inline(tag: str, text: str, out: list[str], links: list[Link] | None) -> None:
+    out.append(f"<{tag}>")
+    render_inline(text, out, links)
+    out.append(f"</{tag}>")
+
+
+def block_to_text(block: Block) -> Iterator[str]:
+    """Text spans of `block` as its HTML displays them, markup removed, e.g.
+    for a search index. Images contribute their alt text."""
+    if block.type == BlockType.block_type_paragraph:
+        texts = [block.text]
+    elif block.type == BlockType.block_type_heading:
+        texts = [_heading_text(block)]
+    elif block.type == BlockType.block_type_code:
+        # Verbatim, code has no markup
+        yield _code_text(block)
+        return
+    elif block.type == BlockType.block_type_quote:
+        texts = [_quote_text(block)]
+    elif block.type == BlockType.block_type_u_list:
+        texts = _unordered_list_items(block)
+    elif block.type == BlockType.block_type_o_list:
+        texts = _ordered_list_items(block)
+    else:
+        raise Exception("invalid block type")
+
+    for text in texts:
+        for node in text_to_textnodes(text):
+            yield node.text
+
+
+def paragraph_to_htmlnode(block: Block) -> HTMLNode:
+    children_nodes = text_to_children_nodes(block.text)
 
-    if len(lines) == 1 and re.match(r"#{1,6} ", lines[0]):
-        return BlockType.block_type_heading
+    return ParentNode("p", children_nodes)
 
-    matches = re.findall(r"([*|\-|>]) ", block, re.MULTILINE)
-    if matches:
-        symbol = matches[0]
-        for line in lines:
-            if not line.strip().startswith(symbol):
-                return BlockType.block_type_paragraph
-        if symbol == ">":
-            return BlockType.block_type_quote
-        if symbol == "*" or symbol == "-":
-            return BlockType.block_type_u_list
 
-    if re.match(r"`{3}.*`{3}", block, re.DOTALL):
-        return BlockType.block_type_code
+def heading_to_htmlnode(block: Block) -> HTMLNode:
+    children_nodes = text_to_children_nodes(_heading_text(block))
 
-    matches = re.findall(r"(\d+)\. ", block, re.MULTILINE)
-    if matches:
-        expected_num = 1
-        is_ordered = True
-        for match in matches:
-            if int(match) != expected_num:
-                is_ordered = False
-                break
-            expected_num += 1
-        if is_ordered:
-            return BlockType.block_type_o_list
+    return ParentNode(f"h{block.level}", children_nodes, None)
 
-    return BlockType.block_type_paragraph
 
+def code_to_htmlnode(block: Block) -> HTMLNode:
+    language = _fence_language(block)
+    code_html = LeafNode(None, highlight(_code_text(block), language))
+    props = {"class": f"language-{language}"} if language else None
 
-def paragraph_to_htmlnode(text: str) -> HTMLNode:
-    children_nodes = text_to_children_nodes(text)
+    return ParentNode("pre", [ParentNode("code", [code_html], props)], None)
 
-    return ParentNode("p", children_nodes)
 
+def quote_to_htmlnode(block: Block) -> HTMLNode:
+    children_nodes = text_to_children_nodes(_quote_text(block))
 
-def heading_to_htmlnode(text: str) -> HTMLNode:
-    match = re.match(r"(#{1,6}) ", text)
-    if not match:
-        raise Exception("invalid syntax - heading")
+    return ParentNode("blockquote", children_nodes, None)
 
-    text = text.lstrip(match.group(1) + " ")
-    children_nodes = text_to_children_nodes(text)
 
-    level = str.count(match.group(1), "#")
+def unordered_list_to_htmlnode(block: Block) -> HTMLNode:
+    ul_children_nodes = []
+    for item in _unordered_list_items(block):
+        li_children_nodes = text_to_children_nodes(item)
+        ul_children_nodes.append(ParentNode("li", li_children_nodes))
 
-    return ParentNode(f"h{level}", children_nodes, None)
+    return ParentNode("ul", ul_children_nodes, None)
 
 
-def code_to_htmlnode(text: str) -> HTMLNode:
-    lines = text.splitlines()
-    if len(lines) < 2:
-        raise Exception("invalid syntax - code")
+def ordered_list_to_htmlnode(block: Block) -> HTMLNode:
+    ul_children_nodes = []
+    for item in _ordered_list_items(block):
+        li_children_nodes = text_to_children_nodes(item)
+        ul_children_nodes.append(ParentNode("li", li_children_nodes))
 
-    lines = lines[1:-1]
-    text_lines = []
-    for line in lines:
-        text_lines.append(line.strip())
+    return ParentNode("ol", ul_children_nodes, None)
 
-    text = "\n".join(text_lines)
-    children_nodes = text_to_children_nodes(text)
 
-    return ParentNode("pre", [ParentNode("code", children_nodes, None)], None)
+# Inline text of each block type, shared by the node tree and the fast path
 
 
-def quote_to_htmlnode(text: str) -> HTMLNode:
-    lines = text.splitlines()
-    text_lines = []
-    for line in lines:
-        text_lines.append(line.strip("> "))
+def _heading_text(block: Block) -> str:
+    if not block.level:
+        raise Exception("invalid syntax - heading")
+    return block.text.lstrip("# ")
 
-    text = "\n".join(text_lines)
-    children_nodes = text_to_children_nodes(text)
 
-    return ParentNode("blockquote", children_nodes, None)
+def _code_text(block: Block) -> str:
+    """Lines between the fences verbatim, only dedented together so an
+    indented block keeps its relative indentation."""
+    if len(block.lines) < 2:
+        raise Exception("invalid syntax - code")
+    return textwrap.dedent("\n".join(block.lines[1:-1]))
 
 
-def unordered_list_to_htmlnode(text: str) -> HTMLNode:
-    lines = text.splitlines()
+def _fence_language(block: Block) -> str:
+    """Language named after the opening fence ("```sh"), or ""."""
+    info = block.lines[0][3:].split(maxsplit=1)
+    if info and _code_language.fullmatch(info[0]):
+        return info[0]
+    return ""
 
-    ul_children_nodes = []
-    for line in lines:
-        line = line.removeprefix("* ")
-        line = line.removeprefix("- ")
-        li_children_nodes = text_to_children_nodes(line)
-        ul_children_nodes.append(ParentNode("li", li_children_nodes))
 
-    return ParentNode("ul", ul_children_nodes, None)
+def _quote_text(block: Block) -> str:
+    return "\n".join(line.strip("> ") for line in block.lines)
 
 
-def ordered_list_to_htmlnode(text: str) -> HTMLNode:
-    lines = text.splitlines()
+def _unordered_list_items(block: Block) -> list[str]:
+    return [line.removeprefix("* ").removeprefix("- ") for line in block.lines]
 
-    ul_children_nodes = []
-    for line in lines:
-        line = line.strip()
-        splits = re.split(r"^\d\. ", line, 1)
-        line = splits[-1]
-        li_children_nodes = text_to_children_nodes(line)
-        ul_children_nodes.append(ParentNode("li", li_children_nodes))
 
-    return ParentNode("ol", ul_children_nodes, None)
+def _ordered_list_items(block: Block) -> list[str]:
+    items = []
+    for line in block.lines:
+        line = line.strip()
+        match = _ordered_prefix.match(line)
+        items.append(line[match.end() :] if match else line)
+    return items
 
 
 def text_to_children_nodes(text: str) -> list[HTMLNode]:
@@ -0,0 +1,175 @@
+"""Opt-in per-stage timing of the build pipeline.
+
+Profiler.install() swaps the pipeline's stage functions for timed wrappers and
+uninstall() puts the originals back, so nothing is measured, and nothing costs
+anything, unless profiling was asked for. Times are exclusive: a stage that
+calls into another stage (e.g. writing pulls chunks out of the template, which
+pulls them out of to_html) is only charged for its own work.
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+import generate
+import htmlnode
+import markdown_blocks
+import template
+
+# (stage, owner, attribute, is a generator function)
+STAGES: list[tuple[str, Any, str, bool]] = [
+    ("read", generate, "read_source", False),
+    ("read", generate, "read_source_chunks", True),
+    ("scan_blocks", markdown_blocks, "scan_blocks", True),
+    ("scan_blocks", markdown_blocks, "scan_blocks_stream", True),
+    ("render_inline", markdown_blocks, "render_inline", False),
+    ("block_to_html", markdown_blocks, "block_to_html", False),
+    ("text_to_textnodes", markdown_blocks, "text_to_textnodes", False),
+    ("block_to_htmlnode", markdown_blocks, "block_to_htmlnode", False),
+    ("to_html", htmlnode.LeafNode, "iter_html", True),
+    ("to_html", htmlnode.ParentNode, "iter_html", True),
+    ("template", template.Template, "iter_render", True),
+    ("write", generate, "write_chunks", False),
+]
+
+# Every page goes through this function, which scopes the per-page times
+PAGE_ENTRY_POINT: tuple[Any, str] = (generate, "write_page")
+
+
+class Profiler:
+    def __init__(self, trace: bool = False) -> None:
+        self.totals: dict[str, float] = {}
+        self.pages: dict[str, dict[str, float]] = {}
+        self.events: list[dict[str, Any]] | None = [] if trace else None
+        self._stack: list[list[Any]] = []
+        self._page: str | None = None
+        self._patches: list[tuple[Any, str, Any]] = []
+        self._origin = time.perf_counter()
+
+    def install(self) -> None:
+        for stage, owner, name, is_generator in STAGES:
+            func = owner.__dict__[name]
+            if is_generator:
+                self._patch(owner, name, self._timed_iter(stage, func))
+            else:
+                self._patch(owner, name, self._timed(stage, func))
+
+        owner, name = PAGE_ENTRY_POINT
+        self._patch(owner, name, self._page_scope(owner.__dict__[name]))
+
+    def uninstall(self) -> None:
+        for owner, name, original in reversed(self._patches):
+            setattr(owner, name, original)
+        self._patches.clear()
+
+    def report(self, top: int = 10) -> str:
+        lines = ["Build profile (exclusive wall time per stage):"]
+        total = sum(self.totals.values()) or 1.0
+        for stage, seconds in sorted(self.totals.items(), key=lambda i: -i[1]):
+            lines.append(f"  {stage:<20} {seconds:10.4f}s {seconds / total:7.1%}")
+
+        slowest = sorted(self.pages.items(), key=lambda i: -i[1]["total"])[:top]
+        if slowest:
+            lines.append(f"Slowest {len(slowest)} pages:")
+        for page, stages in slowest:
+            breakdown = ", ".join(
+                f"{stage} {seconds:.4f}s"
+                for stage, seconds in sorted(stages.items(), key=lambda i: -i[1])
+                if stage != "total"
+            )
+            lines.append(f"  {stages['total']:.4f}s '{page}' ({breakdown})")
+
+        return "\n".join(lines)
+
+    def write_trace(self, path: Path) -> None:
+        """Write the recorded spans in Chrome trace-event format, viewable in
+        chrome://tracing or https://ui.perfetto.dev."""
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events or []}, f)
+
+    def _patch(self, owner: Any, name: str, replacement: Any) -> None:
+        self._patches.append((owner, name, owner.__dict__[name]))
+        setattr(owner, name, replacement)
+
+    def _enter(self, stage: str) -> None:
+        self._stack.append([stage, time.perf_counter(), 0.0])
+
+    def _exit(self) -> None:
+        stage, start, child_time = self._stack.pop()
+        end = time.perf_counter()
+        elapsed = end - start
+        own_time = elapsed - child_time
+
+        self.totals[stage] = self.totals.get(stage, 0.0) + own_time
+        if self._page is not None:
+            page = self.pages[self._page]
+            page[stage] = page.get(stage, 0.0) + own_time
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        if self.events is not None:
+            self._add_event(stage, start, end)
+
+    def _add_event(self, name: str, start: float, end: float) -> None:
+        assert self.events is not None
+        self.events.append(
+            {
+                "name": name,
+                "cat": "build",
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": {"page": self._page},
+            }
+        )
+
+    def _timed(self, stage: str, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            self._enter(stage)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self._exit()
+
+        return wrapper
+
+    def _timed_iter(self, stage: str, func: Callable) -> Callable:
+        # Generators run lazily, so time every resumption instead of the call
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs) -> Iterator:
+            iterator = func(*args, **kwargs)
+            while True:
+                self._enter(stage)
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    return
+                finally:
+                    self._exit()
+                yield chunk
+
+        return wrapper
+
+    def _page_scope(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(src_path, *args, **kwargs):
+            previous = self._page
+            self._page = str(src_path)
+            self.pages.setdefault(self._page, {"total": 0.0})
+            start = time.perf_counter()
+            try:
+                return func(src_path, *args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                self.pages[self._page]["total"] += end - start
+                if self.events is not None:
+                    self._add_event("page", start, end)
+                self._page = previous
+
+        return wrapper
@@ -0,0 +1,115 @@
+"""Content-addressed cache of rendered markdown blocks.
+
+A block's HTML depends only on its text and on the renderer, so fragments are
+keyed by a hash of both. Repeated blocks (disclaimers, navigation lists, code
+samples) and blocks unchanged since the previous build then cost a hash and a
+lookup instead of a render.
+"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+
+from textnode import Link
+
+# Rendered HTML of a block and the links and images it contains
+CachedBlock = tuple[str, tuple[Link, ...]]
+
+
+class BlockCache:
+    """LRU of rendered blocks, optionally backed by files under `cache_dir`.
+
+    `version` identifies the renderer: fragments stored by another version
+    are never looked up. On disk each fragment is a file named by its key,
+    fanned out in directories by the first two hex digits like git objects,
+    so concurrent builds and worker processes can share the store.
+    """
+
+    def __init__(
+        self, version: str, max_entries: int = 4096, cache_dir: Path | None = None
+    ) -> None:
+        self.version = version
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, CachedBlock] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, text: str) -> str:
+        digest = hashlib.blake2b(self.version.encode(), digest_size=20)
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8", "surrogatepass"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> CachedBlock | None:
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        cached = self._load(key)
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, cached)
+        return cached
+
+    def put(self, key: str, html: str, links: tuple[Link, ...] = ()) -> None:
+        cached = (html, links)
+        with self._lock:
+            self._remember(key, cached)
+        self._store(key, cached)
+
+    def __str__(self) -> str:
+        lookups = self.hits + self.disk_hits + self.misses
+        hit_rate = (self.hits + self.disk_hits) / lookups if lookups else 0.0
+        return (
+            f"{self.hits} hits, {self.disk_hits} disk hits, {self.misses} misses "
+            f"({hit_rate:.0%} hit rate)"
+        )
+
+    def _remember(self, key: str, cached: CachedBlock) -> None:
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = cached
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        assert self.cache_dir is not None
+        return self.cache_dir / key[:2] / key[2:]
+
+    def _load(self, key: str) -> CachedBlock | None:
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                html, links = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return html, tuple((kind, target) for kind, target in links)
+
+    def _store(self, key: str, cached: CachedBlock) -> None:
+        if self.cache_dir is None:
+            return
+        path = self._path(key)
+        # Unique per process and thread, the rename makes the write atomic
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}")
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cached, f)
+            tmp_path.replace(path)
+        except (OSError, ValueError):
+            # A cache that cannot be written only costs re-rendering
+            tmp_path.unlink(missing_ok=True)
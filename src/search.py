@@ -0,0 +1,265 @@
+"""Full-text search index written at build time.
+
+Terms come from the text of the rendered blocks (block_to_text), so markup,
+link targets and the template are not indexed. The index is a directory of
+JSON files that a client fetches lazily:
+
+- `index.json`: the format version, the shard prefix length and the URL and
+  title of every page, whose position in the list is its page id.
+- `terms/<hex>.json`: posting lists of the terms sharing their first
+  `prefix` characters, `hex` being those characters in UTF-8. A posting list
+  alternates page id deltas and term counts: `[3, 1, 4, 2]` is page 3 once
+  and page 7 twice.
+
+The terms of every page are cached with the size and mtime of its source, so
+a build only re-reads the pages that changed, and only shards whose content
+changed are rewritten.
+"""
+
+from collections import Counter
+import heapq
+from itertools import accumulate
+import json
+from pathlib import Path
+import re
+from typing import Any, Iterable
+
+from front_matter import read_front_matter
+from generate import extract_title_from_file, read_source_chunks
+from markdown_blocks import block_to_text, scan_blocks_stream
+
+SEARCH_FORMAT_VERSION = 1
+# Directory of the index under the output root
+SEARCH_DIR = "search"
+# Terms sharing this many leading characters are stored in the same shard
+SHARD_PREFIX = 2
+MAX_TERM_LENGTH = 64
+
+_term_pattern = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return [
+        term
+        for term in _term_pattern.findall(text.lower())
+        if len(term) <= MAX_TERM_LENGTH
+    ]
+
+
+def page_terms(src: Path, skip: int = 0) -> dict[str, int]:
+    """Count of every term in the displayed text of a page, reading its
+    source block by block after its first `skip` characters (its front
+    matter)."""
+    counts: Counter[str] = Counter()
+    for block in scan_blocks_stream(read_source_chunks(src, skip=skip)):
+        for text in block_to_text(block):
+            counts.update(tokenize(text))
+    return dict(counts)
+
+
+def page_url(public: Path, dst: Path) -> str:
+    return "/" + dst.relative_to(public).as_posix().removesuffix("index.html")
+
+
+def shard_name(term: str, prefix: int = SHARD_PREFIX) -> str:
+    return term[:prefix].encode().hex()
+
+
+class SearchIndexBuilder:
+    """Terms of every page, cached across builds in `cache_path`."""
+
+    version = 1
+
+    def __init__(self, cache_path: Path) -> None:
+        self.cache_path = cache_path
+        # source -> {"fingerprint", "url", "title", "terms"}
+        self.pages: dict[str, dict[str, Any]] = {}
+
+    @classmethod
+    def load(cls, cache_path: Path) -> "SearchIndexBuilder":
+        builder = cls(cache_path)
+        try:
+            with open(cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return builder
+
+        if data.get("version") == cls.version:
+            builder.pages = data.get("pages", {})
+        return builder
+
+    def save(self) -> None:
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.version, "pages": self.pages}, f)
+        tmp_path.replace(self.cache_path)
+
+    def update(
+        self, jobs: Iterable[tuple[Path, Path]], public: Path
+    ) -> tuple[int, int]:
+        """Index the (src, dst) pages of a build, forgetting any other page.
+        Returns the number of pages read and of pages taken from the cache."""
+        pages: dict[str, dict[str, Any]] = {}
+        indexed = reused = 0
+        for src, dst in jobs:
+            try:
+                stat = src.stat()
+            except OSError:
+                continue
+            fingerprint = f"{stat.st_size}:{stat.st_mtime_ns}"
+            url = page_url(public, dst)
+
+            entry = self.pages.get(str(src))
+            if entry is not None and (entry["fingerprint"], entry["url"]) == (
+                fingerprint,
+                url,
+            ):
+                pages[str(src)] = entry
+                reused += 1
+                continue
+
+            try:
+                front_matter, skip = read_front_matter(src)
+                title = front_matter.get("Title") or extract_title_from_file(src, skip)
+                terms = page_terms(src, skip)
+            except Exception:
+                # The page failed to build as well, which reports the error
+                continue
+            pages[str(src)] = {
+                "fingerprint": fingerprint,
+                "url": url,
+                "title": title,
+                "terms": terms,
+            }
+            indexed += 1
+
+        self.pages = pages
+        return indexed, reused
+
+    def write(self, directory: Path) -> list[Path]:
+        """Write the index under `directory`, returning the files written or
+        removed. Files whose content did not change are left alone."""
+        entries = sorted(self.pages.values(), key=lambda entry: entry["url"])
+        postings: dict[str, list[int]] = {}
+        last_page: dict[str, int] = {}
+        for page_id, entry in enumerate(entries):
+            for term, count in entry["terms"].items():
+                postings.setdefault(term, []).extend(
+                    (page_id - last_page.get(term, 0), count)
+                )
+                last_page[term] = page_id
+
+        shards: dict[str, dict[str, list[int]]] = {}
+        for term, posting in postings.items():
+            shards.setdefault(shard_name(term), {})[term] = posting
+
+        changed: list[Path] = []
+        terms_dir = directory / "terms"
+        terms_dir.mkdir(parents=True, exist_ok=True)
+        for name, terms in shards.items():
+            path = terms_dir / f"{name}.json"
+            if _write_if_changed(path, terms):
+                changed.append(path)
+        for path in terms_dir.glob("*.json"):
+            if path.stem not in shards:
+                path.unlink()
+                changed.append(path)
+
+        index = {
+            "version": SEARCH_FORMAT_VERSION,
+            "prefix": SHARD_PREFIX,
+            "pages": [[entry["url"], entry["title"]] for entry in entries],
+        }
+        if _write_if_changed(directory / "index.json", index):
+            changed.append(directory / "index.json")
+        return changed
+
+
+def _write_if_changed(path: Path, data: Any) -> bool:
+    content = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.read() == content:
+                return False
+    except OSError:
+        pass
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    tmp_path.replace(path)
+    return True
+
+
+class SearchResult:
+    def __init__(self, url: str, title: str, score: int) -> None:
+        self.url = url
+        self.title = title
+        self.score = score
+
+    def __repr__(self) -> str:
+        return f"SearchResult({self.url}, {self.title!r}, {self.score})"
+
+
+class SearchIndex:
+    """Queries a written index, loading shards as the terms need them like a
+    client would."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        with open(directory / "index.json", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != SEARCH_FORMAT_VERSION:
+            raise Exception("unsupported search index version")
+        self.prefix: int = data["prefix"]
+        self.pages: list[tuple[str, str]] = [
+            (url, title) for url, title in data["pages"]
+        ]
+        self._shards: dict[str, dict[str, list[int]]] = {}
+        # Decoded posting lists of the terms queried so far
+        self._postings: dict[str, dict[int, int]] = {}
+
+    def postings(self, term: str) -> dict[int, int]:
+        """Count of `term` in every page containing it, by page id."""
+        counts = self._postings.get(term)
+        if counts is None:
+            posting = self._shard(shard_name(term, self.prefix)).get(term, [])
+            counts = dict(zip(accumulate(posting[0::2]), posting[1::2]))
+            self._postings[term] = counts
+        return counts
+
+    def _shard(self, name: str) -> dict[str, list[int]]:
+        shard = self._shards.get(name)
+        if shard is None:
+            try:
+                with open(
+                    self.directory / "terms" / f"{name}.json", encoding="utf-8"
+                ) as f:
+                    shard = json.load(f)
+            except FileNotFoundError:
+                shard = {}
+            self._shards[name] = shard
+        return shard
+
+    def search(self, query: str, limit: int = 10) -> list[SearchResult]:
+        """Pages containing every term of `query`, most occurrences first."""
+        postings = [self.postings(term) for term in dict.fromkeys(tokenize(query))]
+        if not postings:
+            return []
+
+        # Intersect starting from the rarest term, which bounds the work
+        postings.sort(key=len)
+        scores = postings[0]
+        for counts in postings[1:]:
+            scores = {
+                page: score + counts[page]
+                for page, score in scores.items()
+                if page in counts
+            }
+            if not scores:
+                return []
+
+        best = heapq.nsmallest(
+            limit, scores.items(), key=lambda item: (-item[1], item[0])
+        )
+        return [SearchResult(*self.pages[page], score) for page, score in best]
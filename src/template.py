@@ -0,0 +1,210 @@
+import hashlib
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, Mapping
+
+_slot_pattern = re.compile(r"{{ *(\w+) *}}")
+_tag_pattern = re.compile(r"{%\s*(extends|block|endblock)\b\s*(.*?)\s*%}")
+_name_pattern = re.compile(r"\w+")
+_quoted_pattern = re.compile(r"\"([^\"]+)\"|'([^']+)'")
+
+
+class Template:
+    """Template text parsed once into literal segments and `{{ Name }}` slots.
+
+    `segments` alternates between literal text (even indexes) and slot names
+    (odd indexes), so rendering is a single pass that looks every slot up in
+    the given variables. Slots without a variable render as empty strings.
+    """
+
+    def __init__(self, source: str) -> None:
+        self.segments = _slot_pattern.split(source)
+        slot_names = self.segments[1::2]
+        self.slots = frozenset(slot_names)
+        self._repeated_slots = frozenset(
+            name for name in self.slots if slot_names.count(name) > 1
+        )
+
+    def render(self, variables: Mapping[str, str | Iterable[str]]) -> str:
+        return "".join(self.iter_render(variables))
+
+    def iter_render(
+        self, variables: Mapping[str, str | Iterable[str]]
+    ) -> Iterator[str]:
+        """Yield the rendered output in chunks.
+
+        Values may be strings or iterables of string chunks, which lets large
+        values such as the page body stream through without being joined.
+        """
+        materialized: dict[str, list[str]] = {}
+        for i, segment in enumerate(self.segments):
+            if i % 2 == 0:
+                yield segment
+                continue
+
+            value = variables.get(segment, "")
+            if isinstance(value, str):
+                yield value
+            elif segment in self._repeated_slots:
+                # An iterator can only be consumed once
+                if segment not in materialized:
+                    materialized[segment] = list(value)
+                yield from materialized[segment]
+            else:
+                yield from value
+
+
+class _Block:
+    """A `{% block name %}...{% endblock %}` region of a layout."""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.parts: list["str | _Block"] = []
+
+
+def _parse_layout(source: str, path: Path) -> tuple[str | None, list[str | _Block]]:
+    """The layout `source` extends, if any, and its text split into literal
+    parts and blocks."""
+    extends: str | None = None
+    root: list[str | _Block] = []
+    stack: list[_Block] = []
+    names: set[str] = set()
+    position = 0
+    for match in _tag_pattern.finditer(source):
+        parts = stack[-1].parts if stack else root
+        parts.append(source[position : match.start()])
+        position = match.end()
+        tag, argument = match.groups()
+
+        if tag == "extends":
+            quoted = _quoted_pattern.fullmatch(argument)
+            first = all(isinstance(p, str) and not p.strip() for p in root)
+            if quoted is None or not first or stack or extends is not None:
+                raise Exception(
+                    f"invalid '{{% extends %}}' in '{path}', it must be the first "
+                    "tag and name a quoted path"
+                )
+            extends = quoted.group(1) or quoted.group(2)
+            root.clear()
+        elif tag == "block":
+            if not _name_pattern.fullmatch(argument):
+                raise Exception(f"invalid block name '{argument}' in '{path}'")
+            if argument in names:
+                raise Exception(f"block '{argument}' defined twice in '{path}'")
+            names.add(argument)
+            block = _Block(argument)
+            parts.append(block)
+            stack.append(block)
+        else:
+            if not stack:
+                raise Exception(f"'{{% endblock %}}' without a block in '{path}'")
+            block = stack.pop()
+            if argument and argument != block.name:
+                raise Exception(
+                    f"'{{% endblock {argument} %}}' closes block '{block.name}' "
+                    f"in '{path}'"
+                )
+
+    if stack:
+        raise Exception(f"block '{stack[-1].name}' is not closed in '{path}'")
+    root.append(source[position:])
+    return extends, root
+
+
+def _collect_blocks(parts: list[str | _Block], blocks: dict[str, _Block]) -> None:
+    for part in parts:
+        if isinstance(part, _Block):
+            blocks.setdefault(part.name, part)
+            _collect_blocks(part.parts, blocks)
+
+
+def _flatten(
+    parts: list[str | _Block], overrides: Mapping[str, _Block], out: list[str]
+) -> None:
+    for part in parts:
+        if isinstance(part, str):
+            out.append(part)
+        else:
+            _flatten(overrides.get(part.name, part).parts, overrides, out)
+
+
+def resolve_layout(path: Path) -> tuple[str, list[Path]]:
+    """Source of the layout at `path` with its `{% extends %}` chain resolved:
+    the text of the base layout, with every block replaced by its most
+    derived definition. Also returns the files of the chain. An extended
+    path is relative to the file extending it."""
+    chain: list[Path] = []
+    overrides: dict[str, _Block] = {}
+    current = path
+    while True:
+        if current in chain:
+            cycle = " -> ".join(str(p) for p in chain + [current])
+            raise Exception(f"layouts extend each other: {cycle}")
+        chain.append(current)
+        with open(current) as f:
+            extends, parts = _parse_layout(f.read(), current)
+        if extends is None:
+            break
+        # Blocks of layouts further down the chain take precedence, and
+        # text outside of blocks is ignored in an extending layout
+        _collect_blocks(parts, overrides)
+        current = Path(os.path.normpath(current.parent / extends))
+
+    out: list[str] = []
+    _flatten(parts, overrides, out)
+    return "".join(out), chain
+
+
+class Layouts:
+    """The default template and the named layouts of a site, resolved and
+    compiled once, then shared by every page using them.
+
+    A layout is named after its path under `directory` without the `.html`
+    suffix ("post", "docs/guide"). The default template has the name "".
+    """
+
+    def __init__(self, default: Path, directory: Path | None = None) -> None:
+        self.default = default
+        self.directory = directory
+        self.templates: dict[str, Template] = {}
+        self.paths: dict[str, Path] = {}
+        # Hash of every layout's resolved source, which pages depend on
+        self.digests: dict[str, str] = {}
+        # Every file a layout was resolved from
+        self.files: set[Path] = set()
+        self.load()
+
+    def load(self) -> None:
+        """(Re)compile every layout. Nothing changes if one fails."""
+        paths = {"": self.default}
+        if self.directory is not None and self.directory.is_dir():
+            for path in sorted(self.directory.rglob("*.html")):
+                name = path.relative_to(self.directory).with_suffix("").as_posix()
+                paths[name] = path
+
+        templates: dict[str, Template] = {}
+        digests: dict[str, str] = {}
+        files: set[Path] = set()
+        for name, path in paths.items():
+            source, chain = resolve_layout(path)
+            templates[name] = Template(source)
+            digests[name] = hashlib.sha256(source.encode()).hexdigest()
+            files.update(chain)
+
+        self.templates, self.paths, self.digests, self.files = (
+            templates,
+            paths,
+            digests,
+            files,
+        )
+
+    def get(self, name: str = "") -> Template:
+        template = self.templates.get(name)
+        if template is None:
+            raise Exception(f"unknown layout '{name}'")
+        return template
+
+    def digest(self, name: str = "") -> str:
+        """Digest of a layout, "" if there is no such layout."""
+        return self.digests.get(name, "")
@@ -0,0 +1,69 @@
+import gzip
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from compress import compress_tree
+
+
+class TestCompressTree(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compress_and_skip_up_to_date(self):
+        page = self.root / "index.html"
+        page.write_text("<p>hello</p>" * 200)
+        (self.root / "small.css").write_text("b{}")
+        (self.root / "image.png").write_bytes(b"\x89PNG" * 1000)
+
+        self.assertEqual(compress_tree(self.root, min_size=100), (1, 0))
+        compressed = self.root / "index.html.gz"
+        self.assertEqual(gzip.decompress(compressed.read_bytes()), page.read_bytes())
+        self.assertEqual(compressed.stat().st_mtime_ns, page.stat().st_mtime_ns)
+        self.assertFalse((self.root / "small.css.gz").exists())
+        self.assertFalse((self.root / "image.png.gz").exists())
+
+        self.assertEqual(compress_tree(self.root, min_size=100), (0, 1))
+
+    def test_skip_unchanged_incompressible_files(self):
+        noise = self.root / "noise.txt"
+        noise.write_bytes(os.urandom(2000))
+        incompressible: dict[str, str] = {}
+
+        self.assertEqual(compress_tree(self.root, 1, 100, incompressible), (0, 0))
+        self.assertFalse((self.root / "noise.txt.gz").exists())
+        self.assertEqual(list(incompressible), [str(noise)])
+        self.assertEqual(compress_tree(self.root, 1, 100, incompressible), (0, 1))
+
+        noise.write_text("compressible " * 200)
+        self.assertEqual(compress_tree(self.root, 1, 100, incompressible), (1, 0))
+        self.assertEqual(incompressible, {})
+
+    def test_remove_orphans(self):
+        page = self.root / "index.html"
+        page.write_text("<p>hello</p>" * 200)
+        archive = self.root / "archive.tar.gz"
+        archive.write_bytes(gzip.compress(b"data"))
+        # Shipped by the site itself, next to a file too small to compress
+        shipped = self.root / "app.js.gz"
+        shipped.write_bytes(gzip.compress(b"let a;"))
+        (self.root / "app.js").write_text("let a;")
+        written: set[str] = set()
+        compress_tree(self.root, min_size=100, written=written)
+        self.assertEqual(written, {str(self.root / "index.html.gz")})
+
+        page.unlink()
+        compress_tree(self.root, min_size=100, written=written)
+        self.assertFalse((self.root / "index.html.gz").exists())
+        self.assertEqual(written, set())
+        self.assertTrue(archive.exists())
+        self.assertTrue(shipped.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
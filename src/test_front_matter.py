@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from front_matter import parse_front_matter, read_front_matter, split_front_matter
+
+
+class TestFrontMatter(unittest.TestCase):
+    def test_parse(self):
+        lines = [
+            "layout: post",
+            "",
+            "# a comment",
+            "Title: The Ring  # trailing comment",
+            'quoted: "a: \\"b\\" # c"',
+            "single: 'it''s'",
+            "empty:",
+            "url: https://example.com/#top",
+        ]
+        self.assertEqual(
+            parse_front_matter(lines),
+            {
+                "layout": "post",
+                "Title": "The Ring",
+                "quoted": 'a: "b" # c',
+                "single": "it's",
+                "empty": "",
+                "url": "https://example.com/#top",
+            },
+        )
+
+    def test_invalid(self):
+        for line in ("no colon", "- item", 'bad: "unclosed', "bad: 'unclosed"):
+            with self.subTest(line=line):
+                with self.assertRaises(Exception):
+                    parse_front_matter([line])
+
+    def test_split(self):
+        self.assertEqual(
+            split_front_matter("---\nlayout: post\n---\n# Title\n"),
+            ({"layout": "post"}, "# Title\n"),
+        )
+        for source in ("# Title\n---\n", "---\nnever closed", "----\na: b\n----\n"):
+            with self.subTest(source=source):
+                self.assertEqual(split_front_matter(source), ({}, source))
+
+    def test_read_matches_split(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "page.md"
+            for source in (
+                "---\r\nlayout: post\r\n---\r\n# Title\r\n",
+                "---\nlayout: post\n---\n",
+                "# No front matter",
+                "---\nnever closed\n",
+            ):
+                path.write_bytes(source.encode())
+                with self.subTest(source=source):
+                    front_matter, skip = read_front_matter(path)
+                    text = path.read_text()
+                    self.assertEqual(
+                        (front_matter, text[skip:]), split_front_matter(text)
+                    )
+
+
+if __name__ == "__main__":
+    unittest.main()
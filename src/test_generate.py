@@ -0,0 +1,232 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import generate
+from generate import (
+    BuildError,
+    copy_recursive,
+    read_source_chunks,
+    render_page,
+    render_page_stream,
+    write_page,
+)
+from manifest import BuildManifest
+from template import Layouts, Template
+from textnode import set_image_attributes
+
+
+class TestCopyRecursive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.static = self.root / "static"
+        self.public = self.root / "public"
+        (self.static / "images").mkdir(parents=True)
+        self.public.mkdir()
+        (self.static / "site.css").write_text("body{}")
+        (self.static / "images" / "logo.png").write_bytes(b"\x89PNG" * 100)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def copy(self, **kwargs):
+        with contextlib.redirect_stdout(io.StringIO()):
+            return copy_recursive(self.static, self.public, **kwargs)
+
+    def test_skip_unchanged_files(self):
+        stats = self.copy()
+        self.assertEqual((stats.copied_files, stats.skipped_files), (2, 0))
+        self.assertEqual(stats.copied_bytes, 406)
+        self.assertEqual((self.public / "site.css").read_text(), "body{}")
+
+        (self.static / "site.css").write_text("body{color:red}")
+        stats = self.copy()
+        self.assertEqual((stats.copied_files, stats.skipped_files), (1, 1))
+        self.assertEqual((self.public / "site.css").read_text(), "body{color:red}")
+
+    def test_threads(self):
+        stats = self.copy(threads=4)
+        self.assertEqual(stats.copied_files, 2)
+        self.assertEqual(
+            (self.public / "images" / "logo.png").read_bytes(), b"\x89PNG" * 100
+        )
+        self.assertEqual(self.copy(threads=4).skipped_files, 2)
+
+    def test_verify_hash_skips_touched_files(self):
+        self.copy()
+        css = self.static / "site.css"
+        os.utime(css, ns=(0, css.stat().st_mtime_ns + 10**9))
+        self.assertEqual(self.copy().copied_files, 1)
+
+        os.utime(css, ns=(0, css.stat().st_mtime_ns + 10**9))
+        stats = self.copy(verify_hash=True)
+        self.assertEqual(stats.copied_files, 0)
+        self.assertEqual(
+            (self.public / "site.css").stat().st_mtime_ns, css.stat().st_mtime_ns
+        )
+
+    def test_hardlink(self):
+        self.copy(mode="hardlink")
+        self.assertTrue((self.public / "site.css").samefile(self.static / "site.css"))
+        self.assertEqual(self.copy(mode="hardlink").copied_files, 0)
+
+    def test_reflink_falls_back_to_copy(self):
+        self.copy(mode="reflink")
+        self.assertEqual((self.public / "site.css").read_text(), "body{}")
+
+    def test_removed_files_are_pruned(self):
+        manifest = BuildManifest(self.root / "manifest.json")
+        self.copy(manifest=manifest)
+        manifest.save()
+        (self.static / "images" / "logo.png").unlink()
+
+        manifest = BuildManifest.load(self.root / "manifest.json")
+        self.copy(manifest=manifest)
+        self.assertEqual(
+            manifest.prune(self.public), [self.public / "images" / "logo.png"]
+        )
+        self.assertFalse((self.public / "images").exists())
+
+    def test_emptied_tree_is_pruned(self):
+        manifest = BuildManifest(self.root / "manifest.json")
+        self.copy(manifest=manifest)
+        manifest.save()
+        (self.static / "site.css").unlink()
+        (self.static / "images" / "logo.png").unlink()
+
+        manifest = BuildManifest.load(self.root / "manifest.json")
+        self.copy(manifest=manifest)
+        self.assertEqual(len(manifest.prune(self.public)), 2)
+        self.assertEqual(list(self.public.iterdir()), [])
+
+
+class TestRenderPageStream(unittest.TestCase):
+    def test_matches_render_page(self):
+        markdown = (
+            "Intro\r\n\r\n# The *Title*\n\n* a\n* b\n\n\n"
+            "```\ncode\n```\n\n> quote\n\nend\n"
+        )
+        template = Template("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        with tempfile.TemporaryDirectory() as tmp:
+            src = Path(tmp) / "page.md"
+            src.write_bytes(markdown.encode())
+            self.assertEqual(
+                "".join(read_source_chunks(src, chunk_size=3)), src.read_text()
+            )
+
+            expected = "".join(render_page(src.read_text(), template))
+            self.assertEqual("".join(render_page_stream(src, template)), expected)
+
+
+class TestWritePage(unittest.TestCase):
+    def test_front_matter_picks_layout(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "layouts").mkdir()
+            (root / "template.html").write_text("<main>{{ Content }}</main>")
+            (root / "layouts" / "post.html").write_text(
+                "<article><h1>{{ Title }}</h1><p>{{ Author }}</p>{{ Content }}</article>"
+            )
+            layouts = Layouts(root / "template.html", root / "layouts")
+            src = root / "post.md"
+            src.write_text(
+                "---\nlayout: post\nAuthor: 'Bilbo'\n# comment\n---\n"
+                "# Not the title\n\nThere and back"
+            )
+            dst = root / "post.html"
+            expected = (
+                "<article><h1>Not the title</h1><p>Bilbo</p>"
+                "<h1>Not the title</h1><p>There and back</p></article>"
+            )
+
+            write_page(src, layouts, dst, {"Author": "Unknown"})
+            self.assertEqual(dst.read_text(), expected)
+
+            # Sources too large to hold in memory skip their front matter too
+            threshold = generate.STREAM_THRESHOLD
+            generate.STREAM_THRESHOLD = 0
+            try:
+                write_page(src, layouts, dst, {"Author": "Unknown"})
+            finally:
+                generate.STREAM_THRESHOLD = threshold
+            self.assertEqual(dst.read_text(), expected)
+
+            src.write_text("---\nTitle: Home\n---\nNo heading")
+            write_page(src, layouts, dst)
+            self.assertEqual(dst.read_text(), "<main><p>No heading</p></main>")
+
+            src.write_text("---\nlayout: missing\n---\n# Title")
+            with self.assertRaises(Exception):
+                write_page(src, layouts, dst)
+
+
+class TestGeneratePages(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = self.root / "content"
+        self.public = self.root / "public"
+        (self.content / "blog").mkdir(parents=True)
+        (self.root / "layouts").mkdir()
+        (self.root / "template.html").write_text(
+            "<title>{{ Title }}</title>{{ Content }}{{ Footer }}"
+        )
+        (self.root / "layouts" / "post.html").write_text(
+            "<article>{{ Content }}</article>"
+        )
+        self.layouts = Layouts(self.root / "template.html", self.root / "layouts")
+
+    def tearDown(self):
+        set_image_attributes({})
+        self.tmp.cleanup()
+
+    def test_workers(self):
+        for i in range(6):
+            (self.content / "blog" / f"{i}.md").write_text(
+                f"# Post {i}\n\n[next](/blog/{i + 1}.html) ![logo](/logo.png)"
+            )
+        (self.content / "index.md").write_text("---\nlayout: post\n---\n# Home")
+        (self.content / "broken.md").write_text("No title")
+        set_image_attributes({"/logo.png": (("width", "3"), ("height", "2"))})
+        jobs = generate.collect_page_jobs(self.content, self.public)
+        manifest = BuildManifest(self.root / "manifest.json")
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            with self.assertRaises(BuildError) as raised:
+                generate.generate_pages(
+                    jobs, self.layouts, manifest, 2, {"Footer": "<footer>"}
+                )
+        self.assertIn("Generating 8 pages on 2 workers", output.getvalue())
+        error = raised.exception
+        self.assertEqual(
+            error.failures, [(self.content / "broken.md", "Exception: No title found")]
+        )
+        self.assertEqual(
+            sorted(error.rendered),
+            sorted(job for job in jobs if job[0].name != "broken.md"),
+        )
+
+        self.assertEqual(
+            (self.public / "blog" / "0.html").read_text(),
+            "<title>Post 0</title><h1>Post 0</h1><p>"
+            '<a href="/blog/1.html">next</a> '
+            '<img src="/logo.png" alt="logo" width="3" height="2">logo</img>'
+            "</p><footer>",
+        )
+        self.assertEqual(
+            (self.public / "index.html").read_text(), "<article><h1>Home</h1></article>"
+        )
+        self.assertFalse((self.public / "broken.html").exists())
+        self.assertEqual(
+            manifest.links("pages", self.content / "blog" / "5.md"),
+            [("link", "/blog/6.html"), ("image", "/logo.png")],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from highlight import highlight, highlight_cache
+
+
+class TestHighlight(unittest.TestCase):
+    def test_python(self):
+        self.assertEqual(
+            highlight('def f(x):\n    return "#1" # 2 < 3', "python"),
+            '<span class="tok-kw">def</span> f(x):\n'
+            '    <span class="tok-kw">return</span> <span class="tok-str">"#1"</span>'
+            ' <span class="tok-com"># 2 &lt; 3</span>',
+        )
+
+    def test_shell(self):
+        self.assertEqual(
+            highlight("echo $HOME ${#a} # done", "sh"),
+            '<span class="tok-kw">echo</span> <span class="tok-var">$HOME</span>'
+            ' <span class="tok-var">${#a}</span> <span class="tok-com"># done</span>',
+        )
+
+    def test_unknown_language_is_escaped(self):
+        self.assertEqual(
+            highlight("<b>if</b> & 1", "brainfuck"), "&lt;b&gt;if&lt;/b&gt; &amp; 1"
+        )
+        self.assertEqual(highlight("if 1", ""), "if 1")
+
+    def test_cached_by_language_and_content(self):
+        cache = highlight_cache()
+        code = "while True: pass  # test_cached_by_language_and_content"
+        misses = cache.misses
+        first = highlight(code, "python")
+        hits = cache.hits
+        self.assertEqual(highlight(code, "Python"), first)
+        self.assertEqual(cache.hits, hits + 1)
+        self.assertEqual(cache.misses, misses + 1)
+        self.assertNotEqual(highlight(code, "js"), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from htmlnode import HTMLNode, LeafNode, ParentNode
@@ -56,6 +57,36 @@ class TestParentNode(unittest.TestCase):
         target_outer_html = "<p><b>bold text</b>" + target_html + "</p>"
         self.assertEqual(outer_html, target_outer_html)
 
+    def test_iter_html(self):
+        node = ParentNode(
+            "p",
+            [LeafNode("b", "bold"), ParentNode("i", [LeafNode(None, "nested")])],
+        )
+        chunks = list(node.iter_html())
+        self.assertEqual(
+            chunks, ["<p>", "<b>bold</b>", "<i>", "nested", "</i>", "</p>"]
+        )
+        self.assertEqual("".join(chunks), node.to_html())
+
+        fp = io.StringIO()
+        node.write_html(fp)
+        self.assertEqual(fp.getvalue(), node.to_html())
+
+    def test_compact_representation(self):
+        props = {"href": "/", "target": "_blank"}
+        node = ParentNode("a", [LeafNode(None, "home")], props)
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertIsInstance(node.children, tuple)
+        self.assertEqual(node.props, (("href", "/"), ("target", "_blank")))
+        self.assertEqual(
+            node, ParentNode("a", (LeafNode(None, "home"),), tuple(props.items()))
+        )
+        self.assertEqual(
+            node,
+            ParentNode("a", [LeafNode(None, "home")], dict(reversed(props.items()))),
+        )
+        self.assertIs(LeafNode("".join(["h", "2"]), "x").tag, "h2")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,245 @@
+import contextlib
+import io
+import struct
+import tempfile
+import unittest
+import zlib
+from pathlib import Path
+
+from generate import generate_pages
+from images import ImageStage, image_size, pillow_available
+from manifest import BuildManifest
+from template import Layouts
+from markdown_blocks import (
+    block_to_htmlnode,
+    markdown_to_html,
+    markdown_to_html_chunks,
+    scan_blocks,
+    set_block_cache,
+)
+from textnode import image_digest, set_image_attributes
+
+
+def png(width: int, height: int) -> bytes:
+    """A valid width x height grayscale PNG."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        crc = zlib.crc32(kind + data)
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", crc)
+
+    rows = b"".join(b"\x00" + b"\x80" * width for _ in range(height))
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(rows))
+        + chunk(b"IEND", b"")
+    )
+
+
+def riff(chunk: bytes, data: bytes) -> bytes:
+    return b"RIFF" + struct.pack("<I", 4 + 8 + len(data)) + b"WEBP" + chunk + data
+
+
+class TestImageSize(unittest.TestCase):
+    def test_headers(self):
+        jpeg = (
+            b"\xff\xd8"
+            # APP0 segment to skip, then padding before the baseline frame
+            + b"\xff\xe0\x00\x10JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+            + b"\xff\xff\xc0\x00\x11\x08\x01\xe0\x02\x80\x03"
+            + b"\x00" * 9
+        )
+        cases = {
+            "a.png": (png(3, 2), (3, 2)),
+            "a.gif": (
+                b"GIF89a" + struct.pack("<HH", 640, 480) + b"\x00" * 4,
+                (640, 480),
+            ),
+            "a.jpg": (jpeg, (640, 480)),
+            "lossy.webp": (
+                riff(
+                    b"VP8 ",
+                    b"\x00" * 4
+                    + b"\x00\x00\x00\x9d\x01\x2a"
+                    + struct.pack("<HH", 400, 300),
+                ),
+                (400, 300),
+            ),
+            "lossless.webp": (
+                riff(
+                    b"VP8L",
+                    b"\x00" * 4 + b"\x2f" + struct.pack("<I", 399 | (299 << 14)),
+                ),
+                (400, 300),
+            ),
+            "extended.webp": (
+                riff(
+                    b"VP8X",
+                    b"\x00" * 8
+                    + (399).to_bytes(3, "little")
+                    + (299).to_bytes(3, "little"),
+                ),
+                (400, 300),
+            ),
+            "truncated.jpg": (b"\xff\xd8\xff\xe0\x00\x10JF", None),
+            "padding.jpg": (b"\xff\xd8\xff\xff", None),
+            "truncated.webp": (riff(b"VP8L", b"\x00" * 4)[:20], None),
+            "text.png": (b"not an image", None),
+        }
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, (data, expected) in cases.items():
+                path = Path(tmp) / name
+                path.write_bytes(data)
+                with self.subTest(name=name):
+                    self.assertEqual(image_size(path), expected)
+
+
+class TestImageAttributes(unittest.TestCase):
+    def tearDown(self):
+        set_image_attributes({})
+        set_block_cache()
+
+    def test_rendered_on_both_paths(self):
+        set_image_attributes({"/a.png": (("width", "3"), ("height", "2"))})
+        markdown = "![a](/a.png) and ![b](/b.png)"
+        tree_html = "".join(
+            block_to_htmlnode(block).to_html() for block in scan_blocks(markdown)
+        )
+        self.assertEqual(markdown_to_html(markdown), tree_html)
+        self.assertEqual(
+            tree_html,
+            '<p><img src="/a.png" alt="a" width="3" height="2">a</img> and '
+            '<img src="/b.png" alt="b">b</img></p>',
+        )
+
+    def test_block_cache_keyed_by_attributes(self):
+        set_block_cache(16)
+        markdown = "![a](/a.png)"
+        set_image_attributes({"/a.png": (("width", "3"), ("height", "2"))})
+        self.assertIn('width="3"', "".join(markdown_to_html_chunks(markdown)))
+        set_image_attributes({"/a.png": (("width", "6"), ("height", "4"))})
+        self.assertIn('width="6"', "".join(markdown_to_html_chunks(markdown)))
+
+        # Other images changing leaves the block cached
+        cache = set_block_cache(16)
+        assert cache is not None
+        "".join(markdown_to_html_chunks(markdown))
+        set_image_attributes(
+            {
+                "/a.png": (("width", "6"), ("height", "4")),
+                "/b.png": (("width", "1"), ("height", "1")),
+            }
+        )
+        self.assertIn('width="6"', "".join(markdown_to_html_chunks(markdown)))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_image_digest(self):
+        links = [("link", "/a.png"), ("image", "/a.png"), ("image", "/b.png")]
+        self.assertEqual(image_digest(links), "")
+        set_image_attributes({"/a.png": (("width", "3"), ("height", "2"))})
+        digest = image_digest(links)
+        self.assertTrue(digest)
+        self.assertEqual(image_digest([("image", "/c.png")]), "")
+        set_image_attributes({"/a.png": (("width", "6"), ("height", "4"))})
+        self.assertNotEqual(image_digest(links), digest)
+
+
+class TestImageStage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.static = self.root / "static"
+        self.public = self.root / "public"
+        (self.static / "images").mkdir(parents=True)
+        (self.static / "images" / "wide.png").write_bytes(png(64, 32))
+        (self.static / "images" / "small.png").write_bytes(png(8, 8))
+        (self.static / "notes.txt").write_text("not an image")
+
+    def tearDown(self):
+        set_image_attributes({})
+        self.tmp.cleanup()
+
+    def stage(self, widths=()):
+        return ImageStage(self.static, self.public, self.root / "cache", widths)
+
+    def test_dimensions(self):
+        attributes, stats = self.stage().build()
+        self.assertEqual(
+            attributes,
+            {
+                "/images/small.png": (("width", "8"), ("height", "8")),
+                "/images/wide.png": (("width", "64"), ("height", "32")),
+            },
+        )
+        self.assertEqual(stats.images, 2)
+
+    def test_index_is_reused(self):
+        stage = self.stage()
+        stage.build()
+        stage.save()
+        stage = self.stage()
+        entry = stage.images[str(self.static / "images" / "wide.png")]
+        entry["width"] = 1000
+        self.assertEqual(
+            stage.build()[0]["/images/wide.png"], (("width", "1000"), ("height", "32"))
+        )
+
+    def test_hashed_only_for_variants(self):
+        stage = self.stage()
+        stage.build()
+        stage.save()
+        wide = str(self.static / "images" / "wide.png")
+        self.assertEqual({entry["hash"] for entry in stage.images.values()}, {""})
+
+        stage = self.stage([16])
+        stage.build()
+        stage.variants()
+        self.assertNotEqual(stage.images[wide]["hash"], "")
+        # Too small for any variant
+        small = str(self.static / "images" / "small.png")
+        self.assertEqual(stage.images[small]["hash"], "")
+
+    @unittest.skipUnless(pillow_available(), "requires Pillow")
+    def test_variants(self):
+        (self.public / "images").mkdir(parents=True)
+        attributes, stats = self.stage([16, 32, 100]).build()
+        self.assertEqual((stats.generated, stats.reused), (2, 0))
+        self.assertEqual(
+            dict(attributes["/images/wide.png"])["srcset"],
+            "/images/wide-16w.png 16w, /images/wide-32w.png 32w, "
+            "/images/wide.png 64w",
+        )
+        self.assertNotIn("srcset", dict(attributes["/images/small.png"]))
+        self.assertEqual(image_size(self.public / "images" / "wide-16w.png"), (16, 8))
+
+        _, stats = self.stage([16, 32]).build()
+        self.assertEqual((stats.generated, stats.reused), (0, 2))
+
+    def test_pages_showing_changed_images_are_stale(self):
+        content = self.root / "content"
+        content.mkdir()
+        (content / "a.md").write_text("# A\n\n![wide](/images/wide.png)")
+        (content / "b.md").write_text("# B\n\nNo images")
+        template = self.root / "template.html"
+        template.write_text("{{ Content }}")
+        jobs = [
+            (content / "a.md", self.public / "a.html"),
+            (content / "b.md", self.public / "b.html"),
+        ]
+        manifest = BuildManifest(self.root / "manifest.json")
+
+        def build():
+            set_image_attributes(self.stage().build()[0])
+            with contextlib.redirect_stdout(io.StringIO()):
+                return generate_pages(jobs, Layouts(template), manifest)
+
+        self.assertEqual(len(build()), 2)
+        self.assertEqual(build(), [])
+
+        (self.static / "images" / "wide.png").write_bytes(png(48, 32))
+        self.assertEqual(build(), [jobs[0]])
+        self.assertIn('width="48"', (self.public / "a.html").read_text())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from linkcheck import (
+    BrokenLink,
+    LinkIndex,
+    check_links,
+    collect_paths,
+    is_served,
+    resolve_target,
+)
+from markdown_blocks import markdown_to_html, markdown_to_html_chunks, set_block_cache
+
+
+class TestResolveTarget(unittest.TestCase):
+    def test_targets(self):
+        page = "blog/post/index.html"
+        cases = [
+            ("/images/logo.png", "images/logo.png"),
+            ("/blog/", "blog/"),
+            ("/", ""),
+            ("cover.png?v=2#top", "blog/post/cover.png"),
+            ("../index.html", "blog/index.html"),
+            ("../../../../up.html", "up.html"),
+            ("./a%20b.png", "blog/post/a b.png"),
+            ("https://example.com/", None),
+            ("mailto:me@example.com", None),
+            ("//cdn.example.com/x.js", None),
+            ("#section", None),
+        ]
+        for target, expected in cases:
+            with self.subTest(target=target):
+                self.assertEqual(resolve_target(page, target), expected)
+
+    def test_is_served(self):
+        paths = frozenset({"index.html", "blog/index.html", "site.css"})
+        self.assertTrue(is_served("", paths))
+        self.assertTrue(is_served("blog/", paths))
+        self.assertTrue(is_served("blog", paths))
+        self.assertTrue(is_served("site.css", paths))
+        self.assertFalse(is_served("site.css/", paths))
+        self.assertFalse(is_served("missing.png", paths))
+
+
+class TestCheckLinks(unittest.TestCase):
+    def test_broken_links(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            public = root / "public"
+            static = root / "static"
+            (public / "blog").mkdir(parents=True)
+            (static / "images").mkdir(parents=True)
+            (public / "index.html").write_text("")
+            (public / "blog" / "index.html").write_text("")
+            (static / "images" / "logo.png").write_bytes(b"")
+
+            index = LinkIndex()
+            index.add(
+                Path("content/index.md"),
+                public / "index.html",
+                [("link", "/blog/"), ("image", "/images/logo.png")],
+            )
+            index.add(
+                Path("content/blog/index.md"),
+                public / "blog" / "index.html",
+                [("link", "../"), ("image", "logo.png"), ("link", "/missing")],
+            )
+
+            paths = collect_paths(public, static)
+            self.assertEqual(
+                check_links(index, public, paths),
+                [
+                    BrokenLink(Path("content/blog/index.md"), "image", "logo.png"),
+                    BrokenLink(Path("content/blog/index.md"), "link", "/missing"),
+                ],
+            )
+            self.assertEqual(len(index), 5)
+
+
+class TestCollectLinks(unittest.TestCase):
+    def tearDown(self):
+        set_block_cache()
+
+    def test_rendering_collects_links(self):
+        markdown = (
+            "A [link](/a) and ![image](/b.png)\n\n"
+            "* `[code](/not-a-link)`\n* [item](c.html)\n\n"
+            "A [link](/a) again"
+        )
+        expected = [
+            ("link", "/a"),
+            ("image", "/b.png"),
+            ("link", "c.html"),
+            ("link", "/a"),
+        ]
+
+        for cache_entries in (0, 16):
+            set_block_cache(cache_entries)
+            with self.subTest(cache_entries=cache_entries):
+                links = []
+                html = "".join(markdown_to_html_chunks(markdown, links))
+                self.assertEqual(html, markdown_to_html(markdown))
+                self.assertEqual(links, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
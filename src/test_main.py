@@ -0,0 +1,55 @@
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from main import main
+from markdown_blocks import set_block_cache
+from textnode import set_image_attributes
+
+
+class TestMain(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        (self.root / "content").mkdir()
+        (self.root / "static").mkdir()
+        (self.root / "template.html").write_text("{{ Content }}")
+        (self.root / "content" / "index.md").write_text("# Home\n\n[About](/about/)")
+        cwd = os.getcwd()
+        os.chdir(self.root)
+        self.addCleanup(os.chdir, cwd)
+
+    def tearDown(self):
+        set_image_attributes({})
+        set_block_cache()
+        self.tmp.cleanup()
+
+    def build(self, *args: str) -> str:
+        argv = sys.argv
+        sys.argv = ["main.py", "--workers", "1", *args]
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                main()
+        finally:
+            sys.argv = argv
+        return output.getvalue()
+
+    def test_broken_links_fail_the_build(self):
+        with self.assertRaises(SystemExit) as raised:
+            self.build()
+        self.assertEqual(raised.exception.code, "1 broken link(s)")
+        self.assertTrue((self.root / "public" / "index.html").exists())
+
+        self.assertNotIn("Checked", self.build("--no-check-links"))
+        (self.root / "content" / "about").mkdir()
+        (self.root / "content" / "about" / "index.md").write_text("# About")
+        self.assertIn("Checked 1 links, 0 broken", self.build())
+
+
+if __name__ == "__main__":
+    unittest.main()
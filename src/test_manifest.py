@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from manifest import BuildManifest, hash_file
+
+
+class TestBuildManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.src = self.root / "index.md"
+        self.src.write_text("# Title")
+        self.dst = self.root / "public" / "index.html"
+        self.dst.parent.mkdir()
+        self.dst.write_text("<h1>Title</h1>")
+        self.template = self.root / "template.html"
+        self.template.write_text("{{ Content }}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_fresh_after_save_and_load(self):
+        manifest = BuildManifest(self.root / "manifest.json")
+        digest = hash_file(self.src)
+        self.assertFalse(manifest.is_fresh("pages", self.src, self.dst, digest))
+        manifest.record("pages", self.src, self.dst, digest)
+        manifest.save()
+
+        manifest = BuildManifest.load(self.root / "manifest.json")
+        self.assertTrue(manifest.is_fresh("pages", self.src, self.dst, digest))
+        self.assertFalse(manifest.is_fresh("pages", self.src, self.dst, "changed"))
+
+    def test_links_kept_across_builds(self):
+        manifest = BuildManifest(self.root / "manifest.json")
+        links = [("link", "/about/"), ("image", "logo.png")]
+        manifest.record("pages", self.src, self.dst, hash_file(self.src), links)
+        manifest.save()
+
+        manifest = BuildManifest.load(self.root / "manifest.json")
+        self.assertEqual(manifest.links("pages", self.src), links)
+        self.assertEqual(manifest.links("pages", self.root / "other.md"), [])
+
+    def test_template_change_invalidates_pages(self):
+        manifest = BuildManifest(self.root / "manifest.json")
+        self.assertTrue(manifest.use_template(self.template))
+        digest = hash_file(self.src)
+        manifest.record("pages", self.src, self.dst, digest)
+        self.assertFalse(manifest.use_template(self.template))
+        self.assertTrue(manifest.is_fresh("pages", self.src, self.dst, digest))
+
+        self.template.write_text("<main>{{ Content }}</main>")
+        self.assertTrue(manifest.use_template(self.template))
+        self.assertFalse(manifest.is_fresh("pages", self.src, self.dst, digest))
+
+    def test_prune_unseen_outputs(self):
+        manifest = BuildManifest(self.root / "manifest.json")
+        manifest.record("pages", self.src, self.dst, hash_file(self.src))
+        manifest.save()
+
+        manifest = BuildManifest.load(self.root / "manifest.json")
+        other = self.root / "other.md"
+        other.write_text("# Other")
+        manifest.is_fresh("pages", other, self.root / "other.html", "")
+        removed = manifest.prune(self.root / "public")
+
+        self.assertEqual(removed, [self.dst])
+        self.assertFalse(self.dst.exists())
+        self.assertNotIn(str(self.src), manifest.entries["pages"])
+
+    def test_prune_walked_section_without_sources(self):
+        manifest = BuildManifest(self.root / "manifest.json")
+        manifest.record("pages", self.src, self.dst, hash_file(self.src))
+        manifest.save()
+
+        manifest = BuildManifest.load(self.root / "manifest.json")
+        self.assertEqual(manifest.prune(self.root / "public"), [])
+        manifest.visit("pages")
+        self.assertEqual(manifest.prune(self.root / "public"), [self.dst])
+        self.assertFalse(self.dst.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
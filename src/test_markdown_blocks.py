@@ -1,7 +1,16 @@
 import unittest
 
 from htmlnode import LeafNode, ParentNode
-from markdown_blocks import BlockType, block_to_block_type, block_to_htmlnode
+from markdown_blocks import (
+    BlockType,
+    block_to_block_type,
+    block_to_html,
+    block_to_htmlnode,
+    markdown_to_html,
+    scan_blocks,
+    scan_blocks_stream,
+    _join_fences,
+)
 from textnode import text_node_to_html_node, text_to_textnodes
 
 
@@ -108,6 +117,118 @@ class TestBlockType(unittest.TestCase):
         self.assertIsNot(block_type, target_block_type)
 
 
+class TestScanBlocks(unittest.TestCase):
+    def test_matches_string_api(self):
+        markdown = (
+            "  # Title  \n\n\n* a\n* b\n\n1. x\n2. y\n\n> q\n\n"
+            "```\ncode\n```\n\na - b\n-c\n\n   \n\nend"
+        )
+        blocks = list(scan_blocks(markdown))
+        self.assertEqual(
+            [block.text for block in blocks],
+            [
+                "# Title",
+                "* a\n* b",
+                "1. x\n2. y",
+                "> q",
+                "```\ncode\n```",
+                "a - b\n-c",
+                "end",
+            ],
+        )
+        for block in blocks:
+            self.assertEqual(block.lines, block.text.splitlines())
+            self.assertIs(block.type, block_to_block_type(block.text))
+            self.assertEqual(block_to_htmlnode(block), block_to_htmlnode(block.text))
+        self.assertEqual(blocks[0].level, 1)
+
+    def test_stream(self):
+        markdown = "# Title\n\n\n* a\r\n* b\n\n  \n\n```\ncode\n```\n\nend\n"
+        expected = [(b.type, b.text, b.lines) for b in scan_blocks(markdown)]
+        for size in (1, 2, 3, 7, len(markdown)):
+            chunks = [markdown[i : i + size] for i in range(0, len(markdown), size)]
+            with self.subTest(size=size):
+                self.assertEqual(
+                    [(b.type, b.text, b.lines) for b in scan_blocks_stream(chunks)],
+                    expected,
+                )
+
+    def test_blank_lines_in_fence(self):
+        markdown = "para\n\n```sh\n* one\n\n\n  two\n```\n\n```\nnot closed\n\nend"
+        expected = [
+            "para",
+            "```sh\n* one\n\n\n  two\n```",
+            "```\nnot closed",
+            "end",
+        ]
+        self.assertEqual([b.text for b in scan_blocks(markdown)], expected)
+        for size in (1, 2, 5, len(markdown)):
+            chunks = [markdown[i : i + size] for i in range(0, len(markdown), size)]
+            with self.subTest(size=size):
+                self.assertEqual([b.text for b in scan_blocks_stream(chunks)], expected)
+        self.assertIs(list(scan_blocks(markdown))[1].type, BlockType.block_type_code)
+
+    def test_unclosed_fence_is_not_buffered(self):
+        pieces = ["```", "a", "b", "c", "d", "```"]
+        self.assertEqual(list(_join_fences(pieces, 6)), pieces)
+        self.assertEqual(list(_join_fences(pieces)), ["```\n\na\n\nb\n\nc\n\nd\n\n```"])
+
+        read: list[str] = []
+
+        def stream():
+            for piece in ["```", "a", "b", "c", "d", "e"]:
+                read.append(piece)
+                yield piece
+
+        # Pieces come out as soon as the fence outgrows its size
+        joined = _join_fences(stream(), 6)
+        self.assertEqual(next(joined), "```")
+        self.assertEqual(read, ["```", "a", "b"])
+        self.assertEqual(list(joined), ["a", "b", "c", "d", "e"])
+
+    def test_other_line_breaks(self):
+        (block,) = scan_blocks("* a\r\n* b\r\n")
+        self.assertEqual(block.lines, ["* a", "* b"])
+        self.assertIs(block.type, BlockType.block_type_u_list)
+
+
+class TestFastPath(unittest.TestCase):
+    # Blocks whose lines need each converter's own preprocessing
+    MARKDOWN = [
+        "# Title\n\nSome **bold**, *italic* and `code` text",
+        "### #Heading with *markup*  ",
+        "```\n  indented **not bold**\n\ttabbed\n```",
+        "```\n```",
+        "```python\ndef f(x):\n\n    return x * 2  # <twice>\n```",
+        "```sh\n* not a list\n\n\n> $HOME\n```",
+        "> quote *one*\n>> nested\n>bare",
+        "* a\n- b\n- c - d\n* -e",
+        "1. x\n2. y\n10. z",
+        "1. spaced \n 2. second ",
+        'a [link](/to?a=1&b=2) and ![img](/i.png) <escaped> & "quoted"',
+        "line\r\nbreaks\x0c\nand\u2028separators",
+        "**bold**,*italic*and**bold again**",
+    ]
+
+    def test_matches_node_tree(self):
+        for markdown in self.MARKDOWN:
+            with self.subTest(markdown=markdown):
+                tree_html = "".join(
+                    block_to_htmlnode(block).to_html()
+                    for block in scan_blocks(markdown)
+                )
+                self.assertEqual(markdown_to_html(markdown), tree_html)
+
+    def test_invalid_syntax_raises_on_both_paths(self):
+        for markdown in ("a [link]() here", "**unclosed", "```"):
+            (block,) = scan_blocks(markdown)
+            with self.subTest(markdown=markdown):
+                with self.assertRaises(Exception):
+                    block_to_htmlnode(block).to_html()
+                with self.assertRaises(Exception):
+                    block_to_html(block, [])
+
+
 class TestBlockToHTML(unittest.TestCase):
 
     def test_paragraph(self):
@@ -153,18 +274,26 @@ class TestBlockToHTML(unittest.TestCase):
         ```"""
         html_node = block_to_htmlnode(value)
 
-        target_value = "A code block\nSecond line"
-        target_text_nodes = text_to_textnodes(target_value)
-
-        target_children_nodes = []
-        for node in target_text_nodes:
-            target_children_nodes.append(text_node_to_html_node(node))
         target_html_node = ParentNode(
-            "pre", [ParentNode("code", target_children_nodes)]
+            "pre",
+            [
+                ParentNode(
+                    "code",
+                    [LeafNode(None, "A code block\nSecond line")],
+                    {"class": "language-sh"},
+                )
+            ],
         )
 
         self.assertEqual(html_node, target_html_node)
 
+    def test_code_block_verbatim(self):
+        value = "```\n  if *a* and `b`:\n      return a < b\n```"
+        self.assertEqual(
+            block_to_htmlnode(value).to_html(),
+            "<pre><code>if *a* and `b`:\n    return a &lt; b</code></pre>",
+        )
+
     def test_quote_block(self):
         value = """> Some quote
         > Second line quote """
@@ -0,0 +1,27 @@
+import unittest
+
+import markdown_blocks
+from profiler import STAGES, Profiler
+
+
+class TestProfiler(unittest.TestCase):
+    def test_install_and_uninstall(self):
+        originals = [owner.__dict__[name] for _, owner, name, _ in STAGES]
+        profiler = Profiler(trace=True)
+        profiler.install()
+        try:
+            html = markdown_blocks.markdown_to_html("# Title\n\nSome **bold** text")
+        finally:
+            profiler.uninstall()
+
+        self.assertEqual(html, "<h1>Title</h1><p>Some <b>bold</b> text</p>")
+        self.assertEqual(
+            [owner.__dict__[name] for _, owner, name, _ in STAGES], originals
+        )
+        for stage in ("scan_blocks", "render_inline", "block_to_html"):
+            self.assertGreater(profiler.totals[stage], 0)
+        self.assertTrue(profiler.events)
+
+
+if __name__ == "__main__":
+    unittest.main()
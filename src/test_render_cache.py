@@ -0,0 +1,56 @@
+from pathlib import Path
+import tempfile
+import unittest
+
+from markdown_blocks import markdown_to_html, set_block_cache
+from render_cache import BlockCache
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = BlockCache("v1", max_entries=2)
+        for text in ("a", "b", "c"):
+            cache.put(cache.key(text), f"<p>{text}</p>")
+
+        self.assertIsNone(cache.get(cache.key("a")))
+        self.assertEqual(cache.get(cache.key("c")), ("<p>c</p>", ()))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_disk_store(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache_dir = Path(tmp)
+            html = '<p><a href="/b">a</a></p>'
+            BlockCache("v1", cache_dir=cache_dir).put(
+                BlockCache("v1").key("a"), html, (("link", "/b"),)
+            )
+
+            cache = BlockCache("v1", cache_dir=cache_dir)
+            self.assertEqual(cache.get(cache.key("a")), (html, (("link", "/b"),)))
+            self.assertEqual(cache.get(cache.key("a")), (html, (("link", "/b"),)))
+            self.assertEqual((cache.disk_hits, cache.hits), (1, 1))
+
+            other_version = BlockCache("v2", cache_dir=cache_dir)
+            self.assertIsNone(other_version.get(other_version.key("a")))
+
+
+class TestCachedRendering(unittest.TestCase):
+    def tearDown(self):
+        set_block_cache()
+
+    def test_same_output(self):
+        markdown = "# Title\n\nSome **bold** text\n\n* a\n* b\n\nSome **bold** text"
+        expected = markdown_to_html(markdown)
+
+        cache = set_block_cache(max_entries=16)
+        assert cache is not None
+        self.assertEqual(markdown_to_html(markdown), expected)
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+        self.assertEqual(markdown_to_html(markdown), expected)
+        self.assertEqual((cache.hits, cache.misses), (5, 3))
+
+    def test_disabled_by_default(self):
+        self.assertIsNone(set_block_cache())
+
+
+if __name__ == "__main__":
+    unittest.main()
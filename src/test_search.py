@@ -0,0 +1,86 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from generate import collect_page_jobs
+from search import SearchIndex, SearchIndexBuilder, page_terms, shard_name
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = self.root / "content"
+        self.public = self.root / "public"
+        (self.content / "blog").mkdir(parents=True)
+        (self.content / "index.md").write_text(
+            "# Home\n\nWelcome to the *Shire*, home of hobbits."
+        )
+        (self.content / "blog" / "ring.md").write_text(
+            "# The Ring\n\n* One ring to rule them\n* One [ring](/ring/) to find them"
+            "\n\n![a golden ring](/ring.png)"
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def build(self) -> tuple[SearchIndexBuilder, tuple[int, int], list[Path]]:
+        builder = SearchIndexBuilder.load(self.root / "search-cache.json")
+        counts = builder.update(
+            collect_page_jobs(self.content, self.public), self.public
+        )
+        changed = builder.write(self.public / "search")
+        builder.save()
+        return builder, counts, changed
+
+    def test_page_terms(self):
+        terms = page_terms(self.content / "blog" / "ring.md")
+        self.assertEqual(terms["ring"], 4)
+        self.assertEqual(terms["golden"], 1)
+        self.assertNotIn("png", terms)
+
+    def test_query(self):
+        self.build()
+        index = SearchIndex(self.public / "search")
+        self.assertEqual(
+            [(r.url, r.title, r.score) for r in index.search("Ring")],
+            [("/blog/ring.html", "The Ring", 4)],
+        )
+        self.assertEqual([r.url for r in index.search("home")], ["/"])
+        self.assertEqual(index.search("ring hobbits"), [])
+        self.assertEqual(index.search("mordor"), [])
+        self.assertEqual(index.search(""), [])
+
+    def test_delta_encoded_postings(self):
+        (self.content / "blog" / "shire.md").write_text(
+            "# Shire\n\nThe Shire, the Shire"
+        )
+        self.build()
+        shard = self.public / "search" / "terms" / f"{shard_name('shire')}.json"
+        with open(shard) as f:
+            # Pages by URL: "/", "/blog/ring.html", "/blog/shire.html"
+            self.assertEqual(json.load(f)["shire"], [0, 1, 2, 3])
+
+    def test_incremental_update(self):
+        _, counts, changed = self.build()
+        self.assertEqual(counts, (2, 0))
+        self.assertTrue(changed)
+
+        _, counts, changed = self.build()
+        self.assertEqual((counts, changed), ((0, 2), []))
+
+        (self.content / "index.md").write_text("# Home\n\nWelcome to Mordor.")
+        _, counts, changed = self.build()
+        self.assertEqual(counts, (1, 1))
+        self.assertIn(self.public / "search" / "terms" / "6d6f.json", changed)
+        self.assertIn(self.public / "search" / "terms" / "7368.json", changed)
+        self.assertNotIn(self.public / "search" / "terms" / "7269.json", changed)
+
+        index = SearchIndex(self.public / "search")
+        self.assertEqual([r.url for r in index.search("mordor")], ["/"])
+        self.assertEqual(index.search("shire"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
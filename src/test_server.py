@@ -0,0 +1,309 @@
+import functools
+import http.client
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+# server.py lives at the root of the repository, next to src/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server import (
+    LIVE_RELOAD_PATH,
+    CORSHTTPRequestHandler,
+    FileCache,
+    LiveReloadHub,
+    RenderedPageCache,
+    ThreadedHTTPServer,
+)
+
+
+class QuietHandler(CORSHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class ServerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def serve(self, handler_class=QuietHandler, **kwargs) -> None:
+        handler = functools.partial(handler_class, directory=str(self.root), **kwargs)
+        httpd = ThreadedHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        self.addCleanup(httpd.server_close)
+        self.addCleanup(httpd.shutdown)
+        self.port = httpd.server_address[1]
+
+    def request(self, path, method="GET", body=None, headers=None):
+        connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        self.addCleanup(connection.close)
+        connection.request(method, path, body, headers or {})
+        response = connection.getresponse()
+        return response, response.read()
+
+
+class TestFileCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name: str, data: bytes) -> str:
+        path = self.root / name
+        path.write_bytes(data)
+        return str(path)
+
+    def test_evicts_least_recently_used_by_bytes(self):
+        # 80 bytes of entries, files up to 10 bytes are kept in memory
+        cache = FileCache(80)
+        paths = [self.write(f"{i}.txt", b"x" * 10) for i in range(9)]
+        first = cache.get(paths[0])
+        second = cache.get(paths[1])
+        for path in paths[2:8]:
+            cache.get(path)
+        self.assertIs(cache.get(paths[0]), first)
+
+        cache.get(paths[8])
+        self.assertIs(cache.get(paths[0]), first)
+        self.assertIsNot(cache.get(paths[1]), second)
+
+    def test_revalidates_rewritten_files(self):
+        cache = FileCache(1024)
+        path = self.write("page.html", b"old")
+        entry = cache.get(path)
+        self.assertEqual(entry.data, b"old")
+        self.assertIs(cache.get(path), entry)
+
+        stat = os.stat(path)
+        Path(path).write_bytes(b"new!")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        rewritten = cache.get(path)
+        self.assertEqual(rewritten.data, b"new!")
+        self.assertNotEqual(rewritten.etag, entry.etag)
+
+        Path(path).unlink()
+        with self.assertRaises(OSError):
+            cache.get(path)
+
+    def test_identical_rewrite_keeps_etag(self):
+        cache = FileCache(1024)
+        path = self.write("page.html", b"same")
+        etag = cache.get(path).etag
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(cache.get(path).etag, etag)
+
+    def test_large_files_are_not_kept(self):
+        cache = FileCache(80)
+        entry = cache.get(self.write("big.bin", b"x" * 11))
+        self.assertIsNone(entry.data)
+        self.assertEqual(entry.size, 11)
+        self.assertEqual(
+            entry.etag, FileCache(1024).get(str(self.root / "big.bin")).etag
+        )
+
+
+class TestRenderedPageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.template = self.root / "template.html"
+        self.template.write_text("<title>{{ Title }}</title>{{ Content }}{{ Date }}")
+        self.source = self.root / "index.md"
+        self.source.write_text("# Home\n\nHello")
+        self.cache = RenderedPageCache(
+            1024, str(self.template), str(self.root / "layouts"), {"Date": "today"}
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def touch(self, path: Path, text: str) -> None:
+        stat = path.stat()
+        path.write_text(text)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_renders_like_a_build(self):
+        entry = self.cache.get(str(self.source))
+        self.assertEqual(
+            entry.data, b"<title>Home</title><h1>Home</h1><p>Hello</p>today"
+        )
+        self.assertIs(self.cache.get(str(self.source)), entry)
+
+    def test_source_edit_is_rendered_again(self):
+        entry = self.cache.get(str(self.source))
+        self.touch(self.source, "# Home\n\nGoodbye")
+        edited = self.cache.get(str(self.source))
+        self.assertEqual(
+            edited.data, b"<title>Home</title><h1>Home</h1><p>Goodbye</p>today"
+        )
+        self.assertNotEqual(edited.etag, entry.etag)
+
+    def test_layout_edit_is_rendered_again(self):
+        # The layout extends a file outside of the layouts directory
+        layouts = self.root / "layouts"
+        layouts.mkdir()
+        base = self.root / "base.html"
+        base.write_text("<main>{% block main %}{% endblock %}</main>")
+        (layouts / "post.html").write_text(
+            '{% extends "../base.html" %}{% block main %}{{ Content }}{% endblock %}'
+        )
+        self.touch(self.source, "---\nlayout: post\nTitle: Hello\n---\nHello")
+        self.cache.layouts_check_interval = 60
+        self.assertEqual(
+            self.cache.get(str(self.source)).data, b"<main><p>Hello</p></main>"
+        )
+
+        self.touch(base, "<div>{% block main %}{% endblock %}</div>")
+        # Layout files are only checked again once the interval is over
+        self.assertEqual(
+            self.cache.get(str(self.source)).data, b"<main><p>Hello</p></main>"
+        )
+        self.cache.layouts_check_interval = 0
+        self.assertEqual(
+            self.cache.get(str(self.source)).data, b"<div><p>Hello</p></div>"
+        )
+
+        (layouts / "post.html").unlink()
+        with self.assertRaises(Exception):
+            self.cache.get(str(self.source))
+
+
+class TestConditionalRequests(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        (self.root / "index.html").write_text("<body>home</body>")
+        (self.root / "big.bin").write_bytes(bytes(range(256)) * 4)
+
+    def test_if_none_match(self):
+        self.serve(file_cache=FileCache(64 * 1024))
+        response, body = self.request("/")
+        self.assertEqual((response.status, body), (200, b"<body>home</body>"))
+        etag = response.getheader("ETag")
+
+        response, body = self.request("/", headers={"If-None-Match": etag})
+        self.assertEqual((response.status, body), (304, b""))
+        self.assertEqual(response.getheader("ETag"), etag)
+        response, _ = self.request("/", headers={"If-None-Match": f'"x", W/{etag}'})
+        self.assertEqual(response.status, 304)
+        response, _ = self.request("/", headers={"If-None-Match": '"other"'})
+        self.assertEqual(response.status, 200)
+
+    def test_large_files_are_streamed_from_disk(self):
+        # Files over an eighth of the cache are not kept in memory
+        self.serve(file_cache=FileCache(1024))
+        response, body = self.request("/big.bin")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, bytes(range(256)) * 4)
+        response, _ = self.request(
+            "/big.bin", headers={"If-None-Match": response.getheader("ETag")}
+        )
+        self.assertEqual(response.status, 304)
+
+    def test_without_cache(self):
+        self.serve(file_cache=None)
+        response, body = self.request("/")
+        self.assertEqual((response.status, body), (200, b"<body>home</body>"))
+        etag = response.getheader("ETag")
+        response, _ = self.request("/", headers={"If-None-Match": etag})
+        self.assertEqual(response.status, 304)
+
+        path = self.root / "index.html"
+        stat = path.stat()
+        path.write_text("<body>changed</body>")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        response, body = self.request("/", headers={"If-None-Match": etag})
+        self.assertEqual((response.status, body), (200, b"<body>changed</body>"))
+
+
+class RemoteHandler(QuietHandler):
+    """Sees every request as coming from another host."""
+
+    def do_POST(self):
+        self.client_address = ("192.0.2.1", 50000)
+        super().do_POST()
+
+
+class TestLiveReload(ServerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hub = LiveReloadHub(ping_interval=0.05)
+        self.addCleanup(self.hub.close)
+
+    def open_stream(self):
+        stream = socket.create_connection(("127.0.0.1", self.port), timeout=5)
+        self.addCleanup(stream.close)
+        stream.sendall(f"GET {LIVE_RELOAD_PATH} HTTP/1.1\r\n\r\n".encode())
+        events = stream.makefile("rb")
+        self.addCleanup(events.close)
+        return events
+
+    def read_event(self, events) -> bytes:
+        lines: list[bytes] = []
+        while (line := events.readline()) not in (b"\r\n", b"\n", b""):
+            lines.append(line)
+        return b"".join(lines)
+
+    def post(self, paths):
+        return self.request(
+            LIVE_RELOAD_PATH,
+            "POST",
+            json.dumps(paths),
+            {"Content-Type": "application/json"},
+        )
+
+    def test_event_stream(self):
+        self.serve(file_cache=None, live_reload=self.hub)
+        events = self.open_stream()
+        headers = self.read_event(events)
+        self.assertTrue(headers.startswith(b"HTTP/1.1 200"))
+        self.assertIn(b"Content-Type: text/event-stream", headers)
+        self.assertEqual(self.read_event(events), b"retry: 1000\n")
+        # Pings only go to clients the hub has taken over
+        self.assertEqual(self.read_event(events), b": ping\n")
+
+        response, _ = self.post(["/index.html", "/site.css"])
+        self.assertEqual(response.status, 204)
+        while (event := self.read_event(events)) == b": ping\n":
+            pass
+        self.assertEqual(event, b'data: ["/index.html", "/site.css"]\n')
+
+        sender = self.hub._sender
+        assert sender is not None
+        self.hub.close()
+        sender.join(5)
+        self.assertFalse(sender.is_alive())
+        self.assertEqual(events.read(), b"")
+
+    def test_post_is_validated(self):
+        self.serve(file_cache=None, live_reload=self.hub)
+        response, _ = self.post("/index.html")
+        self.assertEqual(response.status, 400)
+        response, _ = self.post([1])
+        self.assertEqual(response.status, 400)
+        response, _ = self.post([])
+        self.assertEqual(response.status, 204)
+
+    def test_post_only_from_localhost(self):
+        self.serve(RemoteHandler, file_cache=None, live_reload=self.hub)
+        response, _ = self.post(["/index.html"])
+        self.assertEqual(response.status, 403)
+
+    def test_broadcast_without_clients(self):
+        self.assertEqual(self.hub.broadcast(["/index.html"]), 0)
+        self.assertIsNone(self.hub._sender)
+
+
+if __name__ == "__main__":
+    unittest.main()
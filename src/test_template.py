@@ -0,0 +1,117 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from template import Layouts, Template, resolve_layout
+
+
+class TestTemplate(unittest.TestCase):
+    def test_segments(self):
+        template = Template("<title>{{ Title }}</title>{{Content}}")
+        self.assertEqual(
+            template.segments, ["<title>", "Title", "</title>", "Content", ""]
+        )
+        self.assertEqual(template.slots, {"Title", "Content"})
+
+    def test_render(self):
+        template = Template("<h1>{{ Title }}</h1><p>{{ Date }}</p>{{ Content }}")
+        html = template.render(
+            {"Title": "A \\1 title", "Date": "2024-01-01", "Content": ["<b>", "x</b>"]}
+        )
+        self.assertEqual(html, "<h1>A \\1 title</h1><p>2024-01-01</p><b>x</b>")
+
+    def test_missing_variable(self):
+        template = Template("[{{ Description }}]")
+        self.assertEqual(template.render({}), "[]")
+
+    def test_repeated_slot_with_iterator(self):
+        template = Template("{{ Content }}|{{ Content }}")
+        html = template.render({"Content": iter(["a", "b"])})
+        self.assertEqual(html, "ab|ab")
+
+
+class TestLayouts(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.layouts = self.root / "layouts"
+        (self.layouts / "docs").mkdir(parents=True)
+        self.default = self.root / "template.html"
+        self.default.write_text(
+            "<title>{% block title %}{{ Title }}{% endblock %}</title>"
+            "{% block body %}<main>{% block main %}{{ Content }}{% endblock %}"
+            "</main>{% endblock body %}"
+        )
+        (self.layouts / "post.html").write_text(
+            '{% extends "../template.html" %}\nignored\n'
+            "{% block main %}<article>{{ Content }}</article>{% endblock %}"
+        )
+        (self.layouts / "docs" / "guide.html").write_text(
+            "{% extends '../post.html' %}"
+            "{% block title %}Guide: {{ Title }}{% endblock %}"
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, source):
+        (self.layouts / name).write_text(source)
+
+    def test_inheritance_chain(self):
+        layouts = Layouts(self.default, self.layouts)
+        self.assertEqual(sorted(layouts.templates), ["", "docs/guide", "post"])
+        variables = {"Title": "T", "Content": "C"}
+        self.assertEqual(
+            layouts.get().render(variables), "<title>T</title><main>C</main>"
+        )
+        self.assertEqual(
+            layouts.get("post").render(variables),
+            "<title>T</title><main><article>C</article></main>",
+        )
+        self.assertEqual(
+            layouts.get("docs/guide").render(variables),
+            "<title>Guide: T</title><main><article>C</article></main>",
+        )
+        self.assertEqual(
+            resolve_layout(self.layouts / "docs" / "guide.html")[1],
+            [
+                self.layouts / "docs" / "guide.html",
+                self.layouts / "post.html",
+                self.default,
+            ],
+        )
+        with self.assertRaises(Exception):
+            layouts.get("missing")
+
+    def test_digest_follows_chain(self):
+        layouts = Layouts(self.default, self.layouts)
+        digests = dict(layouts.digests)
+        self.write("post.html", '{% extends "../template.html" %}')
+        layouts.load()
+        self.assertEqual(layouts.digest("post"), layouts.digest(""))
+        self.assertNotEqual(layouts.digest("docs/guide"), digests["docs/guide"])
+        self.assertEqual(layouts.digest(""), digests[""])
+
+    def test_invalid_layouts(self):
+        cases = {
+            "cycle.html": '{% extends "cycle.html" %}',
+            "unclosed.html": "{% block a %}",
+            "stray.html": "{% endblock %}",
+            "mismatched.html": "{% block a %}{% endblock b %}",
+            "duplicate.html": "{% block a %}{% endblock %}{% block a %}{% endblock %}",
+            "late.html": 'text {% extends "post.html" %}',
+            "missing.html": '{% extends "nowhere.html" %}',
+        }
+        layouts = Layouts(self.default, self.layouts)
+        for name, source in cases.items():
+            with self.subTest(name=name):
+                self.write(name, source)
+                with self.assertRaises(Exception):
+                    layouts.load()
+                (self.layouts / name).unlink()
+        # A failed load keeps the layouts compiled before
+        self.assertIn("post", layouts.templates)
+
+
+if __name__ == "__main__":
+    unittest.main()
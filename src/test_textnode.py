@@ -1,14 +1,17 @@
 import unittest
 
+import textnode
 from htmlnode import LeafNode
 from textnode import (
     TextNode,
     TextType,
+    scan_inline,
     split_nodes_delimiter,
     split_nodes_images,
     split_nodes_links,
     text_node_to_html_node,
     text_to_textnodes,
+    text_to_textnodes_legacy,
 )
 
 
@@ -26,6 +29,14 @@ class TestTextNode(unittest.TestCase):
         node2 = TextNode("This is a text node", "bold", "boot.dev")
         self.assertNotEqual(node, node2)
 
+    def test_text_type_member(self):
+        node = TextNode("text", "bold")
+        self.assertIs(node.text_type, TextType.text_type_bold)
+        self.assertEqual(node, TextNode("text", TextType.text_type_bold))
+        self.assertEqual(repr(node), "TextNode(text, bold, None)")
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertRaises(Exception, TextNode, "text", "underline")
+
 
 class TestSplitInlineMarkdown(unittest.TestCase):
     def test_success(self):
@@ -303,5 +314,48 @@ class TestTextNodeToHTMLNode(unittest.TestCase):
         self.assertEqual(html_node, target_html_node)
 
 
+class TestScanInline(unittest.TestCase):
+    def test_matches_legacy_pipeline(self):
+        texts = [
+            "",
+            "plain text",
+            "**bold** and *italic* and `code`",
+            "**bold with `code` and *stars* inside**",
+            "*italic with `code` inside*",
+            "****",
+            "`code`**bold**`code`",
+            "a ![image](/a.png) [link](/b) ![other](/c.png)[last](/d)",
+            "[x ![i](/u.png) y](/z)",
+            "*[link](/a)* and [*not a link*](/b)",
+            "![multi\nline](/a.png) [a](b\nc)",
+        ]
+        for text in texts:
+            with self.subTest(text=text):
+                self.assertEqual(scan_inline(text), text_to_textnodes_legacy(text))
+
+    def test_invalid_syntax_matches_legacy(self):
+        texts = [
+            "**open",
+            "*open",
+            "`open",
+            "***a***",
+            "`a*b*c`",
+            "*a **b** c*",
+            "a*b**c",
+        ]
+        for text in texts:
+            with self.subTest(text=text):
+                self.assertRaises(Exception, text_to_textnodes_legacy, text)
+                self.assertRaises(Exception, scan_inline, text)
+
+    def test_legacy_flag(self):
+        text = "**a**[b](c)"
+        textnode.LEGACY_INLINE_PIPELINE = True
+        try:
+            self.assertEqual(text_to_textnodes(text), text_to_textnodes_legacy(text))
+        finally:
+            textnode.LEGACY_INLINE_PIPELINE = False
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,28 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from walk import walk_tree
+
+
+class TestWalkTree(unittest.TestCase):
+    def test_symlinked_directories(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "a" / "b").mkdir(parents=True)
+            (root / "a" / "b" / "file.txt").write_text("x")
+            # A cycle, and a second path to a directory that is not above it
+            os.symlink(root / "a", root / "a" / "b" / "loop")
+            os.symlink(root / "a" / "b", root / "link")
+
+            files = sorted(
+                Path(dirpath, name).relative_to(root).as_posix()
+                for dirpath, _, filenames in walk_tree(root)
+                for name in filenames
+            )
+            self.assertEqual(files, ["a/b/file.txt", "link/file.txt"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+import contextlib
+import io
+import tempfile
+import unittest
+from pathlib import Path
+
+from images import ImageStage
+from manifest import BuildManifest
+from template import Layouts
+from test_images import png
+from textnode import set_image_attributes
+from watch import PollingWatcher, SiteRebuilder
+
+
+class TestSiteRebuilder(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.content = self.root / "content"
+        self.static = self.root / "static"
+        self.public = self.root / "public"
+        for path in (self.content / "blog", self.static, self.public):
+            path.mkdir(parents=True)
+        (self.content / "index.md").write_text("# Home")
+        (self.content / "blog" / "index.md").write_text("# Blog")
+        (self.static / "site.css").write_text("body{}")
+        self.template = self.root / "template.html"
+        self.template.write_text("<main>{{ Content }}</main>")
+
+        self.manifest = BuildManifest(self.root / "manifest.json")
+        self.manifest.use_template(self.template)
+        self.rebuilder = SiteRebuilder(
+            self.content,
+            self.static,
+            self.template,
+            self.public,
+            self.manifest,
+            precompress=False,
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def rebuild(self, *paths: Path) -> list[Path]:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return self.rebuilder.rebuild(set(paths))
+
+    def test_rebuild_only_changed_sources(self):
+        self.rebuild(self.content, self.static)
+        page = self.public / "index.html"
+        blog = self.public / "blog" / "index.html"
+        self.assertEqual(page.read_text(), "<main><h1>Home</h1></main>")
+        self.assertTrue((self.public / "site.css").exists())
+
+        (self.content / "index.md").write_text("# Welcome")
+        blog.write_text("untouched")
+        self.assertEqual(self.rebuild(self.content / "index.md"), [page])
+        self.assertEqual(page.read_text(), "<main><h1>Welcome</h1></main>")
+        self.assertEqual(blog.read_text(), "untouched")
+
+    def test_template_change_rerenders_all_pages(self):
+        self.rebuild(self.content)
+        self.template.write_text("<article>{{ Content }}</article>")
+        outputs = self.rebuild(self.template)
+        self.assertEqual(len(outputs), 2)
+        self.assertEqual(
+            (self.public / "blog" / "index.html").read_text(),
+            "<article><h1>Blog</h1></article>",
+        )
+
+    def test_removed_sources_remove_outputs(self):
+        self.rebuild(self.content, self.static)
+        (self.content / "blog" / "index.md").unlink()
+        (self.content / "blog").rmdir()
+        (self.static / "site.css").unlink()
+
+        outputs = self.rebuild(self.content / "blog", self.static / "site.css")
+        self.assertEqual(len(outputs), 2)
+        self.assertFalse((self.public / "blog").exists())
+        self.assertFalse((self.public / "site.css").exists())
+
+    def test_removed_sources_remove_precompressed_outputs(self):
+        self.rebuilder.precompress = True
+        (self.content / "blog" / "index.md").write_text("# Blog\n\n" + "words " * 300)
+        self.rebuild(self.content, self.static)
+        self.assertTrue((self.public / "blog" / "index.html.gz").exists())
+        (self.content / "blog" / "index.md").unlink()
+        (self.content / "blog").rmdir()
+
+        self.rebuild(self.content / "blog")
+        self.assertFalse((self.public / "blog").exists())
+        self.assertEqual(self.manifest.compressed, set())
+
+    def test_layout_change_rerenders_pages_using_it(self):
+        layouts = self.root / "layouts"
+        layouts.mkdir()
+        (layouts / "post.html").write_text("<article>{{ Content }}</article>")
+        (self.content / "blog" / "index.md").write_text(
+            "---\nlayout: post\n---\n# Blog"
+        )
+        self.rebuilder.layouts = Layouts(self.template, layouts)
+        self.rebuild(self.content)
+        blog = self.public / "blog" / "index.html"
+        self.assertEqual(blog.read_text(), "<article><h1>Blog</h1></article>")
+
+        (layouts / "post.html").write_text("<section>{{ Content }}</section>")
+        self.assertEqual(self.rebuild(layouts / "post.html"), [blog])
+        self.assertEqual(blog.read_text(), "<section><h1>Blog</h1></section>")
+
+        (layouts / "post.html").write_text("{% block %}")
+        self.assertEqual(self.rebuild(layouts / "post.html"), [])
+
+    def test_image_change_rerenders_pages_showing_it(self):
+        (self.static / "logo.png").write_bytes(png(4, 2))
+        (self.content / "index.md").write_text("# Home\n\n![logo](/logo.png)")
+        self.rebuilder.images = ImageStage(
+            self.static, self.public, self.root / "image-cache"
+        )
+        self.addCleanup(set_image_attributes, {})
+        self.rebuild(self.content, self.static)
+        page = self.public / "index.html"
+        self.assertIn('width="4" height="2"', page.read_text())
+
+        (self.static / "logo.png").write_bytes(png(8, 4))
+        outputs = self.rebuild(self.static / "logo.png")
+        self.assertIn(page, outputs)
+        self.assertNotIn(self.public / "blog" / "index.html", outputs)
+        self.assertIn('width="8" height="4"', page.read_text())
+
+
+class TestPollingWatcher(unittest.TestCase):
+    def test_reports_changed_and_removed_files(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            kept = root / "kept.md"
+            removed = root / "removed.md"
+            kept.write_text("a")
+            removed.write_text("b")
+            (root / "kept.md~").write_text("backup")
+
+            watcher = PollingWatcher([root], interval=0.01)
+            kept.write_text("changed")
+            removed.unlink()
+            (root / "kept.md.swp").write_text("swap")
+            self.assertEqual(watcher.wait(0.01), {kept, removed})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,9 @@
 from enum import Enum
+import hashlib
+import json
+import os
 import re
+from typing import Callable, Iterable, Mapping
 
 from htmlnode import LeafNode
 
@@ -19,8 +23,22 @@ class DelimiterType(Enum):
     delimiter_type_code = "`"
 
 
+_text_types = {text_type.value: text_type for text_type in TextType}
+
+
 class TextNode:
-    def __init__(self, text: str, text_type: str, url: str | None = None) -> None:
+    """A span of inline text. `text_type` is stored as a TextType member, and
+    may also be given as its value, e.g. "bold"."""
+
+    __slots__ = ("text", "text_type", "url")
+
+    def __init__(
+        self, text: str, text_type: TextType | str, url: str | None = None
+    ) -> None:
+        if not isinstance(text_type, TextType):
+            if text_type not in _text_types:
+                raise Exception("text_type of text_node is not valid")
+            text_type = _text_types[text_type]
         self.text = text
         self.text_type = text_type
         self.url = url
@@ -35,49 +53,245 @@ class TextNode:
         )
 
     def __repr__(self) -> str:
-        return f"TextNode({self.text}, {self.text_type}, {self.url})"
+        return f"TextNode({self.text}, {self.text_type.value}, {self.url})"
 
 
 def text_node_to_html_node(text_node: TextNode) -> LeafNode:
     tag: str | None = None
     value: str | None = text_node.text
-    props: dict[str, str] | None = None
+    props: tuple[tuple[str, str], ...] | None = None
     match text_node.text_type:
-        case TextType.text_type_text.value:
+        case TextType.text_type_text:
             pass
-        case TextType.text_type_bold.value:
+        case TextType.text_type_bold:
             tag = "b"
-        case TextType.text_type_italic.value:
+        case TextType.text_type_italic:
             tag = "i"
-        case TextType.text_type_code.value:
+        case TextType.text_type_code:
             tag = "code"
-        case TextType.text_type_link.value:
+        case TextType.text_type_link:
             if not text_node.url:
                 raise Exception("link url missing")
             tag = "a"
-            props = {"href": text_node.url}
-        case TextType.text_type_image.value:
+            props = (("href", text_node.url),)
+        case TextType.text_type_image:
             if not text_node.url:
                 raise Exception("image url missing")
             tag = "img"
-            props = {"src": text_node.url, "alt": text_node.text}
+            props = (("src", text_node.url), ("alt", text_node.text))
+            props += _image_attributes.get(text_node.url, ())
         case _:
             raise Exception("text_type of text_node is not valid")
     return LeafNode(tag=tag, value=value, props=props)
 
 
+# Set SSG_LEGACY_INLINE=1 to render through the multi-pass split_nodes_*
+# pipeline, e.g. to diff generated pages against the single-pass scanner.
+LEGACY_INLINE_PIPELINE = os.environ.get("SSG_LEGACY_INLINE") == "1"
+
+_delimiter_pattern = re.compile(r"[*`]")
+_image_pattern = re.compile(r"!\[(.*?)\]\((.*?)\)")
+_link_pattern = re.compile(r"\[(.*?)\]\((.*?)\)")
+
+
 def text_to_textnodes(text: str) -> list[TextNode]:
-    nodes = [TextNode(text, TextType.text_type_text.value)]
+    if LEGACY_INLINE_PIPELINE:
+        return text_to_textnodes_legacy(text)
+    return scan_inline(text)
+
+
+def scan_inline(text: str) -> list[TextNode]:
+    """Split text into TextNodes in a single left-to-right scan.
+
+    Produces exactly the nodes of text_to_textnodes_legacy: `**` takes
+    precedence over `*`, which takes precedence over backticks, and images
+    and links are only looked for in the plain text between delimiters.
+    """
+    nodes: list[TextNode] = []
+
+    def emit(text_type: TextType, span: str, url: str | None) -> None:
+        nodes.append(TextNode(span, text_type, url))
+
+    _scan_inline(text, emit)
+    return nodes
+
+
+# Leaf HTML of each span, as LeafNode.to_html() writes it
+_span_formats = {
+    TextType.text_type_bold: "<b>{0}</b>",
+    TextType.text_type_italic: "<i>{0}</i>",
+    TextType.text_type_code: "<code>{0}</code>",
+    TextType.text_type_link: '<a href="{1}">{0}</a>',
+    TextType.text_type_image: '<img src="{1}" alt="{0}">{0}</img>',
+}
+
+
+_link_types = (TextType.text_type_link, TextType.text_type_image)
+
+# Kind ("link" or "image") and target of a link found while rendering
+Link = tuple[str, str]
+
+
+# Extra attributes of an <img>, e.g. (("width", "640"), ("height", "480"))
+ImageAttributes = tuple[tuple[str, str], ...]
+
+# Attributes by image URL, set by the image stage of a build
+_image_attributes: dict[str, ImageAttributes] = {}
+
+
+def set_image_attributes(attributes: Mapping[str, ImageAttributes]) -> None:
+    """Add `attributes` to every <img> whose src is one of their URLs."""
+    global _image_attributes
+    _image_attributes = dict(attributes)
+
+
+def get_image_attributes() -> dict[str, ImageAttributes]:
+    return _image_attributes
+
+
+def image_digest(links: Iterable[Link]) -> str:
+    """Hash of the attributes of the images among `links`, "" when none of
+    them has any. Outputs rendered with these images depend on it."""
+    used = sorted(
+        {
+            (target, _image_attributes[target])
+            for kind, target in links
+            if kind == "image" and target in _image_attributes
+        }
+    )
+    return _attributes_digest(used)
+
+
+def _attributes_digest(items: list[tuple[str, ImageAttributes]]) -> str:
+    if not items:
+        return ""
+    data = json.dumps(items, separators=(",", ":")).encode()
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def render_inline(text: str, out: list[str], links: list[Link] | None = None) -> None:
+    """Append the HTML of inline markdown `text` to `out`.
+
+    The output is exactly that of text_to_textnodes() and
+    text_node_to_html_node(), without creating any node. The kind ("link" or
+    "image") and target of every link and image are added to `links`.
+    """
+    if LEGACY_INLINE_PIPELINE:
+        for node in text_to_textnodes_legacy(text):
+            out.append(text_node_to_html_node(node).to_html())
+            if links is not None and node.text_type in _link_types:
+                links.append((node.text_type.value, node.url or ""))
+        return
+
+    append = out.append
+    missing_url: list[str] = []
+
+    def emit(text_type: TextType, span: str, url: str | None) -> None:
+        if text_type is TextType.text_type_text:
+            append(span)
+            return
+        if text_type in _link_types:
+            if not url:
+                # Raised once the text is scanned, like the node path would
+                missing_url.append(f"{text_type.value} url missing")
+            elif links is not None:
+                links.append((text_type.value, url))
+            if text_type is TextType.text_type_image and url in _image_attributes:
+                extra = "".join(f' {k}="{v}"' for k, v in _image_attributes[url])
+                append(f'<img src="{url}" alt="{span}"{extra}>{span}</img>')
+                return
+        append(_span_formats[text_type].format(span, url))
+
+    _scan_inline(text, emit)
+    if missing_url:
+        raise Exception(missing_url[0])
+
+
+def _scan_inline(text: str, emit: Callable[[TextType, str, str | None], None]) -> None:
+    start = 0
+    while True:
+        match = _delimiter_pattern.search(text, start)
+        if match is None:
+            break
+
+        i = match.start()
+        if text.startswith("**", i):
+            content_start = i + 2
+            end = text.find("**", content_start)
+            if end == -1:
+                raise Exception("invalid markdown syntax")
+            text_type = TextType.text_type_bold
+            next_start = end + 2
+        elif text[i] == "*":
+            content_start = i + 1
+            end = text.find("*", content_start)
+            # A `**` would have split the italic run before it was closed
+            if end == -1 or text.startswith("**", end):
+                raise Exception("invalid markdown syntax")
+            text_type = TextType.text_type_italic
+            next_start = end + 1
+        else:
+            content_start = i + 1
+            closing = _delimiter_pattern.search(text, content_start)
+            # Any `*` inside a code span would have split it first
+            if closing is None or text[closing.start()] != "`":
+                raise Exception("invalid markdown syntax")
+            end = closing.start()
+            text_type = TextType.text_type_code
+            next_start = end + 1
+
+        _emit_text_with_images(emit, text[start:i])
+        emit(text_type, text[content_start:end], None)
+        start = next_start
+
+    _emit_text_with_images(emit, text[start:])
+
+
+def _emit_text_with_images(
+    emit: Callable[[TextType, str, str | None], None], text: str
+) -> None:
+    last = 0
+    for match in _image_pattern.finditer(text):
+        if match.start() > last:
+            _emit_text_with_links(emit, text[last : match.start()])
+        emit(TextType.text_type_image, match.group(1), match.group(2))
+        last = match.end()
+
+    if last == 0:
+        _emit_text_with_links(emit, text)
+    elif last < len(text):
+        _emit_text_with_links(emit, text[last:])
+
+
+def _emit_text_with_links(
+    emit: Callable[[TextType, str, str | None], None], text: str
+) -> None:
+    last = 0
+    for match in _link_pattern.finditer(text):
+        if match.start() > last:
+            emit(TextType.text_type_text, text[last : match.start()], None)
+        emit(TextType.text_type_link, match.group(1), match.group(2))
+        last = match.end()
+
+    if last == 0:
+        # Runs without links are kept as they are, even when empty
+        emit(TextType.text_type_text, text, None)
+    elif last < len(text):
+        emit(TextType.text_type_text, text[last:], None)
+
+
+def text_to_textnodes_legacy(text: str) -> list[TextNode]:
+    nodes = [TextNode(text, TextType.text_type_text)]
     nodes = split_nodes_delimiter(
-        nodes, DelimiterType.delimiter_type_bold.value, TextType.text_type_bold.value
+        nodes, DelimiterType.delimiter_type_bold.value, TextType.text_type_bold
     )
     nodes = split_nodes_delimiter(
         nodes,
         DelimiterType.delimiter_type_italic.value,
-        TextType.text_type_italic.value,
+        TextType.text_type_italic,
     )
     nodes = split_nodes_delimiter(
-        nodes, DelimiterType.delimiter_type_code.value, TextType.text_type_code.value
+        nodes, DelimiterType.delimiter_type_code.value, TextType.text_type_code
     )
     nodes = split_nodes_images(nodes)
     nodes = split_nodes_links(nodes)
@@ -85,14 +299,14 @@ def text_to_textnodes(text: str) -> list[TextNode]:
 
 
 def split_nodes_delimiter(
-    nodes: list[TextNode], delimiter: str, text_type: str
+    nodes: list[TextNode], delimiter: str, text_type: TextType | str
 ) -> list[TextNode]:
     if delimiter not in DelimiterType:
         raise Exception("invalid markdown syntax")
 
     new_nodes: list[TextNode] = []
     for node in nodes:
-        if node.text_type is not TextType.text_type_text.value:
+        if node.text_type is not TextType.text_type_text:
             new_nodes.append(node)
             continue
 
@@ -105,7 +319,7 @@ def split_nodes_delimiter(
             if i % 2 != 0:
                 temp.append(TextNode(split, text_type))
             else:
-                temp.append(TextNode(split, TextType.text_type_text.value))
+                temp.append(TextNode(split, TextType.text_type_text))
 
         new_nodes.extend(temp)
 
@@ -115,7 +329,7 @@ def split_nodes_delimiter(
 def split_nodes_images(nodes: list[TextNode]) -> list[TextNode]:
     new_nodes: list[TextNode] = []
     for node in nodes:
-        if node.text_type is not TextType.text_type_text.value:
+        if node.text_type is not TextType.text_type_text:
             new_nodes.append(node)
             continue
 
@@ -131,13 +345,13 @@ def split_nodes_images(nodes: list[TextNode]) -> list[TextNode]:
             splits = node_text.split(delimiter, 1)
 
             if splits[0] != "":
-                temp.append(TextNode(splits[0], TextType.text_type_text.value))
+                temp.append(TextNode(splits[0], TextType.text_type_text))
 
-            temp.append(TextNode(tuple[0], TextType.text_type_image.value, tuple[1]))
+            temp.append(TextNode(tuple[0], TextType.text_type_image, tuple[1]))
             node_text = splits[1]
 
         if node_text != "":
-            temp.append(TextNode(node_text, TextType.text_type_text.value))
+            temp.append(TextNode(node_text, TextType.text_type_text))
 
         new_nodes.extend(temp)
 
@@ -147,7 +361,7 @@ def split_nodes_images(nodes: list[TextNode]) -> list[TextNode]:
 def split_nodes_links(nodes: list[TextNode]) -> list[TextNode]:
     new_nodes: list[TextNode] = []
     for node in nodes:
-        if node.text_type is not TextType.text_type_text.value:
+        if node.text_type is not TextType.text_type_text:
             new_nodes.append(node)
             continue
 
@@ -163,13 +377,13 @@ def split_nodes_links(nodes: list[TextNode]) -> list[TextNode]:
             splits = node_text.split(delimiter, 1)
 
             if splits[0] != "":
-                temp.append(TextNode(splits[0], TextType.text_type_text.value))
+                temp.append(TextNode(splits[0], TextType.text_type_text))
 
-            temp.append(TextNode(tuple[0], TextType.text_type_link.value, tuple[1]))
+            temp.append(TextNode(tuple[0], TextType.text_type_link, tuple[1]))
             node_text = splits[1]
 
         if node_text != "":
-            temp.append(TextNode(node_text, TextType.text_type_text.value))
+            temp.append(TextNode(node_text, TextType.text_type_text))
 
         new_nodes.extend(temp)
 
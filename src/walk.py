@@ -0,0 +1,31 @@
+import os
+from pathlib import Path
+from typing import Iterator
+
+
+def walk_tree(root: Path) -> Iterator[tuple[str, list[str], list[str]]]:
+    """os.walk() of `root` that follows symlinked directories, except those
+    linking back to a directory above them, which would loop forever.
+
+    A directory linked from two places is still walked under both, as a
+    copy of the tree would contain it twice.
+    """
+    # Directory path -> (device, inode) of the directories above it
+    ancestors: dict[str, frozenset[tuple[int, int]]] = {}
+    for dirpath, dirnames, filenames in os.walk(root, followlinks=True):
+        stat = os.stat(dirpath)
+        chain = ancestors.pop(dirpath, frozenset()) | {(stat.st_dev, stat.st_ino)}
+        kept: list[str] = []
+        for name in dirnames:
+            path = os.path.join(dirpath, name)
+            try:
+                child = os.stat(path)
+            except OSError:
+                continue
+            if (child.st_dev, child.st_ino) in chain:
+                continue
+            ancestors[path] = chain
+            kept.append(name)
+        # os.walk() only descends into the directories left in `dirnames`
+        dirnames[:] = kept
+        yield dirpath, dirnames, filenames
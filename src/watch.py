@@ -0,0 +1,445 @@
+"""Watch mode: rebuild only the outputs affected by each change.
+
+Changes are picked up with inotify on Linux and by polling file stats
+elsewhere, debounced, and mapped to their outputs: a content edit re-renders
+that page, a static edit re-copies that file and a template or layout edit
+re-renders the pages whose layout it changed. An image edit also re-renders
+the pages showing it when its dimensions or variants changed. Deleted sources
+have their outputs removed through the manifest.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import time
+import urllib.request
+from pathlib import Path
+from typing import Callable, Iterable, Mapping, Protocol
+
+from compress import update_compressed
+from generate import (
+    BuildError,
+    collect_page_jobs,
+    copy_recursive,
+    generate_pages,
+    page_output_path,
+)
+from images import IMAGE_SUFFIXES, ImageStage
+from manifest import BuildManifest
+from search import SEARCH_DIR, SearchIndexBuilder
+from template import Layouts
+from textnode import get_image_attributes, set_image_attributes
+
+# Files editors write next to the ones being edited
+_IGNORED_SUFFIXES = ("~", ".swp", ".swx", ".tmp")
+
+
+def _is_ignored(name: str) -> bool:
+    return name.endswith(_IGNORED_SUFFIXES) or name.startswith(".#") or name == "4913"
+
+
+def _is_under(path: Path, root: Path) -> bool:
+    return path == root or root in path.parents
+
+
+class Watcher(Protocol):
+    def wait(self, debounce: float) -> set[Path]: ...
+
+    def close(self) -> None: ...
+
+
+class PollingWatcher:
+    """Detects changes by comparing (mtime, size) snapshots of the roots."""
+
+    def __init__(self, roots: Iterable[Path], interval: float = 0.25) -> None:
+        self.roots = list(roots)
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def wait(self, debounce: float) -> set[Path]:
+        changed: set[Path] = set()
+        while True:
+            time.sleep(self.interval if not changed else max(debounce, 0.01))
+            snapshot = self._scan()
+            new_changes = {
+                path
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            if new_changes:
+                changed |= new_changes
+            elif changed:
+                return changed
+
+    def close(self) -> None:
+        pass
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        snapshot: dict[Path, tuple[int, int]] = {}
+        for root in self.roots:
+            if root.is_file():
+                stat = root.stat()
+                snapshot[root] = (stat.st_mtime_ns, stat.st_size)
+                continue
+            for dirpath, _, filenames in os.walk(root):
+                for name in filenames:
+                    if _is_ignored(name):
+                        continue
+                    path = Path(dirpath) / name
+                    try:
+                        stat = path.stat()
+                    except OSError:
+                        continue
+                    snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+
+class InotifyWatcher:
+    """Linux inotify watcher, reporting changes as soon as the kernel does."""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_CLOEXEC = 0o2000000
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    _event_header = struct.Struct("iIII")
+
+    def __init__(self, roots: Iterable[Path]) -> None:
+        self.roots = list(roots)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        # Watch descriptor -> (directory, names to report or None for all)
+        self._watches: dict[int, tuple[Path, set[str] | None]] = {}
+
+        for root in self.roots:
+            if root.is_dir():
+                self._watch_tree(root)
+            else:
+                # Watch the directory, editors often replace files by renaming
+                self._watch(root.parent, {root.name})
+
+    @staticmethod
+    def available() -> bool:
+        if not sys.platform.startswith("linux"):
+            return False
+        libc_name = ctypes.util.find_library("c")
+        return libc_name is not None and hasattr(
+            ctypes.CDLL(libc_name), "inotify_init1"
+        )
+
+    def wait(self, debounce: float) -> set[Path]:
+        changed: set[Path] = set()
+        select.select([self._fd], [], [])
+        while True:
+            changed |= self._read_events()
+            readable, _, _ = select.select([self._fd], [], [], debounce)
+            if not readable:
+                return changed
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def _watch(self, directory: Path, names: set[str] | None) -> None:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            return
+        if wd in self._watches:
+            # The same directory watched again, report the union of names
+            previous = self._watches[wd][1]
+            names = None if previous is None or names is None else previous | names
+        self._watches[wd] = (directory, names)
+
+    def _watch_tree(self, root: Path) -> None:
+        for dirpath, _, _ in os.walk(root):
+            self._watch(Path(dirpath), None)
+
+    def _read_events(self) -> set[Path]:
+        buffer = os.read(self._fd, 64 * 1024)
+        changed: set[Path] = set()
+        offset = 0
+        while offset < len(buffer):
+            wd, mask, _, length = self._event_header.unpack_from(buffer, offset)
+            offset += self._event_header.size
+            name = os.fsdecode(buffer[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were lost, report the roots so everything is checked
+                changed.update(self.roots)
+                continue
+            if mask & self.IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+
+            watch = self._watches.get(wd)
+            if watch is None or _is_ignored(name):
+                continue
+            directory, names = watch
+            if names is not None and name not in names:
+                continue
+
+            path = directory / name
+            if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                self._watch_tree(path)
+            changed.add(path)
+
+        return changed
+
+
+def create_watcher(roots: Iterable[Path]) -> Watcher:
+    if InotifyWatcher.available():
+        return InotifyWatcher(roots)
+    return PollingWatcher(roots)
+
+
+class SiteRebuilder:
+    """Maps changed sources to the outputs built from them and rebuilds those."""
+
+    def __init__(
+        self,
+        content: Path,
+        static: Path,
+        template: Path,
+        public: Path,
+        manifest: BuildManifest,
+        workers: int = 1,
+        variables: Mapping[str, str] | None = None,
+        precompress: bool = True,
+        copy_mode: str = "copy",
+        verify_hash: bool = False,
+        search: SearchIndexBuilder | None = None,
+        images: ImageStage | None = None,
+        layouts: Layouts | None = None,
+    ) -> None:
+        self.content = content
+        self.static = static
+        self.template = template
+        self.public = public
+        self.manifest = manifest
+        self.workers = workers
+        self.variables = variables
+        self.precompress = precompress
+        self.copy_mode = copy_mode
+        self.verify_hash = verify_hash
+        self.search = search
+        self.images = images
+        self.layouts = layouts if layouts is not None else Layouts(template)
+
+    def rebuild(self, changed: set[Path]) -> list[Path]:
+        """Rebuild what depends on `changed` and return the outputs that were
+        written or removed."""
+        start = time.perf_counter()
+        page_jobs: dict[Path, Path] = {}
+        outputs: list[Path] = []
+        removed = copied = 0
+
+        if self.template in changed and self.template.exists():
+            if self.manifest.use_template(self.template, self.variables):
+                page_jobs.update(collect_page_jobs(self.content, self.public))
+
+        if any(self._is_layout(path) for path in changed):
+            page_jobs.update(self._reload_layouts())
+
+        for path in sorted(changed):
+            if _is_under(path, self.content):
+                if path.is_file():
+                    page_jobs[path] = page_output_path(self.content, self.public, path)
+                elif path.is_dir():
+                    dst = self.public / path.relative_to(self.content)
+                    page_jobs.update(collect_page_jobs(path, dst))
+                else:
+                    gone = self.manifest.discard("pages", path, self.public)
+                    outputs.extend(gone)
+                    removed += len(gone)
+            elif _is_under(path, self.static):
+                if path.exists():
+                    copied_files = self._copy(path)
+                    outputs.extend(copied_files)
+                    copied += len(copied_files)
+                else:
+                    gone = self.manifest.discard("assets", path, self.public)
+                    if self.images is not None:
+                        for width in self.images.widths:
+                            variant = Path(f"{path}@{width}w")
+                            gone += self.manifest.discard(
+                                "assets", variant, self.public
+                            )
+                    outputs.extend(gone)
+                    removed += len(gone)
+
+        if self.images is not None and any(
+            _is_under(path, self.static)
+            and (path.suffix.lower() in IMAGE_SUFFIXES or not path.suffix)
+            for path in changed
+        ):
+            page_jobs.update(self._update_images())
+
+        try:
+            rendered = generate_pages(
+                list(page_jobs.items()),
+                self.layouts,
+                self.manifest,
+                self.workers,
+                self.variables,
+            )
+        except BuildError as e:
+            print(e)
+            rendered = e.rendered
+        outputs.extend(dst for _, dst in rendered)
+
+        if self.search is not None and any(_is_under(p, self.content) for p in changed):
+            # Unchanged pages are taken from the cache, only edited ones are read
+            self.search.update(
+                collect_page_jobs(self.content, self.public), self.public
+            )
+            outputs.extend(self.search.write(self.public / SEARCH_DIR))
+
+        if self.precompress:
+            update_compressed(
+                outputs,
+                incompressible=self.manifest.incompressible,
+                written=self.manifest.compressed,
+            )
+
+        elapsed = (time.perf_counter() - start) * 1000
+        print(
+            f"Rebuilt {len(rendered)} pages, copied {copied} files and removed "
+            f"{removed} outputs in {elapsed:.0f} ms"
+        )
+        return outputs
+
+    def save(self) -> None:
+        self.manifest.save()
+        if self.search is not None:
+            self.search.save()
+        if self.images is not None:
+            self.images.save()
+
+    def _is_layout(self, path: Path) -> bool:
+        directory = self.layouts.directory
+        return (
+            path == self.template
+            or path in self.layouts.files
+            or (directory is not None and _is_under(path, directory))
+        )
+
+    def _reload_layouts(self) -> list[tuple[Path, Path]]:
+        """Compile the layouts again and return every page job: the manifest
+        then skips the pages whose layout is unchanged."""
+        try:
+            self.layouts.load()
+        except Exception as e:
+            print(f"Layouts not reloaded: {e}")
+            return []
+        return collect_page_jobs(self.content, self.public)
+
+    def _update_images(self) -> dict[Path, Path]:
+        """Read the images again and return the (src, dst) jobs of the pages
+        showing one whose attributes changed."""
+        assert self.images is not None
+        previous = get_image_attributes()
+        attributes, _ = self.images.build(self.workers, self.manifest)
+        set_image_attributes(attributes)
+        changed = {
+            url
+            for url in previous.keys() | attributes.keys()
+            if previous.get(url) != attributes.get(url)
+        }
+        jobs: dict[Path, Path] = {}
+        for src, entry in self.manifest.entries["pages"].items():
+            if any(
+                kind == "image" and target in changed
+                for kind, target in self.manifest.links("pages", Path(src))
+            ):
+                jobs[Path(src)] = Path(entry["output"])
+        return jobs
+
+    def _copy(self, path: Path) -> list[Path]:
+        files = (
+            [path] if path.is_file() else [p for p in path.rglob("*") if p.is_file()]
+        )
+        targets: list[Path] = []
+        for file in files:
+            dst_dir = (self.public / file.relative_to(self.static)).parent
+            dst_dir.mkdir(parents=True, exist_ok=True)
+            copy_recursive(
+                file, dst_dir, self.manifest, self.copy_mode, self.verify_hash
+            )
+            targets.append(dst_dir / file.name)
+        return targets
+
+
+class ReloadNotifier:
+    """Posts the URL paths of rebuilt outputs to the preview server's live
+    reload endpoint, e.g. `http://localhost:8888/__livereload`."""
+
+    def __init__(self, url: str, public: Path) -> None:
+        self.url = url
+        self.public = public
+        self._warned = False
+
+    def __call__(self, outputs: list[Path]) -> None:
+        paths = sorted(
+            {"/" + output.relative_to(self.public).as_posix() for output in outputs}
+        )
+        request = urllib.request.Request(
+            self.url,
+            data=json.dumps(paths).encode(),
+            headers={"Content-Type": "application/json"},
+            method="POST",
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=1):
+                pass
+        except OSError as e:
+            if not self._warned:
+                print(f"Could not notify '{self.url}' of the rebuild: {e}")
+                self._warned = True
+        else:
+            self._warned = False
+
+
+def watch_site(
+    rebuilder: SiteRebuilder,
+    debounce: float = 0.05,
+    on_rebuild: Callable[[list[Path]], None] | None = None,
+) -> None:
+    """Rebuild on every change until interrupted.
+
+    The manifest is saved at most every few seconds, since a stale manifest
+    only costs re-rendering some pages on the next build.
+    """
+    roots = [rebuilder.content, rebuilder.static, rebuilder.template]
+    if rebuilder.layouts.directory is not None and rebuilder.layouts.directory.is_dir():
+        roots.append(rebuilder.layouts.directory)
+    watcher = create_watcher(roots)
+    print(f"Watching {', '.join(map(str, roots))} for changes, press Ctrl+C to stop")
+
+    last_save = time.monotonic()
+    try:
+        while True:
+            changed = watcher.wait(debounce)
+            outputs = rebuilder.rebuild(changed)
+            if on_rebuild is not None and outputs:
+                on_rebuild(outputs)
+            if time.monotonic() - last_save > 5:
+                rebuilder.save()
+                last_save = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+        rebuilder.save()